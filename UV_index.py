@@ -1,6 +1,6 @@
 import requests
 import pandas as pd
-import sqlite3
+from utils import connect_db
 from config import OPENUV_KEY
 
 # 1. Use the HISTORY endpoint (Retrieve UV Index History by Date)
@@ -49,7 +49,7 @@ try:
             print(df.head(24)) # Show the first 24 rows (hours)
 
             # 6. Save to SQLite
-            conn = sqlite3.connect("weather_data.db")
+            conn = connect_db("weather_data.db")
             df.to_sql('openuv_full_day', conn, if_exists='append', index=False)
             conn.close()
             print("\nSuccess! Saved full day to 'openuv_full_day' table.")
@@ -3,54 +3,29 @@
 # Run this 4+ times to collect 100+ air quality records
 # NO API KEY NEEDED!
 
+import os
 import sqlite3
-import requests
 from datetime import datetime, timedelta
 import time
+import metrics
+import profiling
+from utils import connect_db
+import venues
 
-# Cities matching football/weather/UV/Moon data (25 cities)
-CITIES = {
-    # Original 10 cities
-    'Ann Arbor': {'lat': 42.2808, 'lon': -83.7430},
-    'Columbus': {'lat': 40.0012, 'lon': -83.0302},
-    'State College': {'lat': 40.7982, 'lon': -77.8599},
-    'Madison': {'lat': 43.0731, 'lon': -89.4012},
-    'Iowa City': {'lat': 41.6611, 'lon': -91.5302},
-    'Eugene': {'lat': 44.0521, 'lon': -123.0868},
-    'Austin': {'lat': 30.2849, 'lon': -97.7341},
-    'Tuscaloosa': {'lat': 33.2098, 'lon': -87.5692},
-    'Athens': {'lat': 33.9519, 'lon': -83.3576},
-    'Baton Rouge': {'lat': 30.4515, 'lon': -91.1871},
-    
-    # Big Ten additions (11-15)
-    'East Lansing': {'lat': 42.7370, 'lon': -84.4839},
-    'Lincoln': {'lat': 40.8136, 'lon': -96.7026},
-    'Champaign': {'lat': 40.1164, 'lon': -88.2434},
-    'West Lafayette': {'lat': 40.4259, 'lon': -86.9081},
-    'Bloomington': {'lat': 39.1653, 'lon': -86.5264},
-    
-    # SEC/Big 12 additions (16-20)
-    'Knoxville': {'lat': 35.9606, 'lon': -83.9207},
-    'Auburn': {'lat': 32.5990, 'lon': -85.4808},
-    'College Station': {'lat': 30.6280, 'lon': -96.3344},
-    'Starkville': {'lat': 33.4504, 'lon': -88.8184},
-    'Columbia': {'lat': 34.0007, 'lon': -81.0348},
-    
-    # Additional major programs (21-25)
-    'Gainesville': {'lat': 29.6516, 'lon': -82.3248},
-    'Tallahassee': {'lat': 30.4383, 'lon': -84.2807},
-    'Blacksburg': {'lat': 37.2296, 'lon': -80.4139},
-    'Clemson': {'lat': 34.6834, 'lon': -82.8374},
-    'Atlanta': {'lat': 33.7756, 'lon': -84.3963},
-}
+# Point at a local stand-in (mock_api.py) with AIR_QUALITY_BASE_URL=http://127.0.0.1:8799
+AIR_QUALITY_BASE_URL = os.environ.get('AIR_QUALITY_BASE_URL', 'https://air-quality-api.open-meteo.com')
+REQUEST_DELAY = float(os.environ.get('COLLECTOR_DELAY', 0.3))
 
-def get_air_quality_from_api(lat, lon, date):
+# Cities with a registered venue (venues.py); same list as the other collectors
+CITIES = venues.city_coords()
+
+def get_air_quality_from_api(lat, lon, date, base_url=None):
     """
     Get air quality data from Open-Meteo Air Quality API
     Returns hourly data for the specified date
     NO API KEY NEEDED!
     """
-    url = "https://air-quality-api.open-meteo.com/v1/air-quality"
+    url = f"{base_url or AIR_QUALITY_BASE_URL}/v1/air-quality"
     
     params = {
         'latitude': lat,
@@ -62,7 +37,7 @@ def get_air_quality_from_api(lat, lon, date):
     }
     
     try:
-        response = requests.get(url, params=params)
+        response = metrics.http_get('open_meteo_air_quality', url, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -79,11 +54,31 @@ def get_air_quality_from_api(lat, lon, date):
         print(f"    Exception: {e}")
         return None
 
+def extract_game_aqi(aq_data):
+    """Average US AQI over game hours (12-15) of an air quality response, or None"""
+    if not aq_data or 'hourly' not in aq_data:
+        return None
+    hourly = aq_data['hourly']
+    times = hourly.get('time', [])
+    us_aqi = hourly.get('us_aqi', [])
+    
+    # Average AQI for hours 12-15
+    game_aqi_values = []
+    for i, t in enumerate(times):
+        hour = int(t.split('T')[1].split(':')[0])
+        if 12 <= hour <= 15:
+            if us_aqi[i] is not None:
+                game_aqi_values.append(us_aqi[i])
+    
+    if not game_aqi_values:
+        return None
+    return sum(game_aqi_values) / len(game_aqi_values)
+
 def show_database_stats():
     """
     Show current database statistics
     """
-    conn = sqlite3.connect('football_weather.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
     # Total count (Make sure your table is named 'AirQuality')
@@ -120,9 +115,23 @@ def get_or_create_location(cursor, city_name):
     cursor.execute("INSERT INTO Locations (city_name) VALUES (?)", (city_name,))
     return cursor.lastrowid
 
+def insert_air_quality(cursor, date, city, avg_aqi):
+    """Insert one game-time US AQI value for city on date"""
+    # 1. Get Location ID
+    loc_id = get_or_create_location(cursor, city)
+
+    # 2. Insert using location_id
+    with metrics.span('db_write', table='AirQuality'):
+        cursor.execute('''
+            INSERT INTO AirQuality 
+            (game_date, location_id, pollutant_type, pollutant_value, unit)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (date, loc_id, 'US_AQI', avg_aqi, 'AQI'))
+    metrics.inc('db_rows_written_total', table='AirQuality')
+
 def store_air_quality_data():
     """Store up to 25 air quality records per run"""
-    conn = sqlite3.connect('football_weather.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
     cursor.execute("SELECT COUNT(*) FROM AirQuality")
@@ -174,46 +183,26 @@ def store_air_quality_data():
         
         aq_data = get_air_quality_from_api(coords['lat'], coords['lon'], date)
         
-        if aq_data and 'hourly' in aq_data:
-            hourly = aq_data['hourly']
-            times = hourly.get('time', [])
-            us_aqi = hourly.get('us_aqi', [])
-            
-            # Average AQI for hours 12-15
-            game_aqi_values = []
-            for i, t in enumerate(times):
-                hour = int(t.split('T')[1].split(':')[0])
-                if 12 <= hour <= 15:
-                    if us_aqi[i] is not None:
-                        game_aqi_values.append(us_aqi[i])
-            
-            if game_aqi_values:
-                avg_aqi = sum(game_aqi_values) / len(game_aqi_values)
+        avg_aqi = extract_game_aqi(aq_data)
+        
+        if avg_aqi is not None:
+            try:
+                insert_air_quality(cursor, date, city, avg_aqi)
                 
-                try:
-                    # 1. Get Location ID
-                    loc_id = get_or_create_location(cursor, city)
-
-                    # 2. Insert using location_id
-                    cursor.execute('''
-                        INSERT INTO AirQuality 
-                        (game_date, location_id, pollutant_type, pollutant_value, unit)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (date, loc_id, 'US_AQI', avg_aqi, 'AQI'))
-                    
-                    stored_count += 1
-                    print(f"✓ AQI: {avg_aqi:.1f}")
-                    
-                except sqlite3.IntegrityError:
-                    print(f"✗ Duplicate")
-            else:
-                print(f"✗ No valid data")
+                stored_count += 1
+                print(f"✓ AQI: {avg_aqi:.1f}")
+                
+            except sqlite3.IntegrityError:
+                print(f"✗ Duplicate")
+        elif aq_data and 'hourly' in aq_data:
+            print(f"✗ No valid data")
         else:
             print(f"✗ No data")
         
-        time.sleep(0.3)
+        time.sleep(REQUEST_DELAY)
     
-    conn.commit()
+    with metrics.span('db_commit', table='AirQuality'):
+        conn.commit()
     cursor.execute("SELECT COUNT(*) FROM AirQuality")
     final_count = cursor.fetchone()[0]
     conn.close()
@@ -224,4 +213,7 @@ def store_air_quality_data():
     show_database_stats()
 
 if __name__ == '__main__':
-    store_air_quality_data()
\ No newline at end of file
+    metrics.export_on_exit('air_quality')
+    profiling.enable_from_argv('air_quality')
+    with profiling.stage('collect'):
+        store_air_quality_data()
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""bench_dtypes.py
+
+Compare memory use and groupby time of the joined DataFrame with default
+(object/int64/float64) dtypes vs. the compact dtypes from
+`process_and_analyze.optimize_dtypes`.
+
+The real games are resampled up to --rows (default 1M) so the numbers are
+representative of a large frame. Results go to outputs/bench_dtypes.json.
+"""
+import argparse
+import json
+import time
+import numpy as np
+from utils import connect_db, ensure_outputs_dir
+from process_and_analyze import (load_data_with_sql_join, optimize_dtypes,
+                                 compute_points_by_temperature_bins,
+                                 compute_points_by_wind_precip,
+                                 compute_win_pct_by_stadium_rain)
+
+
+def best_of(fn, repeats=3):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def measure(df):
+    return {
+        'memory_mb': df.memory_usage(deep=True).sum() / 1e6,
+        'groupby_stadium_s': best_of(lambda: df.groupby('stadium_city', observed=True)['total_points'].mean()),
+        'temp_bins_s': best_of(lambda: compute_points_by_temperature_bins(df)),
+        'wind_precip_s': best_of(lambda: compute_points_by_wind_precip(df)),
+        'win_pct_s': best_of(lambda: compute_win_pct_by_stadium_rain(df)),
+    }
+
+
+def main(rows=1_000_000, seed=0):
+    conn = connect_db()
+    joined = load_data_with_sql_join(conn)
+    conn.close()
+
+    if joined.empty:
+        print("Error: No data found.")
+        return
+
+    rng = np.random.default_rng(seed)
+    big = joined.iloc[rng.integers(0, len(joined), rows)].reset_index(drop=True)
+
+    start = time.perf_counter()
+    compact = optimize_dtypes(big)
+    convert_s = time.perf_counter() - start
+
+    default_stats = measure(big)
+    compact_stats = measure(compact)
+    results = {
+        'rows': rows,
+        'convert_s': convert_s,
+        'default': default_stats,
+        'compact': compact_stats,
+        'ratio': {k: default_stats[k] / compact_stats[k] for k in default_stats if compact_stats[k]},
+    }
+
+    ensure_outputs_dir()
+    with open('outputs/bench_dtypes.json', 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{'metric':<20}{'default':>12}{'compact':>12}{'ratio':>8}")
+    for k in default_stats:
+        print(f"{k:<20}{default_stats[k]:>12.3f}{compact_stats[k]:>12.3f}{results['ratio'][k]:>7.1f}x")
+    print("\n✅ Saved outputs/bench_dtypes.json")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Rows in the resampled frame')
+    args = parser.parse_args()
+    main(rows=args.rows)
@@ -0,0 +1,267 @@
+"""bench_pipeline.py
+
+End-to-end benchmark on synthetic data.
+
+A deterministic generator (numpy, seeded) fills a football_weather.db with
+the createdatabase schema: --games games spread over Sep-Dec of consecutive
+seasons, one home team per location, and matching Weather, Moon_Data and
+AirQuality rows (one per game date + location, with --weather-coverage of
+games getting a Weather row, like the real data). Each size gets its own
+working directory under outputs/bench/ so the real database, CSVs and
+figures are never touched; an unchanged (games, seed) database is reused.
+
+The pipeline steps (load_data_with_sql_join, optimize_dtypes, each
+compute_*, export_clean_csvs and each visualize plot) are then run in that
+directory, recording wall time, peak RSS and rows/sec per step. Peak RSS is
+per step on Linux (the VmHWM high-water mark is reset before each step via
+/proc/self/clear_refs); elsewhere it is the process maximum so far.
+
+    python bench_pipeline.py --games 10000 100000 1000000
+    -> outputs/bench_pipeline.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import time
+import numpy as np
+from utils import connect_db
+
+REPORT_PATH = os.path.join('outputs', 'bench_pipeline.json')
+BENCH_DIR = os.path.join('outputs', 'bench')
+CONFERENCES = ['SEC', 'Big Ten', 'ACC', 'Big 12', 'Pac-12', 'American', 'Mountain West',
+               'Sun Belt', 'MAC', 'Conference USA']
+SEASON_DAYS = 120          # games fall between Aug 31 and late December
+GAMES_PER_LOCATION = 1500  # locations grow with size so (date, location) stays unique
+CHUNK = 200_000
+
+
+# --- GENERATOR ---
+
+def _moon_phase(illumination, waxing):
+    names = np.where(illumination < 3, 'New Moon',
+            np.where(illumination > 97, 'Full Moon',
+            np.where(np.abs(illumination - 50) <= 3, np.where(waxing, 'First Quarter', 'Last Quarter'),
+            np.where(illumination < 50, np.where(waxing, 'Waxing Crescent', 'Waning Crescent'),
+                     np.where(waxing, 'Waxing Gibbous', 'Waning Gibbous')))))
+    return names
+
+
+def generate(db_path, games, seed=0, weather_coverage=0.9):
+    """Create `db_path` from scratch with `games` synthetic games. Returns seconds taken."""
+    from createdatabase import create_database
+
+    start = time.perf_counter()
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    create_database(db_path)
+    conn = connect_db(db_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    rng = np.random.default_rng(seed)
+
+    n_loc = max(130, -(-games // GAMES_PER_LOCATION))
+    lat = rng.uniform(25, 48, n_loc)
+    lon = rng.uniform(-122, -70, n_loc)
+    base_temp = 95 - (lat - 25) * 1.2   # warmer in the south
+    conn.executemany("INSERT INTO Locations (location_id, city_name) VALUES (?, ?)",
+                     [(i + 1, f"City {i + 1:05d}") for i in range(n_loc)])
+    conn.executemany("INSERT INTO Teams (team_id, team_name, conference, location_id) VALUES (?, ?, ?, ?)",
+                     [(i + 1, f"Team {i + 1:05d}", CONFERENCES[i % len(CONFERENCES)], i + 1)
+                      for i in range(n_loc)])
+
+    epoch = np.datetime64('2000-08-31')
+    for lo in range(0, games, CHUNK):
+        k = np.arange(lo, min(lo + CHUNK, games))
+        n = len(k)
+        # Slot k -> (date slot, location): unique (game_date, location_id) pairs
+        slot, loc = k // n_loc, k % n_loc
+        season, day = slot // SEASON_DAYS, slot % SEASON_DAYS
+        dates = (epoch + (season * 365 + day).astype('timedelta64[D]')).astype(str)
+        away = (loc + rng.integers(1, n_loc, n)) % n_loc
+        home_score = rng.poisson(29, n)
+        away_score = rng.poisson(24, n)
+        kickoff = np.char.add(rng.integers(12, 21, n).astype(str), ':00')
+        conn.executemany(
+            "INSERT INTO Games (game_id, game_date, home_team_id, away_team_id, home_score, away_score,"
+            " location_id, attendance, kickoff_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            zip((k + 1).tolist(), dates.tolist(), (loc + 1).tolist(), (away + 1).tolist(),
+                home_score.tolist(), away_score.tolist(), (loc + 1).tolist(),
+                rng.integers(15_000, 105_000, n).tolist(), kickoff.tolist()))
+
+        temperature = base_temp[loc] - day * 0.3 + rng.normal(0, 8, n)
+        wind = rng.gamma(2.0, 4.0, n)
+        rainy = rng.random(n) < 0.2
+        precipitation = np.where(rainy, rng.exponential(0.3, n), 0.0)
+        has_weather = rng.random(n) < weather_coverage
+        w = np.flatnonzero(has_weather)
+        conn.executemany(
+            "INSERT INTO Weather (game_date, location_id, temperature, wind_speed, humidity,"
+            " precipitation, weather_code) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            zip(dates[w].tolist(), (loc[w] + 1).tolist(), temperature[w].round(1).tolist(),
+                wind[w].round(1).tolist(), rng.uniform(30, 95, len(w)).round(0).tolist(),
+                precipitation[w].round(2).tolist(), np.where(rainy[w], 61, 1).tolist()))
+
+        cycle = ((season * 365 + day) % 29.53) / 29.53
+        illumination = 50 * (1 - np.cos(2 * np.pi * cycle))
+        conn.executemany(
+            "INSERT INTO Moon_Data (game_date, location_id, latitude, longitude, moon_phase,"
+            " moon_illumination) VALUES (?, ?, ?, ?, ?, ?)",
+            zip(dates.tolist(), (loc + 1).tolist(), lat[loc].round(4).tolist(), lon[loc].round(4).tolist(),
+                _moon_phase(illumination, cycle < 0.5).tolist(), illumination.round(1).tolist()))
+
+        conn.executemany(
+            "INSERT INTO AirQuality (game_date, location_id, pollutant_type, pollutant_value, unit)"
+            " VALUES (?, ?, 'US_AQI', ?, 'USAQI')",
+            zip(dates.tolist(), (loc + 1).tolist(), rng.gamma(3.0, 12.0, n).round(0).tolist()))
+        conn.commit()
+
+    conn.close()
+    return time.perf_counter() - start
+
+
+def prepare(workdir, games, seed, weather_coverage):
+    """Generate (or reuse) the synthetic database in `workdir`. Returns generation seconds or None."""
+    os.makedirs(workdir, exist_ok=True)
+    db_path = os.path.join(workdir, 'football_weather.db')
+    meta_path = os.path.join(workdir, 'synthetic.json')
+    meta = {'games': games, 'seed': seed, 'weather_coverage': weather_coverage}
+    try:
+        with open(meta_path) as f:
+            if json.load(f) == meta and os.path.exists(db_path):
+                return None
+    except (FileNotFoundError, ValueError):
+        pass
+    seconds = generate(db_path, games, seed, weather_coverage)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    return seconds
+
+
+# --- MEASUREMENT ---
+
+def _reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if platform.system() == 'Darwin' else peak / 1024
+
+
+def timed(steps, name, rows, fn, *args):
+    """Run fn(*args), record {wall_s, peak_rss_mb, rows_per_s} under steps[name]."""
+    _reset_peak_rss()
+    start = time.perf_counter()
+    result = fn(*args)
+    wall = time.perf_counter() - start
+    steps[name] = {
+        'wall_s': round(wall, 4),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'rows_per_s': round(rows / wall) if wall > 0 else None,
+    }
+    print(f"  {name:<40}{wall:>9.3f}s{steps[name]['peak_rss_mb']:>9.0f} MB")
+    return result
+
+
+def bench_pipeline(workdir, games):
+    """Time each pipeline step against the database in `workdir`."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import process_and_analyze as pa
+    import visualize
+
+    cwd = os.getcwd()
+    os.chdir(workdir)  # outputs/ and figures/ paths are relative
+    steps = {}
+    try:
+        pa.ensure_outputs_dir()
+        conn = connect_db()
+        raw = timed(steps, 'load_data_with_sql_join', games, pa.load_data_with_sql_join, conn)
+        conn.close()
+        rows = len(raw)
+        joined = timed(steps, 'optimize_dtypes', rows, pa.optimize_dtypes, raw)
+        del raw
+
+        results = pa.AnalysisResults(joined=joined)
+        results.by_temp = timed(steps, 'compute_points_by_temperature_bins', rows,
+                                pa.compute_points_by_temperature_bins, joined)
+        results.by_wind = timed(steps, 'compute_points_by_wind_precip', rows,
+                                pa.compute_points_by_wind_precip, joined)
+        results.corr = timed(steps, 'compute_correlation_matrix', rows, pa.compute_correlation_matrix, joined)
+        results.by_moon = timed(steps, 'compute_points_by_moon_illumination', rows,
+                                pa.compute_points_by_moon_illumination, joined)
+        results.by_rain = timed(steps, 'compute_win_pct_by_stadium_rain', rows,
+                                pa.compute_win_pct_by_stadium_rain, joined)
+        results.model = timed(steps, 'compute_scoring_model', rows, pa.compute_scoring_model, joined)
+        timed(steps, 'export_clean_csvs', rows, pa.export_clean_csvs, joined, results.by_temp,
+              results.by_wind, results.corr, results.by_moon, results.by_rain, results.model)
+
+        for plot_fn, attr, _, _ in visualize.CHARTS:
+            timed(steps, plot_fn.__name__, rows, plot_fn, getattr(results, attr))
+    finally:
+        os.chdir(cwd)
+    return rows, steps
+
+
+def main(sizes=(10_000,), seed=0, weather_coverage=0.9, keep=True, report_path=REPORT_PATH):
+    from result_cache import code_version
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'seed': seed,
+        'code': code_version('process_and_analyze.py', 'scoring_model.py', 'visualize.py'),
+        'runs': [],
+    }
+    for games in sizes:
+        workdir = os.path.join(BENCH_DIR, f"games_{games}")
+        print(f"\n=== {games:,} games ({workdir}) ===")
+        generated = prepare(workdir, games, seed, weather_coverage)
+        if generated is not None:
+            print(f"  generated in {generated:.1f}s")
+        rows, steps = bench_pipeline(workdir, games)
+        report['runs'].append({
+            'games': games,
+            'joined_rows': rows,
+            'generate_s': round(generated, 2) if generated is not None else None,
+            'total_s': round(sum(s['wall_s'] for s in steps.values()), 4),
+            'steps': steps,
+        })
+        if not keep:
+            shutil.rmtree(workdir)
+
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Saved {report_path}")
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline on synthetic data')
+    parser.add_argument('--games', type=int, nargs='+', default=[10_000],
+                        help='Synthetic sizes to run (e.g. 10000 1000000 10000000)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--weather-coverage', type=float, default=0.9,
+                        help='Fraction of games with a Weather row')
+    parser.add_argument('--no-keep', action='store_true', help='Delete each synthetic database afterwards')
+    parser.add_argument('--out', default=REPORT_PATH)
+    args = parser.parse_args()
+    main(args.games, seed=args.seed, weather_coverage=args.weather_coverage,
+         keep=not args.no_keep, report_path=args.out)
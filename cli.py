@@ -0,0 +1,346 @@
+"""cli.py
+
+Single entry point for the project:
+
+    python cli.py ingest [football|weather|air|moon|all]
+    python cli.py replay [--db PATH] [--tables T ...] [--rebuild]
+    python cli.py stats
+    python cli.py status
+    python cli.py analyze [--force] [--no-csv] [--backend sql]
+    python cli.py plot [--force] [--workers N] [--in-process]
+    python cli.py bench [--rows N] | bench --pipeline [--games N ...]
+    python cli.py perf [--update-baseline] [--no-collectors]
+    python cli.py run [--ingest] [--force] [--dry-run]
+    python cli.py serve [--port 8765]
+    python cli.py watch [--interval S] [--week N] [--once]
+    python cli.py cube [--by DIM ...] [--where DIM=VALUE ...] [--rebuild]
+    python cli.py importtime <command ...>
+
+`python cli.py --trace-sql <command>` times every SQL statement (see
+sql_trace.py); the setting is passed on to pipeline subprocesses.
+`python cli.py --profile <command>` writes cProfile, tracemalloc and
+collapsed-stack output per stage to outputs/profile/<command>/ (see
+profiling.py).
+
+Only the standard library is imported at module load. pandas, numpy,
+matplotlib, seaborn and requests are imported inside the commands that use
+them, so `stats` and `status` start in a few tens of milliseconds.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+TABLES = ['Games', 'Teams', 'Locations', 'Weather', 'AirQuality', 'Moon_Data', 'PlayTypes', 'Plays']
+# Commands whose run metrics are written to outputs/metrics/<command>.json/.prom
+METERED = {'ingest', 'analyze', 'plot', 'watch'}
+# Commands that mark their own profiling stages; others are profiled as one stage
+STAGED = {'ingest', 'analyze', 'plot'}
+COLLECTORS = {
+    'football': ('college_football', 'store_football_data'),
+    'weather': ('weather_data', 'store_weather_data'),
+    'air': ('air_quality', 'store_air_quality_data'),
+    'moon': ('moon_data', 'store_moon_data'),
+    'plays': ('play_by_play', 'store_play_by_play'),
+}
+
+
+def cmd_ingest(args):
+    import importlib
+    import profiling
+    sources = list(COLLECTORS) if args.source == 'all' else [args.source]
+    for source in sources:
+        module_name, fn_name = COLLECTORS[source]
+        module = importlib.import_module(module_name)
+        with profiling.stage(source):
+            getattr(module, fn_name)()
+
+
+def cmd_replay(args):
+    import payload_archive
+    payload_archive.print_stats()
+    payload_archive.replay(args.db, args.tables, args.rebuild)
+
+
+def cmd_stats(args):
+    from utils import connect_db
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    print("=" * 60)
+    print("DATABASE STATISTICS")
+    print("=" * 60)
+    for table in TABLES:
+        try:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            print(f"{table:<12} {cursor.fetchone()[0]:>8}")
+        except Exception:
+            print(f"{table:<12} {'missing':>8}")
+
+    try:
+        cursor.execute("""
+            SELECT l.city_name, COUNT(*)
+            FROM Games g
+            JOIN Locations l ON g.location_id = l.location_id
+            GROUP BY l.city_name
+            ORDER BY COUNT(*) DESC
+        """)
+        by_city = cursor.fetchall()
+    except Exception:
+        by_city = []
+    if by_city:
+        print("\nGames by city:")
+        for city, count in by_city:
+            print(f"  {city}: {count}")
+    conn.close()
+
+
+def cmd_status(args):
+    """Which CSVs and figures are stale (no pandas/matplotlib needed)."""
+    from utils import connect_db
+    from result_cache import ResultCache, output_cache_keys, figure_cache_keys
+
+    conn = connect_db()
+    cache = ResultCache()
+    csv_keys = output_cache_keys(conn)
+    conn.close()
+    fig_keys = figure_cache_keys()
+
+    for label, keys in (('CSV', csv_keys), ('Figure', fig_keys)):
+        stale = cache.stale(keys)
+        for path in sorted(keys):
+            mark = 'stale' if path in stale else 'ok'
+            print(f"{label:<7} {mark:<6} {path}")
+
+
+def cmd_analyze(args):
+    import process_and_analyze
+    process_and_analyze.main(save_csv=not args.no_csv, force=args.force, backend=args.backend)
+
+
+def cmd_plot(args):
+    import visualize
+    visualize.ensure_figures_dir()
+    workers = args.workers or os.cpu_count() or 1
+    if args.in_process:
+        rendered = visualize.render_in_process(force=args.force, workers=workers)
+    else:
+        rendered = visualize.render_changed(force=args.force, workers=workers)
+    if not rendered:
+        print("✅ Charts up to date (inputs unchanged)")
+
+
+def cmd_bench(args):
+    if args.pipeline:
+        import bench_pipeline
+        bench_pipeline.main(args.games)
+        return
+    import bench_dtypes
+    bench_dtypes.main(rows=args.rows)
+
+
+def cmd_perf(args):
+    import perf_gate
+    argv = ['--update-baseline'] if args.update_baseline else []
+    if args.no_collectors:
+        argv.append('--no-collectors')
+    if args.repeats:
+        argv += ['--repeats', str(args.repeats)]
+    sys.exit(perf_gate.main(argv))
+
+
+def cmd_run(args):
+    import pipeline
+    status = pipeline.run(ingest=args.ingest, force=args.force, dry_run=args.dry_run, jobs=args.jobs)
+    if any(s == 'failed' for s in status.values()):
+        sys.exit(1)
+
+
+def cmd_serve(args):
+    import asyncio
+    import query_service
+    try:
+        asyncio.run(query_service.QueryService(poll_seconds=args.poll).serve(port=args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+def cmd_watch(args):
+    import watch
+    watcher = watch.Watcher(args.year, args.week, args.interval, args.queue_size,
+                            backend=args.backend, charts=not args.no_charts, season_type=args.season_type)
+    watcher.run(max_polls=1 if args.once else None)
+
+
+def cmd_cube(args):
+    import weather_cube
+    cube = weather_cube.load_or_build(force=args.rebuild)
+    result = cube.query(args.by, **weather_cube._parse_where(args.where))
+    cols = args.by + ['count', 'avg_total_points', 'std_total_points', 'home_win_pct']
+    print(result[cols].round(2).to_string(index=False))
+
+
+def cmd_similar(args):
+    import similar_games
+    index = similar_games.build_index()
+    conditions = {f: getattr(args, f) for f in similar_games.FEATURES}
+    try:
+        games = index.query(args.k, city=args.city, before=args.before, **conditions)
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    cols = ['game_date', 'stadium_city', 'home_team_name', 'home_score', 'away_score', 'away_team_name',
+            'distance'] + [f for f in similar_games.FEATURES if conditions[f] is not None]
+    print(games[cols].assign(game_date=games['game_date'].dt.date).round(2).to_string(index=False))
+    print(similar_games.summarize(games))
+
+
+def summarize_importtime(stderr, top=15):
+    """
+    Parse `python -X importtime` output into (total_us, [(cumulative_us, module)])
+    for top-level imports (those imported directly, not as dependencies).
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, raw_name = line[len('import time:'):].split('|')
+        # nesting is shown by indentation after the single separating space
+        depth = (len(raw_name) - len(raw_name.lstrip(' ')) - 1) // 2
+        if depth == 0:
+            rows.append((int(cumulative_us), raw_name.strip()))
+    total = sum(us for us, _ in rows)
+    rows.sort(reverse=True)
+    return total, rows[:top]
+
+
+def cmd_importtime(args):
+    """Re-run a command under `-X importtime` and print where startup time goes."""
+    cmd = [sys.executable, '-X', 'importtime', os.path.abspath(__file__)] + args.argv
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+
+    total, top = summarize_importtime(proc.stderr)
+    print(f"Command: {' '.join(args.argv)}")
+    print(f"Wall time: {wall * 1000:.0f} ms, imports: {total / 1000:.0f} ms")
+    print(f"\n{'cumulative ms':>14}  module")
+    for us, name in top:
+        print(f"{us / 1000:>14.1f}  {name}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='College football weather pipeline')
+    parser.add_argument('--trace-sql', action='store_true',
+                        help='Time every SQL statement; log slow ones and print the top queries at exit')
+    parser.add_argument('--profile', action='store_true',
+                        help='cProfile + tracemalloc per stage into outputs/profile/<command>/')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('ingest', help='Run the API collectors')
+    p.add_argument('source', nargs='?', default='all', choices=list(COLLECTORS) + ['all'])
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser('replay', help='Re-derive tables from the raw API payload archive')
+    p.add_argument('--db', default='football_weather.db')
+    replay_tables = ['Games', 'Weather', 'AirQuality', 'Moon_Data', 'Plays']
+    p.add_argument('--tables', nargs='+', choices=replay_tables, default=replay_tables)
+    p.add_argument('--rebuild', action='store_true', help='Delete the tables\' rows first')
+    p.set_defaults(func=cmd_replay)
+
+    p = sub.add_parser('stats', help='Row counts per table and games per city')
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser('status', help='Show which outputs are stale')
+    p.set_defaults(func=cmd_status)
+
+    p = sub.add_parser('analyze', help='Compute tables and export CSVs')
+    p.add_argument('--force', action='store_true')
+    p.add_argument('--no-csv', action='store_true')
+    p.add_argument('--backend', choices=['pandas', 'sql'], default='pandas')
+    p.set_defaults(func=cmd_analyze)
+
+    p = sub.add_parser('plot', help='Render the charts')
+    p.add_argument('--force', action='store_true')
+    p.add_argument('--workers', type=int, default=1, help='0 = one per CPU')
+    p.add_argument('--in-process', action='store_true')
+    p.set_defaults(func=cmd_plot)
+
+    p = sub.add_parser('bench', help='Run the dtype or end-to-end benchmark')
+    p.add_argument('--rows', type=int, default=1_000_000)
+    p.add_argument('--pipeline', action='store_true', help='Synthetic end-to-end benchmark')
+    p.add_argument('--games', type=int, nargs='+', default=[10_000])
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser('perf', help='Compare benchmarks with perf_baseline.json; exit 1 on regression')
+    p.add_argument('--update-baseline', action='store_true')
+    p.add_argument('--no-collectors', action='store_true')
+    p.add_argument('--repeats', type=int)
+    p.set_defaults(func=cmd_perf)
+
+    p = sub.add_parser('run', help='Run the pipeline DAG, skipping up-to-date stages')
+    p.add_argument('--ingest', action='store_true', help='Also run the API collectors')
+    p.add_argument('--force', action='store_true')
+    p.add_argument('--dry-run', action='store_true')
+    p.add_argument('--jobs', type=int, default=None)
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser('serve', help='Local read-only JSON API over the results')
+    p.add_argument('--port', type=int, default=8765)
+    p.add_argument('--poll', type=float, default=2.0)
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser('watch', help='Poll for newly final games; enrich them and refresh outputs')
+    p.add_argument('--year', type=int)
+    p.add_argument('--week', type=int, help='Fixed week (default: the current one, rechecked every poll)')
+    p.add_argument('--season-type', choices=['regular', 'postseason'], default='regular')
+    p.add_argument('--interval', type=float, default=300.0, help='Seconds between polls')
+    p.add_argument('--queue-size', type=int, default=64)
+    p.add_argument('--backend', choices=['pandas', 'sql'], default='pandas')
+    p.add_argument('--no-charts', action='store_true')
+    p.add_argument('--once', action='store_true')
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser('cube', help='Slice/roll up the precomputed weather cube')
+    p.add_argument('--by', nargs='*', default=[])
+    p.add_argument('--where', nargs='*')
+    p.add_argument('--rebuild', action='store_true')
+    p.set_defaults(func=cmd_cube)
+
+    p = sub.add_parser('similar', help='Past games played in conditions most like a forecast')
+    p.add_argument('--temperature', type=float)
+    p.add_argument('--wind-speed', type=float)
+    p.add_argument('--precipitation', type=float)
+    p.add_argument('--moon-illumination', type=float)
+    p.add_argument('--aqi', type=float)
+    p.add_argument('-k', type=int, default=20)
+    p.add_argument('--city', help='Only games in this stadium city')
+    p.add_argument('--before', help='Only games before this date')
+    p.set_defaults(func=cmd_similar)
+
+    p = sub.add_parser('importtime', help='Import-time report for another command')
+    # own dest: 'command' is the subcommand name (METERED / STAGED lookups)
+    p.add_argument('argv', metavar='command', nargs=argparse.REMAINDER)
+    p.set_defaults(func=cmd_importtime)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.trace_sql:
+        os.environ['SQL_TRACE'] = '1'
+    if args.command in METERED:
+        import metrics
+        metrics.export_on_exit(args.command)
+    if args.profile:
+        import profiling
+        profiling.enable(args.command)
+        if args.command not in STAGED:
+            with profiling.stage(args.command):
+                return args.func(args)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,39 +2,19 @@
 # William - College Football Data Collection
 # Run this 4+ times to collect 100+ games
 
+import os
 import sqlite3
-import requests
 from config import COLLEGE_FOOTBALL_KEY
 import time
+import metrics
+import profiling
+from createdatabase import add_game_week_columns
+from utils import connect_db
+import venues
 
-# Map EXACT stadium names to our weather cities (EXPANDED TO 25 STADIUMS)
-STADIUM_TO_CITY = {
-    'Michigan Stadium': 'Ann Arbor',
-    'Ohio Stadium': 'Columbus',
-    'Beaver Stadium': 'State College',
-    'Camp Randall Stadium': 'Madison',
-    'Kinnick Stadium': 'Iowa City',
-    'Autzen Stadium': 'Eugene',
-    'DKR-Texas Memorial Stadium': 'Austin',
-    'Bryant-Denny Stadium': 'Tuscaloosa',
-    'Sanford Stadium': 'Athens',
-    'Tiger Stadium (LA)': 'Baton Rouge',
-    'Spartan Stadium': 'East Lansing',
-    'Memorial Stadium (Lincoln, NE)': 'Lincoln',
-    'Memorial Stadium (Champaign, IL)': 'Champaign',
-    'Ross-Ade Stadium': 'West Lafayette',
-    'Memorial Stadium (Bloomington, IN)': 'Bloomington',
-    'Neyland Stadium': 'Knoxville',
-    'Jordan-Hare Stadium': 'Auburn',
-    'Kyle Field': 'College Station',
-    'Davis Wade Stadium': 'Starkville',
-    'Williams-Brice Stadium': 'Columbia',
-    'Ben Hill Griffin Stadium': 'Gainesville',  # Florida
-    'Doak Campbell Stadium': 'Tallahassee',  # Florida State
-    'Lane Stadium': 'Blacksburg',  # Virginia Tech
-    'Memorial Stadium (Clemson, SC)': 'Clemson',  # Clemson
-    'Bobby Dodd Stadium': 'Atlanta',  # Georgia Tech
-}
+# Point at a local stand-in (mock_api.py) with CFBD_BASE_URL=http://127.0.0.1:8799
+CFBD_BASE_URL = os.environ.get('CFBD_BASE_URL', 'https://api.collegefootballdata.com')
+REQUEST_DELAY = float(os.environ.get('COLLECTOR_DELAY', 0.3))
 
 def get_or_create_location(cursor, city_name):
     """
@@ -67,15 +47,17 @@ def get_or_create_team(cursor, team_name, conference="Unknown", location_id=None
         )
         return cursor.lastrowid
 
-def get_games_from_api(year=2024, week=1):
-    """Get games from CollegeFootballData API"""
-    url = "https://api.collegefootballdata.com/games"
+def get_games_from_api(year=2024, week=1, base_url=None, season_type='regular'):
+    """Get games from CollegeFootballData API (week=None: the whole season)"""
+    url = f"{base_url or CFBD_BASE_URL}/games"
     
     headers = {'Authorization': f'Bearer {COLLEGE_FOOTBALL_KEY}'}
-    params = {'year': year, 'week': week, 'seasonType': 'regular'}
+    params = {'year': year, 'seasonType': season_type}
+    if week is not None:
+        params['week'] = week
     
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = metrics.http_get('cfbd', url, headers=headers, params=params)
         if response.status_code == 200:
             return response.json()
         else:
@@ -85,25 +67,64 @@ def get_games_from_api(year=2024, week=1):
         print(f"  Exception: {e}")
         return []
 
-def get_city_from_venue(venue_name):
-    """Map venue/stadium name to our weather city"""
-    if not venue_name:
-        return None
+def get_venues_from_api(base_url=None):
+    """Get every venue (name, city, coordinates, timezone) from CollegeFootballData"""
+    url = f"{base_url or CFBD_BASE_URL}/venues"
+    headers = {'Authorization': f'Bearer {COLLEGE_FOOTBALL_KEY}'}
+    try:
+        response = metrics.http_get('cfbd', url, headers=headers)
+        if response.status_code == 200:
+            return response.json()
+        print(f"  Venues error {response.status_code}")
+    except Exception as e:
+        print(f"  Venues exception: {e}")
+    return []
+
+def get_city_from_venue(venue_name, venue_id=None):
+    """Map venue/stadium name (or CFBD venue id) to our weather city"""
+    venue = venues.resolve(venue_name, venue_id)
+    return venue.city if venue else None
+
+def insert_game(cursor, game, stadium_city):
+    """Insert one CFBD game played in stadium_city; returns its date (IntegrityError if stored)"""
+    # Get team info from top level
+    home_team = game.get('homeTeam', 'Unknown')
+    away_team = game.get('awayTeam', 'Unknown')
+    home_conference = game.get('homeConference', 'Unknown')
+    away_conference = game.get('awayConference', 'Unknown')
     
-    # Check if exact stadium name matches
-    if venue_name in STADIUM_TO_CITY:
-        return STADIUM_TO_CITY[venue_name]
+    # Extract game date
+    start_date = game.get('startDate', '')
+    game_date = start_date[:10]
+    kickoff_time = start_date[11:19] if len(start_date) >= 19 else None
     
-    # Also check partial matches
-    for stadium, city in STADIUM_TO_CITY.items():
-        if stadium in venue_name:
-            return city
+    # 1. Get the Location ID (Integer)
+    loc_id = get_or_create_location(cursor, stadium_city)
     
-    return None
+    # 2. Get or create team IDs (Passing loc_id instead of string)
+    home_team_id = get_or_create_team(cursor, home_team, home_conference, loc_id)
+    away_team_id = get_or_create_team(cursor, away_team, away_conference, loc_id)
+    
+    # 3. Insert game
+    with metrics.span('db_write', table='Games'):
+        cursor.execute('''
+            INSERT INTO Games 
+            (game_id, game_date, home_team_id, away_team_id, 
+            home_score, away_score, location_id,
+            attendance, kickoff_time, season, week, season_type)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            game.get('id'), game_date, home_team_id, away_team_id,
+            game.get('homePoints'), game.get('awayPoints'), loc_id,
+            game.get('attendance'), kickoff_time,
+            game.get('season'), game.get('week'), game.get('seasonType')
+        ))
+    metrics.inc('db_rows_written_total', table='Games')
+    return game_date
 
 def show_database_stats():
     """Show current database statistics"""
-    conn = sqlite3.connect('football_weather.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
     cursor.execute("SELECT COUNT(*) FROM Games")
@@ -138,7 +159,8 @@ def show_database_stats():
 
 def store_football_data():
     """Store up to 25 games per run from 2024 season"""
-    conn = sqlite3.connect('football_weather.db')
+    conn = connect_db()
+    add_game_week_columns(conn)
     cursor = conn.cursor()
     
     cursor.execute("SELECT COUNT(*) FROM Games")
@@ -151,7 +173,10 @@ def store_football_data():
     print(f"FOOTBALL DATA COLLECTION - 2024 SEASON")
     print(f"{'='*60}")
     print(f"Current games: {actual_count}")
-    print(f"Target stadiums: {len(STADIUM_TO_CITY)} stadiums")
+    added = venues.register_cfbd(get_venues_from_api())
+    if added:
+        venues.save()
+    print(f"Known venues: {len(venues.all_venues())} ({added} new from CFBD)")
     print(f"{'='*60}\n")
     
     stored_count = 0
@@ -175,7 +200,7 @@ def store_football_data():
         valid_games = 0
         for g in games:
             venue_name = g.get('venue', '')
-            city = get_city_from_venue(venue_name)
+            city = get_city_from_venue(venue_name, g.get('venueId'))
             if city and g.get('homePoints') is not None:
                 valid_games += 1
         
@@ -192,7 +217,7 @@ def store_football_data():
             
             # Get venue as string directly
             venue_name = game.get('venue', '')
-            stadium_city = get_city_from_venue(venue_name)
+            stadium_city = get_city_from_venue(venue_name, game.get('venueId'))
             
             if not stadium_city:
                 wrong_venue_count += 1
@@ -206,50 +231,19 @@ def store_football_data():
                 no_score_count += 1
                 continue
             
-            # Get team info from top level
-            home_team = game.get('homeTeam', 'Unknown')
-            away_team = game.get('awayTeam', 'Unknown')
-            home_conference = game.get('homeConference', 'Unknown')
-            away_conference = game.get('awayConference', 'Unknown')
-            
-            # Extract game date
-            start_date = game.get('startDate', '')
-            game_date = start_date[:10]
-            kickoff_time = start_date[11:19] if len(start_date) >= 19 else None
-            attendance = game.get('attendance')
-
-            
-            # 1. Get the Location ID (Integer)
-            loc_id = get_or_create_location(cursor, stadium_city)
-            
-            # 2. Get or create team IDs (Passing loc_id instead of string)
-            home_team_id = get_or_create_team(cursor, home_team, home_conference, loc_id)
-            away_team_id = get_or_create_team(cursor, away_team, away_conference, loc_id)
-            
-            # 3. Insert game
             try:
-                cursor.execute('''
-                    INSERT INTO Games 
-                    (game_id, game_date, home_team_id, away_team_id, 
-                    home_score, away_score, location_id,
-                    attendance, kickoff_time)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    game_id, game_date, home_team_id, away_team_id,
-                    home_score, away_score, loc_id,
-                    attendance, kickoff_time
-                ))
-
+                game_date = insert_game(cursor, game, stadium_city)
                 stored_count += 1
-                total = home_score + away_score
-                print(f"  [{stored_count}] {game_date} ({stadium_city}): {home_team} {home_score}-{away_score} {away_team}")
+                print(f"  [{stored_count}] {game_date} ({stadium_city}): {game.get('homeTeam', 'Unknown')} "
+                      f"{home_score}-{away_score} {game.get('awayTeam', 'Unknown')}")
                 
             except sqlite3.IntegrityError:
                 skipped_count += 1
         
-        time.sleep(0.3)
+        time.sleep(REQUEST_DELAY)
     
-    conn.commit()
+    with metrics.span('db_commit', table='Games'):
+        conn.commit()
     cursor.execute("SELECT COUNT(*) FROM Games")
     final_count = cursor.fetchone()[0]
     conn.close()
@@ -273,4 +267,7 @@ def store_football_data():
     show_database_stats()
 
 if __name__ == '__main__':
-    store_football_data()
\ No newline at end of file
+    metrics.export_on_exit('football')
+    profiling.enable_from_argv('football')
+    with profiling.stage('collect'):
+        store_football_data()
\ No newline at end of file
@@ -1,10 +1,104 @@
 # create_database.py
 # Run this ONCE at the start to create your database
 
-import sqlite3
+from utils import connect_db
 
-def create_database():
-    conn = sqlite3.connect('football_weather.db')
+# Lookup indexes for the game-date + location joins in process_and_analyze
+# (without them SQLite builds a throwaway automatic index on every query)
+JOIN_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_weather_date_location ON Weather (game_date, location_id)",
+    "CREATE INDEX IF NOT EXISTS idx_airquality_date_location ON AirQuality (game_date, location_id, pollutant_type)",
+]
+
+def create_join_indexes(conn):
+    for statement in JOIN_INDEXES:
+        conn.execute(statement)
+    conn.commit()
+
+# Play-by-play (play_by_play.py): integer-coded, no play text, one row per play
+PLAY_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS PlayTypes (
+        play_type_id INTEGER PRIMARY KEY,
+        name TEXT UNIQUE NOT NULL,
+        category TEXT NOT NULL,
+        outcome INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Plays (
+        play_id INTEGER PRIMARY KEY,
+        game_id INTEGER NOT NULL,
+        period INTEGER,
+        clock_seconds INTEGER,
+        offense_team_id INTEGER,
+        defense_team_id INTEGER,
+        down INTEGER,
+        distance INTEGER,
+        yards_to_goal INTEGER,
+        yards_gained INTEGER,
+        play_type_id INTEGER,
+        scoring INTEGER,
+        FOREIGN KEY (game_id) REFERENCES Games(game_id),
+        FOREIGN KEY (play_type_id) REFERENCES PlayTypes(play_type_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_plays_game_period ON Plays (game_id, period)",
+]
+
+def create_play_tables(conn):
+    for statement in PLAY_TABLES:
+        conn.execute(statement)
+    conn.commit()
+
+# CFBD's own season / week / seasonType per game. game_date is the UTC start
+# date, so Saturday-night and Labor Day games would land in the wrong week if
+# it were derived from the date (play_by_play.py requests plays by week)
+GAME_WEEK_COLUMNS = [('season', 'INTEGER'), ('week', 'INTEGER'), ('season_type', 'TEXT')]
+
+def add_game_week_columns(conn):
+    """Add GAME_WEEK_COLUMNS to a Games table created before they existed."""
+    have = {row[1] for row in conn.execute("PRAGMA table_info(Games)")}
+    for name, sql_type in GAME_WEEK_COLUMNS:
+        if name not in have:
+            conn.execute(f"ALTER TABLE Games ADD COLUMN {name} {sql_type}")
+    conn.commit()
+
+# Team ratings (ratings.py): current rating per team, pre-game ratings per
+# game (joined into the master dataset) and the parameters they were built with
+RATING_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS Team_Ratings (
+        team_id INTEGER PRIMARY KEY,
+        rating REAL NOT NULL,
+        games INTEGER NOT NULL,
+        FOREIGN KEY (team_id) REFERENCES Teams(team_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Game_Ratings (
+        game_id INTEGER PRIMARY KEY,
+        home_rating REAL NOT NULL,
+        away_rating REAL NOT NULL,
+        home_win_prob REAL NOT NULL,
+        FOREIGN KEY (game_id) REFERENCES Games(game_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Rating_State (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    """,
+]
+
+def create_rating_tables(conn):
+    for statement in RATING_TABLES:
+        conn.execute(statement)
+    conn.commit()
+
+def create_database(db_path='football_weather.db'):
+    conn = connect_db(db_path)
     cursor = conn.cursor()
     
     # 1. NEW: Locations Table (The "Master" list of cities)
@@ -38,6 +132,9 @@ def create_database():
             location_id INTEGER, 
             attendance INTEGER,
             kickoff_time TEXT,
+            season INTEGER,
+            week INTEGER,
+            season_type TEXT,
             FOREIGN KEY (home_team_id) REFERENCES Teams(team_id),
             FOREIGN KEY (away_team_id) REFERENCES Teams(team_id),
             FOREIGN KEY (location_id) REFERENCES Locations(location_id)
@@ -82,12 +179,19 @@ def create_database():
             longitude REAL,
             moon_phase TEXT,
             moon_illumination REAL,
+            moonrise TEXT,
+            moonset TEXT,
+            moon_altitude REAL,
+            moon_azimuth REAL,
             UNIQUE(game_date, location_id),
             FOREIGN KEY (location_id) REFERENCES Locations(location_id)
         )
     ''')
     
-    conn.commit()
+    add_game_week_columns(conn)
+    create_play_tables(conn)
+    create_rating_tables(conn)
+    create_join_indexes(conn)
     conn.close()
 
 if __name__ == '__main__':
@@ -0,0 +1,212 @@
+"""game_query.py
+
+In-memory index over the joined game facts for ad-hoc weather questions like
+"wind > 15 mph, rain, and under 40 F at SEC stadiums".
+
+Built once from `load_data_with_sql_join` (rows keyed by game_id and the
+(game_date, location_id) join keys). Numeric columns get a sorted-column
+index (range filters are two binary searches); categorical columns and the
+weather bins from process_and_analyze get packed bitmaps, so conjunctive
+filters are a few vectorized ANDs.
+
+Example:
+    idx = GameIndex(joined)
+    bits = idx.query(wind_speed__gt=15, precipitation__gt=0,
+                     temperature__lt=40, home_conference='SEC')
+    idx.game_ids(bits); idx.aggregate(bits)
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from utils import connect_db
+from process_and_analyze import (load_data_with_sql_join, cut_bins, TEMP_BINS, TEMP_LABELS,
+                                 WIND_BINS, WIND_LABELS, MOON_BINS, MOON_LABELS)
+
+NUMERIC_COLUMNS = ['temperature', 'wind_speed', 'precipitation', 'moon_illumination',
+                   'aqi', 'home_score', 'away_score', 'total_points']
+CATEGORY_COLUMNS = ['stadium_city', 'home_conference', 'home_team_name',
+                    'away_team_name', 'moon_phase', 'location_id']
+# every bitmap-indexed column: the categories plus the derived weather bins
+BITMAP_COLUMNS = CATEGORY_COLUMNS + ['temp_bin', 'wind_bin', 'moon_bin', 'condition']
+# bitmap columns keyed by integers: filter values from text are converted
+INTEGER_COLUMNS = ['location_id']
+OPERATORS = ('gt', 'ge', 'lt', 'le', 'eq')
+
+
+class GameIndex:
+    """Sorted-column indexes + bitmap indexes over one joined DataFrame."""
+
+    def __init__(self, joined: pd.DataFrame):
+        self.n = len(joined)
+        self.game_id = joined['game_id'].to_numpy() if 'game_id' in joined.columns else np.arange(self.n)
+        self.game_date = joined['game_date'].to_numpy()
+        self.location_id = joined['location_id'].to_numpy() if 'location_id' in joined.columns else None
+        self.home_score = pd.to_numeric(joined['home_score'], errors='coerce').to_numpy(dtype=float)
+        self.away_score = pd.to_numeric(joined['away_score'], errors='coerce').to_numpy(dtype=float)
+
+        # column -> (row order sorted by value, sorted values) ; NaNs excluded
+        self.sorted_index = {}
+        for col in NUMERIC_COLUMNS:
+            if col not in joined.columns:
+                continue
+            values = pd.to_numeric(joined[col], errors='coerce').to_numpy(dtype=float)
+            valid = np.flatnonzero(~np.isnan(values))
+            order = valid[np.argsort(values[valid], kind='stable')]
+            self.sorted_index[col] = (order, values[order])
+
+        # column -> {value: packed bitmap}
+        self.bitmaps = {}
+        for col in CATEGORY_COLUMNS:
+            if col in joined.columns:
+                self._add_bitmaps(col, joined[col])
+
+        # Same bins as the compute_* functions
+        temp = pd.to_numeric(joined.get('temperature'), errors='coerce')
+        wind = pd.to_numeric(joined.get('wind_speed'), errors='coerce')
+        moon = pd.to_numeric(joined.get('moon_illumination'), errors='coerce') / 100.0
+        precip = pd.to_numeric(joined.get('precipitation'), errors='coerce')
+        self._add_bitmaps('temp_bin', cut_bins(temp, TEMP_BINS, TEMP_LABELS))
+        self._add_bitmaps('wind_bin', cut_bins(wind, WIND_BINS, WIND_LABELS))
+        self._add_bitmaps('moon_bin', cut_bins(moon, MOON_BINS, MOON_LABELS, include_lowest=True))
+        self._add_bitmaps('condition', precip.fillna(0).gt(0).map({True: 'Rainy', False: 'Dry'}))
+
+        self.all_bits = np.packbits(np.ones(self.n, dtype=bool))
+
+    def _add_bitmaps(self, col, series):
+        codes, uniques = pd.factorize(pd.Series(series).astype(object), sort=True)
+        maps = {}
+        for code, value in enumerate(uniques):
+            maps[value] = np.packbits(codes == code)
+        self.bitmaps[col] = maps
+
+    def _rows_to_bits(self, rows):
+        mask = np.zeros(self.n, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+
+    def range(self, col, op, value):
+        """Bitmap of rows where `col <op> value` (op in gt/ge/lt/le/eq)."""
+        if col not in self.sorted_index:
+            raise KeyError(f"No sorted index for column '{col}'")
+        order, sorted_vals = self.sorted_index[col]
+        if op == 'gt':
+            lo, hi = np.searchsorted(sorted_vals, value, side='right'), len(order)
+        elif op == 'ge':
+            lo, hi = np.searchsorted(sorted_vals, value, side='left'), len(order)
+        elif op == 'lt':
+            lo, hi = 0, np.searchsorted(sorted_vals, value, side='left')
+        elif op == 'le':
+            lo, hi = 0, np.searchsorted(sorted_vals, value, side='right')
+        elif op == 'eq':
+            lo = np.searchsorted(sorted_vals, value, side='left')
+            hi = np.searchsorted(sorted_vals, value, side='right')
+        else:
+            raise ValueError(f"Unknown operator '{op}' (use {', '.join(OPERATORS)})")
+        return self._rows_to_bits(order[lo:hi])
+
+    def equals(self, col, values):
+        """Bitmap of rows where `col` is `values` (a single value or a list)."""
+        if col not in self.bitmaps:
+            raise KeyError(f"No bitmap index for column '{col}'")
+        if not isinstance(values, (list, tuple, set)):
+            values = [values]
+        bits = np.zeros_like(self.all_bits)
+        for v in values:
+            b = self.bitmaps[col].get(v)
+            if b is not None:
+                bits |= b
+        return bits
+
+    def query(self, **filters):
+        """
+        AND of all filters. Keyword forms:
+            column=value / column=[v1, v2]   (bitmap columns; __eq is the same)
+            column__gt=x, __ge, __lt, __le, __eq   (numeric columns)
+        """
+        bits = self.all_bits.copy()
+        for key, value in filters.items():
+            col, _, op = key.partition('__')
+            if op == 'eq' and col in self.bitmaps:
+                bits &= self.equals(col, value)
+            elif op:
+                bits &= self.range(col, op, value)
+            else:
+                bits &= self.equals(col, value)
+        return bits
+
+    def rows(self, bits):
+        return np.flatnonzero(np.unpackbits(bits, count=self.n))
+
+    def count(self, bits):
+        return int(np.unpackbits(bits, count=self.n).sum())
+
+    def game_ids(self, bits):
+        return self.game_id[self.rows(bits)]
+
+    def keys(self, bits):
+        """(game_date, location_id) join keys of the matching games."""
+        rows = self.rows(bits)
+        loc = self.location_id[rows] if self.location_id is not None else [None] * len(rows)
+        return list(zip(self.game_date[rows], loc))
+
+    def aggregate(self, bits):
+        rows = self.rows(bits)
+        home = self.home_score[rows]
+        away = self.away_score[rows]
+        n = len(rows)
+        return {
+            'count': n,
+            'avg_total_points': float(np.mean(home + away)) if n else np.nan,
+            'home_win_pct': float(np.mean(home > away)) if n else np.nan,
+        }
+
+
+def build_index(conn=None):
+    own_conn = conn is None
+    if own_conn:
+        conn = connect_db()
+    joined = load_data_with_sql_join(conn)
+    if own_conn:
+        conn.close()
+    return GameIndex(joined)
+
+
+def _parse_filter(text):
+    """'wind_speed__gt=15' -> ('wind_speed__gt', 15.0); bitmap column values
+    (plain or __eq) stay strings except in INTEGER_COLUMNS ('location_id=1' ->
+    ('location_id', 1)). Unknown operators raise ValueError."""
+    key, _, value = text.partition('=')
+    col, _, op = key.partition('__')
+    if op and op not in OPERATORS:
+        raise ValueError(f"Unknown operator '{op}' in '{key}' (use {', '.join(OPERATORS)})")
+    if op and col in BITMAP_COLUMNS and op != 'eq':
+        raise ValueError(f"'{col}' only supports equality ({col}=value or {col}__eq=value)")
+    if op and col not in BITMAP_COLUMNS:
+        return key, float(value)
+    values = value.split(',')
+    if col in INTEGER_COLUMNS:
+        values = [int(v) for v in values]
+    return key, values if len(values) > 1 else values[0]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query games by weather conditions')
+    parser.add_argument('filters', nargs='*',
+                        help="e.g. wind_speed__gt=15 precipitation__gt=0 home_conference=SEC")
+    args = parser.parse_args()
+
+    idx = build_index()
+    try:
+        filters = dict(_parse_filter(f) for f in args.filters)
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+
+    start = time.perf_counter()
+    bits = idx.query(**filters)
+    elapsed_us = (time.perf_counter() - start) * 1e6
+
+    print(f"Matched {idx.count(bits)} of {idx.n} games in {elapsed_us:.0f} µs")
+    print(idx.aggregate(bits))
+    print("Game IDs:", idx.game_ids(bits).tolist())
@@ -0,0 +1,210 @@
+"""metrics.py
+
+Lightweight run metrics: counters, latency histograms and spans, exported
+as JSON and Prometheus text at the end of a run. Standard library only, so
+importing it costs nothing and it is always on.
+
+    import metrics
+
+    with metrics.span('compute', stage='points_by_temp'):   # -> compute_seconds{stage=...}
+        ...
+    metrics.inc('db_rows_written_total', table='Games')
+    response = metrics.http_get('open_meteo', url, params=params)
+
+    metrics.export_on_exit('weather')   # outputs/metrics/weather.json + weather.prom
+
+Instrumented today: HTTP calls per source (collectors), DB writes
+(collectors), each pipeline step in run_analysis, and each chart render.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+
+METRICS_DIR = os.path.join('outputs', 'metrics')
+# Seconds; wide enough for sub-ms compute steps and multi-second API calls
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MAX_SPANS = 10_000
+
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> value
+_histograms = {}   # (name, labels) -> [bucket counts..., +Inf count], sum
+_spans = deque(maxlen=MAX_SPANS)
+_local = threading.local()
+_started = time.time()
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Add `value` to a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    """Record one latency observation in a histogram."""
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist['buckets'][i] += 1
+                break
+        else:
+            hist['buckets'][-1] += 1
+        hist['sum'] += seconds
+        hist['count'] += 1
+
+
+class span:
+    """Time a block: records a span and a `<name>_seconds` histogram observation.
+
+    Spans nest per thread; each records its parent's name. Errors are counted
+    in `<name>_errors_total` and re-raised.
+    """
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.start = time.perf_counter()
+        self.wall_start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self.start
+        _local.stack.pop()
+        observe(f"{self.name}_seconds", self.seconds, **self.labels)
+        if exc_type is not None:
+            inc(f"{self.name}_errors_total", **self.labels)
+        with _lock:
+            _spans.append({'name': self.name, 'labels': {k: str(v) for k, v in self.labels.items()},
+                           'parent': self.parent, 'start': round(self.wall_start - _started, 6),
+                           'seconds': round(self.seconds, 6), 'error': exc_type is not None})
+        return False
+
+
+def http_get(source, url, **kwargs):
+    """requests.get timed as http_request_seconds{source}, counted by status; 200s are archived."""
+    import requests  # lazy: keeps `cli.py stats` from paying for it
+    with span('http_request', source=source):
+        try:
+            response = requests.get(url, **kwargs)
+        except Exception:
+            inc('http_responses_total', source=source, status='error')
+            raise
+    inc('http_responses_total', source=source, status=response.status_code)
+    if response.status_code == 200:
+        _archive(source, url, kwargs.get('params'), response.content)
+    return response
+
+
+def _archive(source, url, params, body):
+    """Keep the raw body in payload_archive.py; never fails the request."""
+    import payload_archive
+    if not payload_archive.enabled():
+        return
+    try:
+        with span('archive_write', source=source):
+            payload_archive.record(source, url, params, body)
+    except Exception:
+        inc('archive_errors_total', source=source)
+
+
+def reset():
+    global _started
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _spans.clear()
+        _started = time.time()
+
+
+def snapshot():
+    """All metrics as a JSON-serializable dict."""
+    labels = lambda key: dict(key[1])
+    with _lock:
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(_started)),
+            'duration_s': round(time.time() - _started, 3),
+            'counters': [{'name': k[0], 'labels': labels(k), 'value': v} for k, v in sorted(_counters.items())],
+            'histograms': [{'name': k[0], 'labels': labels(k), 'count': h['count'], 'sum': round(h['sum'], 6),
+                            'buckets': dict(zip([str(b) for b in BUCKETS] + ['+Inf'], h['buckets']))}
+                           for k, h in sorted(_histograms.items())],
+            'spans': list(_spans),
+        }
+
+
+def _prom_labels(pairs):
+    if not pairs:
+        return ''
+    escaped = [(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pairs]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+def to_prometheus():
+    """Prometheus text exposition format (counters + cumulative histograms)."""
+    lines = []
+    with _lock:
+        typed = set()
+        for (name, pairs), value in sorted(_counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_prom_labels(pairs)} {value}")
+        for (name, pairs), hist in sorted(_histograms.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, n in zip([str(b) for b in BUCKETS] + ['+Inf'], hist['buckets']):
+                cumulative += n
+                lines.append(f"{name}_bucket{_prom_labels(pairs + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_prom_labels(pairs)} {hist['sum']:.6f}")
+            lines.append(f"{name}_count{_prom_labels(pairs)} {hist['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+def write(run, directory=METRICS_DIR):
+    """Write <directory>/<run>.json and <run>.prom; returns the JSON path."""
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, run)
+    data = snapshot()
+    data['run'] = run
+    for path, text in ((base + '.json', json.dumps(data, indent=2)), (base + '.prom', to_prometheus())):
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, path)
+    return base + '.json'
+
+
+def export_on_exit(run, directory=METRICS_DIR):
+    """Write the metrics files when the process exits (also after an error)."""
+    atexit.register(write, run, directory)
+
+
+def summary(top=10):
+    """Printable table of the slowest histograms by total time."""
+    with _lock:
+        rows = sorted(((h['sum'], h['count'], name, dict(pairs)) for (name, pairs), h in _histograms.items()),
+                      key=lambda r: r[0], reverse=True)[:top]
+    out = [f"{'total s':>9} {'count':>7} {'mean ms':>9}  metric"]
+    for total, count, name, labels in rows:
+        tag = ','.join(f"{k}={v}" for k, v in labels.items())
+        out.append(f"{total:>9.3f} {count:>7} {total / count * 1000:>9.2f}  {name}{{{tag}}}")
+    return '\n'.join(out)
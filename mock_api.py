@@ -0,0 +1,414 @@
+"""mock_api.py
+
+Local stand-in for the four external APIs the collectors call, so ingestion
+throughput and retry behavior can be measured offline and reproducibly.
+
+One server answers every route, with the response shapes the collectors read:
+
+    GET /games              CollegeFootballData  (get_games_from_api)
+    GET /venues             CollegeFootballData  (get_venues_from_api)
+    GET /plays              CollegeFootballData  (get_plays_from_api)
+    GET /v1/archive         Open-Meteo archive   (get_weather_from_api)
+    GET /v1/air-quality     Open-Meteo AQ        (get_air_quality_from_api)
+    GET /v2/astronomy       ipgeolocation        (get_moon_phase_from_api)
+    GET /__stats            request counts per route and status
+
+Payloads are generated from a hash of the route + query, so the same request
+always gets the same answer. Latency (mean + jitter), a 5xx error rate and a
+token-bucket rate limit (429 + Retry-After once the bucket is empty) are
+configurable.
+
+    python mock_api.py --port 8799 --latency-ms 50 --error-rate 0.02 --rate-limit 20
+    CFBD_BASE_URL=http://127.0.0.1:8799 COLLECTOR_DELAY=0 python college_football.py
+
+    python mock_api.py --bench --runs 4     # ingestion benchmark -> outputs/bench_ingest.json
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+CONFERENCES = ['SEC', 'Big Ten', 'ACC', 'Big 12']
+GAMES_PER_WEEK = 60
+SEASON_START = date(2024, 8, 31)
+BENCH_DIR = os.path.join('outputs', 'bench', 'ingest')
+REPORT_PATH = os.path.join('outputs', 'bench_ingest.json')
+# collector script -> (table it fills, base-URL environment variable)
+COLLECTORS = {
+    'college_football.py': ('Games', 'CFBD_BASE_URL'),
+    'play_by_play.py': ('Plays', 'CFBD_BASE_URL'),
+    'weather_data.py': ('Weather', 'WEATHER_BASE_URL'),
+    'air_quality.py': ('AirQuality', 'AIR_QUALITY_BASE_URL'),
+    'moon_data.py': ('Moon_Data', 'IPGEOLOCATION_BASE_URL'),
+}
+
+
+def _rng(path, params):
+    """Deterministic RNG per (route, query)."""
+    key = path + '?' + '&'.join(f"{k}={v}" for k, v in sorted(params.items()))
+    return random.Random(int(hashlib.sha256(key.encode()).hexdigest()[:16], 16))
+
+
+# --- PAYLOADS ---
+
+def games_payload(params):
+    import venues
+    rng = _rng('/games', params)
+    year, week = int(params.get('year', 2024)), int(params.get('week', 1))
+    kickoff = SEASON_START.replace(year=year) + timedelta(days=7 * (week - 1))
+    tracked = [name for name, *_ in venues.BUILTIN]
+    games = []
+    for i in range(GAMES_PER_WEEK):
+        # Roughly a third of games are at the built-in stadiums; the rest are
+        # at venues only /venues knows about, like the real feed
+        if i % 3 == 0:
+            k = (week * 7 + i) % len(tracked)
+            venue, venue_id = tracked[k], k + 1
+        else:
+            venue, venue_id = f"Stadium {i}", 1000 + i
+        final = rng.random() > 0.05
+        games.append({
+            'id': year * 100_000 + week * 1_000 + i,
+            'season': year,
+            'week': week,
+            'seasonType': params.get('seasonType', 'regular'),
+            'startDate': f"{kickoff.isoformat()}T{rng.choice(['16', '19', '23'])}:30:00.000Z",
+            'completed': final,
+            'venue': venue,
+            'venueId': venue_id,
+            'homeTeam': f"Home {week}-{i}",
+            'homeConference': rng.choice(CONFERENCES),
+            'homePoints': rng.randint(10, 56) if final else None,
+            'awayTeam': f"Away {week}-{i}",
+            'awayConference': rng.choice(CONFERENCES),
+            'awayPoints': rng.randint(3, 49) if final else None,
+            'attendance': rng.randint(20_000, 107_000) if final else None,
+        })
+    return games
+
+
+# CFBD playType names with relative frequency and (mean, sd) yards gained
+PLAY_TYPES = [
+    ('Rush', 38, (4.5, 6)), ('Rushing Touchdown', 1.5, (8, 10)),
+    ('Pass Reception', 20, (11, 9)), ('Pass Incompletion', 14, (0, 0)), ('Passing Touchdown', 1.5, (20, 15)),
+    ('Sack', 2.5, (-7, 3)), ('Pass Interception Return', 1, (0, 0)),
+    ('Punt', 5, (0, 0)), ('Kickoff', 5, (0, 0)), ('Field Goal Good', 1.5, (0, 0)),
+    ('Field Goal Missed', 0.5, (0, 0)), ('Extra Point Good', 3, (0, 0)), ('Penalty', 5, (-5, 5)),
+    ('Fumble Recovery (Opponent)', 0.5, (0, 0)), ('Timeout', 1, (0, 0)),
+]
+
+
+def plays_payload(params):
+    """~150 plays for each game games_payload returns for the same year/week."""
+    rng = _rng('/plays', params)
+    names = [name for name, _, _ in PLAY_TYPES]
+    weights = [w for _, w, _ in PLAY_TYPES]
+    yards = {name: spread for name, _, spread in PLAY_TYPES}
+    plays = []
+    for game in games_payload(params):
+        if not game['completed']:
+            continue
+        teams = [(game['homeTeam'], game['homeConference']), (game['awayTeam'], game['awayConference'])]
+        for k in range(rng.randint(130, 175)):
+            play_type = rng.choices(names, weights)[0]
+            mean, sd = yards[play_type]
+            (offense, off_conf), (defense, def_conf) = teams[(k // 6) % 2], teams[1 - (k // 6) % 2]
+            plays.append({
+                'id': game['id'] * 1000 + k,
+                'gameId': game['id'],
+                'driveId': game['id'] * 100 + k // 6,
+                'offense': offense, 'offenseConference': off_conf,
+                'defense': defense, 'defenseConference': def_conf,
+                'period': min(4, 1 + k * 4 // 160),
+                'clock': {'minutes': rng.randint(0, 14), 'seconds': rng.randint(0, 59)},
+                'down': rng.randint(1, 4), 'distance': rng.randint(1, 15),
+                'yardsToGoal': rng.randint(1, 99),
+                'yardsGained': round(rng.gauss(mean, sd)) if sd else mean,
+                'scoring': 'Touchdown' in play_type or 'Good' in play_type,
+                'playType': play_type,
+                'playText': f"{offense} {play_type.lower()} play {k}",
+            })
+    return plays
+
+
+def venues_payload(params):
+    """The built-in venues plus one synthetic venue per 'Stadium {i}' in games_payload."""
+    import venues
+    out = [{'id': k + 1, 'name': name, 'city': city, 'state': state, 'location': {'x': lat, 'y': lon},
+            'timezone': tz, 'dome': False}
+           for k, (name, city, state, lat, lon, tz, _) in enumerate(venues.BUILTIN)]
+    rng = _rng('/venues', {})
+    for i in range(GAMES_PER_WEEK):
+        if i % 3:
+            lat, lon = round(rng.uniform(26, 47), 4), round(rng.uniform(-120, -72), 4)
+            tz = 'America/New_York' if lon > -85 else 'America/Chicago' if lon > -102 else 'America/Denver'
+            out.append({'id': 1000 + i, 'name': f"Stadium {i}", 'city': f"Town {i}", 'state': 'US',
+                        'location': {'x': lat, 'y': lon}, 'timezone': tz, 'dome': i % 7 == 0})
+    return out
+
+
+def _hours(day):
+    return [f"{day}T{h:02d}:00" for h in range(24)]
+
+
+def weather_payload(params):
+    rng = _rng('/v1/archive', params)
+    day = params.get('start_date', SEASON_START.isoformat())
+    base = 85 - (float(params.get('latitude', 35)) - 25) * 1.5
+    rainy = rng.random() < 0.2
+    return {
+        'latitude': float(params.get('latitude', 0)),
+        'longitude': float(params.get('longitude', 0)),
+        'timezone': params.get('timezone', 'GMT'),
+        'hourly_units': {'temperature_2m': '°F', 'wind_speed_10m': 'mp/h', 'precipitation': 'inch'},
+        'hourly': {
+            'time': _hours(day),
+            'temperature_2m': [round(base + 10 * math.sin((h - 9) / 24 * 2 * math.pi) + rng.gauss(0, 2), 1)
+                               for h in range(24)],
+            'relative_humidity_2m': [rng.randint(30, 95) for _ in range(24)],
+            'precipitation': [round(rng.expovariate(8), 3) if rainy else 0.0 for _ in range(24)],
+            'wind_speed_10m': [round(rng.gammavariate(2, 4), 1) for _ in range(24)],
+            'weather_code': [61 if rainy else rng.choice([0, 1, 2, 3]) for _ in range(24)],
+        },
+    }
+
+
+def air_quality_payload(params):
+    rng = _rng('/v1/air-quality', params)
+    day = params.get('start_date', SEASON_START.isoformat())
+    level = rng.gammavariate(3, 12)
+    return {
+        'latitude': float(params.get('latitude', 0)),
+        'longitude': float(params.get('longitude', 0)),
+        'hourly_units': {'us_aqi': 'USAQI', 'pm2_5': 'μg/m³', 'pm10': 'μg/m³'},
+        'hourly': {
+            'time': _hours(day),
+            'us_aqi': [max(0, round(level + rng.gauss(0, 5))) for _ in range(24)],
+            'pm2_5': [round(level / 4 + rng.random(), 1) for _ in range(24)],
+            'pm10': [round(level / 3 + rng.random(), 1) for _ in range(24)],
+        },
+    }
+
+
+def astronomy_payload(params):
+    rng = _rng('/v2/astronomy', params)
+    day = date.fromisoformat(params.get('date', SEASON_START.isoformat()))
+    cycle = ((day - date(2000, 1, 6)).days % 29.53) / 29.53   # 2000-01-06 was a new moon
+    illumination = 50 * (1 - math.cos(2 * math.pi * cycle))
+    waxing = cycle < 0.5
+    if illumination < 3:
+        phase = 'NEW_MOON'
+    elif illumination > 97:
+        phase = 'FULL_MOON'
+    elif abs(illumination - 50) <= 3:
+        phase = 'FIRST_QUARTER' if waxing else 'LAST_QUARTER'
+    elif illumination < 50:
+        phase = 'WAXING_CRESCENT' if waxing else 'WANING_CRESCENT'
+    else:
+        phase = 'WAXING_GIBBOUS' if waxing else 'WANING_GIBBOUS'
+    return {
+        'location': {'location_string': params.get('location', ''), 'country_name': 'United States',
+                     'latitude': f"{rng.uniform(29, 44):.5f}", 'longitude': f"{rng.uniform(-123, -77):.5f}"},
+        'astronomy': {
+            'date': day.isoformat(),
+            'moon_phase': phase,
+            'moon_illumination_percentage': f"{illumination:.2f}",
+            'moonrise': f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            'moonset': f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            'moon_altitude': round(rng.uniform(-90, 90), 4),
+            'moon_azimuth': round(rng.uniform(0, 360), 4),
+        },
+    }
+
+
+ROUTES = {
+    '/games': games_payload,
+    '/venues': venues_payload,
+    '/plays': plays_payload,
+    '/v1/archive': weather_payload,
+    '/v1/air-quality': air_quality_payload,
+    '/v2/astronomy': astronomy_payload,
+}
+
+
+# --- SERVER ---
+
+class MockBehavior:
+    """Latency, failure injection and rate limiting shared by all handler threads."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, rate_limit=0.0, burst=None, seed=0):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit          # requests/sec, 0 = unlimited
+        self.burst = burst or max(1.0, rate_limit)
+        self.tokens = self.burst
+        self.refilled = time.monotonic()
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def admit(self):
+        """(status or None, retry_after seconds). None means serve normally."""
+        with self.lock:
+            if self.rate_limit:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate_limit)
+                self.refilled = now
+                if self.tokens < 1:
+                    return 429, (1 - self.tokens) / self.rate_limit
+                self.tokens -= 1
+            if self.error_rate and self.rng.random() < self.error_rate:
+                return 503, 0
+            return None, 0
+
+    def delay(self):
+        with self.lock:
+            d = self.latency + (self.rng.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+        if d > 0:
+            time.sleep(d)
+
+    def count(self, route, status):
+        with self.lock:
+            by_status = self.stats.setdefault(route, {})
+            by_status[str(status)] = by_status.get(str(status), 0) + 1
+
+
+def make_handler(behavior):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, payload, headers=()):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in headers:
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = dict(parse_qsl(url.query))
+            if url.path == '/__stats':
+                with behavior.lock:
+                    return self._send(200, behavior.stats)
+            if url.path not in ROUTES:
+                behavior.count(url.path, 404)
+                return self._send(404, {'error': True, 'reason': 'Not Found'})
+
+            behavior.delay()
+            status, retry_after = behavior.admit()
+            behavior.count(url.path, status or 200)
+            if status == 429:
+                return self._send(429, {'error': True, 'reason': 'Too Many Requests'},
+                                  [('Retry-After', f"{math.ceil(retry_after)}")])
+            if status:
+                return self._send(status, {'error': True, 'reason': 'Injected failure'})
+            self._send(200, ROUTES[url.path](params))
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_server(port=8799, **behavior_kwargs):
+    """Start the mock in a background thread; returns (server, behavior)."""
+    behavior = MockBehavior(**behavior_kwargs)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(behavior))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, behavior
+
+
+# --- INGESTION BENCHMARK ---
+
+def _count(db_path, table):
+    from utils import connect_db
+    conn = connect_db(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def bench_ingest(runs=4, port=8799, report_path=REPORT_PATH, **behavior_kwargs):
+    """
+    Run each collector `runs` times against the mock in a scratch database and
+    report wall time, rows stored, rows/sec and the status codes served.
+    """
+    from createdatabase import create_database
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    db_path = os.path.join(BENCH_DIR, 'football_weather.db')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    create_database(db_path)
+
+    server, behavior = start_server(port, **behavior_kwargs)
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, COLLECTOR_DELAY='0', **{var: url for _, var in COLLECTORS.values()})
+    report = {'runs': runs, 'behavior': behavior_kwargs, 'collectors': {}}
+    try:
+        for script, (table, _) in COLLECTORS.items():
+            before = _count(db_path, table)
+            start = time.perf_counter()
+            for _ in range(runs):
+                subprocess.run([sys.executable, os.path.join(here, script)], cwd=BENCH_DIR, env=env,
+                               stdout=subprocess.DEVNULL, check=True)
+            wall = time.perf_counter() - start
+            rows = _count(db_path, table) - before
+            report['collectors'][script] = {
+                'wall_s': round(wall, 3),
+                'rows': rows,
+                'rows_per_s': round(rows / wall, 1) if wall else None,
+            }
+            print(f"  {script:<22}{rows:>6} rows in {wall:>7.2f}s ({rows / wall:,.1f} rows/s)")
+    finally:
+        server.shutdown()
+    report['requests'] = behavior.stats
+
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Saved {report_path}")
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local mock of the CFBD / Open-Meteo / ipgeolocation APIs')
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Mean added latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Uniform +/- jitter on the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered 503')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='Requests/sec before 429s (0 = off)')
+    parser.add_argument('--burst', type=float, default=None, help='Token bucket size (default: rate limit)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--bench', action='store_true', help='Run the ingestion benchmark and exit')
+    parser.add_argument('--runs', type=int, default=4, help='Collector runs per source in --bench')
+    args = parser.parse_args()
+
+    behavior = dict(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                    rate_limit=args.rate_limit, burst=args.burst, seed=args.seed)
+    if args.bench:
+        bench_ingest(args.runs, args.port, **behavior)
+    else:
+        server, _ = start_server(args.port, **behavior)
+        print(f"✅ Mock APIs on http://127.0.0.1:{args.port}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
@@ -2,56 +2,31 @@
 # BONUS API #2 - Moon Phase Data Collection using IP Geolocation
 # Run this 4+ times to collect 100+ moon phase records
 
+import os
 import sqlite3
-import requests
 from datetime import datetime, timedelta
 import time
+import metrics
+import profiling
+from utils import connect_db
+import venues
 
-# Cities matching football/weather/AQ/UV data (25 cities)
-CITIES = {
-    # Original 10 cities
-    'Ann Arbor': {'lat': 42.2808, 'lon': -83.7430},
-    'Columbus': {'lat': 40.0012, 'lon': -83.0302},
-    'State College': {'lat': 40.7982, 'lon': -77.8599},
-    'Madison': {'lat': 43.0731, 'lon': -89.4012},
-    'Iowa City': {'lat': 41.6611, 'lon': -91.5302},
-    'Eugene': {'lat': 44.0521, 'lon': -123.0868},
-    'Austin': {'lat': 30.2849, 'lon': -97.7341},
-    'Tuscaloosa': {'lat': 33.2098, 'lon': -87.5692},
-    'Athens': {'lat': 33.9519, 'lon': -83.3576},
-    'Baton Rouge': {'lat': 30.4515, 'lon': -91.1871},
-    
-    # Big Ten additions (11-15)
-    'East Lansing': {'lat': 42.7370, 'lon': -84.4839},
-    'Lincoln': {'lat': 40.8136, 'lon': -96.7026},
-    'Champaign': {'lat': 40.1164, 'lon': -88.2434},
-    'West Lafayette': {'lat': 40.4259, 'lon': -86.9081},
-    'Bloomington': {'lat': 39.1653, 'lon': -86.5264},
-    
-    # SEC/Big 12 additions (16-20)
-    'Knoxville': {'lat': 35.9606, 'lon': -83.9207},
-    'Auburn': {'lat': 32.5990, 'lon': -85.4808},
-    'College Station': {'lat': 30.6280, 'lon': -96.3344},
-    'Starkville': {'lat': 33.4504, 'lon': -88.8184},
-    'Columbia': {'lat': 34.0007, 'lon': -81.0348},
-    
-    # Additional major programs (21-25)
-    'Gainesville': {'lat': 29.6516, 'lon': -82.3248},
-    'Tallahassee': {'lat': 30.4383, 'lon': -84.2807},
-    'Blacksburg': {'lat': 37.2296, 'lon': -80.4139},
-    'Clemson': {'lat': 34.6834, 'lon': -82.8374},
-    'Atlanta': {'lat': 33.7756, 'lon': -84.3963},
-}
+# Point at a local stand-in (mock_api.py) with IPGEOLOCATION_BASE_URL=http://127.0.0.1:8799
+IPGEOLOCATION_BASE_URL = os.environ.get('IPGEOLOCATION_BASE_URL', 'https://api.ipgeolocation.io')
+REQUEST_DELAY = float(os.environ.get('COLLECTOR_DELAY', 1))
+
+# Cities with a registered venue (venues.py); same list as the other collectors
+CITIES = venues.city_coords()
 
 # Add this to your config.py
 IPGEOLOCATION_KEY = "2313acdb637c40db840995cd5da683ed"
 
-def get_moon_phase_from_api(lat, lon, date, city):
+def get_moon_phase_from_api(lat, lon, date, city, base_url=None):
     """
     Get moon phase data from IP Geolocation Astronomy API
     URL: https://api.ipgeolocation.io/v2/astronomy?apiKey={key}&location={location}&date={date}
     """
-    url = "https://api.ipgeolocation.io/v2/astronomy"
+    url = f"{base_url or IPGEOLOCATION_BASE_URL}/v2/astronomy"
     
     # Format location as "City, State" or just city name
     location = f"{city}, US"
@@ -63,7 +38,7 @@ def get_moon_phase_from_api(lat, lon, date, city):
     }
     
     try:
-        response = requests.get(url, params=params)
+        response = metrics.http_get('ipgeolocation', url, params=params)
         
         if response.status_code == 200:
             return response.json()
@@ -76,7 +51,7 @@ def get_moon_phase_from_api(lat, lon, date, city):
 
 def create_moon_table():
     """Create moon phase table if it doesn't exist"""
-    conn = sqlite3.connect('football_weather.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -100,11 +75,34 @@ def create_moon_table():
     conn.close()
     print("✅ Moon_Data table created/verified")
 
+def extract_moon(moon_data):
+    """Moon fields from an astronomy response (None if it has no 'astronomy' block)"""
+    if not moon_data or 'astronomy' not in moon_data:
+        return None
+    astronomy = moon_data['astronomy']
+    moon_illumination = astronomy.get('moon_illumination_percentage')
+    if isinstance(moon_illumination, str):
+        try: moon_illumination = float(moon_illumination)
+        except: moon_illumination = None
+    
+    # Location info from API
+    location_data = moon_data.get('location', {})
+    return {
+        'latitude': location_data.get('latitude'),
+        'longitude': location_data.get('longitude'),
+        'moon_phase': astronomy.get('moon_phase', 'Unknown'),
+        'moon_illumination': moon_illumination,
+        'moonrise': astronomy.get('moonrise', '-:-'),
+        'moonset': astronomy.get('moonset', '-:-'),
+        'moon_altitude': astronomy.get('moon_altitude'),
+        'moon_azimuth': astronomy.get('moon_azimuth'),
+    }
+
 def show_database_stats():
     """
     Show current database statistics
     """
-    conn = sqlite3.connect('football_weather.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
     # Total count
@@ -141,11 +139,28 @@ def get_or_create_location(cursor, city_name):
     cursor.execute("INSERT INTO Locations (city_name) VALUES (?)", (city_name,))
     return cursor.lastrowid
 
+def insert_moon(cursor, date, city, moon):
+    """Insert one extract_moon() result for city on date"""
+    # 1. Get Location ID
+    loc_id = get_or_create_location(cursor, city)
+
+    # 2. Insert using location_id
+    with metrics.span('db_write', table='Moon_Data'):
+        cursor.execute('''
+            INSERT INTO Moon_Data 
+            (game_date, location_id, latitude, longitude, moon_phase, 
+             moon_illumination, moonrise, moonset, moon_altitude, moon_azimuth)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (date, loc_id, moon['latitude'], moon['longitude'], moon['moon_phase'],
+              moon['moon_illumination'], moon['moonrise'], moon['moonset'],
+              moon['moon_altitude'], moon['moon_azimuth']))
+    metrics.inc('db_rows_written_total', table='Moon_Data')
+
 def store_moon_data():
     """Store up to 25 moon phase records per run"""
     create_moon_table() # Ensure table exists
     
-    conn = sqlite3.connect('football_weather.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
     cursor.execute("SELECT COUNT(*) FROM Moon_Data")
@@ -197,49 +212,25 @@ def store_moon_data():
         
         moon_data = get_moon_phase_from_api(coords['lat'], coords['lon'], date, city)
         
-        if moon_data and 'astronomy' in moon_data:
-            astronomy = moon_data['astronomy']
-            moon_phase = astronomy.get('moon_phase', 'Unknown')
-            moon_illumination = astronomy.get('moon_illumination_percentage')
-            moonrise = astronomy.get('moonrise', '-:-')
-            moonset = astronomy.get('moonset', '-:-')
-            moon_altitude = astronomy.get('moon_altitude')
-            moon_azimuth = astronomy.get('moon_azimuth')
-            
-            # Location info from API
-            location_data = moon_data.get('location', {})
-            returned_lat = location_data.get('latitude')
-            returned_lon = location_data.get('longitude')
-            
-            if isinstance(moon_illumination, str):
-                try: moon_illumination = float(moon_illumination)
-                except: moon_illumination = None
-            
+        moon = extract_moon(moon_data)
+        
+        if moon:
             try:
-                # 1. Get Location ID
-                loc_id = get_or_create_location(cursor, city)
-
-                # 2. Insert using location_id
-                cursor.execute('''
-                    INSERT INTO Moon_Data 
-                    (game_date, location_id, latitude, longitude, moon_phase, 
-                     moon_illumination, moonrise, moonset, moon_altitude, moon_azimuth)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (date, loc_id, returned_lat, returned_lon, moon_phase,
-                      moon_illumination, moonrise, moonset, moon_altitude, moon_azimuth))
+                insert_moon(cursor, date, city, moon)
                 
                 stored_count += 1
-                illum_str = f"{moon_illumination:.1f}%" if moon_illumination else "N/A"
-                print(f"✓ {moon_phase}, {illum_str}")
+                illum_str = f"{moon['moon_illumination']:.1f}%" if moon['moon_illumination'] else "N/A"
+                print(f"✓ {moon['moon_phase']}, {illum_str}")
                 
             except sqlite3.IntegrityError:
                 print(f"✗ Duplicate")
         else:
             print(f"✗ No data")
         
-        time.sleep(1)
+        time.sleep(REQUEST_DELAY)
     
-    conn.commit()
+    with metrics.span('db_commit', table='Moon_Data'):
+        conn.commit()
     cursor.execute("SELECT COUNT(*) FROM Moon_Data")
     final_count = cursor.fetchone()[0]
     conn.close()
@@ -250,4 +241,7 @@ def store_moon_data():
     show_database_stats()
 
 if __name__ == '__main__':
-    store_moon_data()
\ No newline at end of file
+    metrics.export_on_exit('moon')
+    profiling.enable_from_argv('moon')
+    with profiling.stage('collect'):
+        store_moon_data()
\ No newline at end of file
@@ -0,0 +1,349 @@
+"""payload_archive.py
+
+Archive of every raw API response the collectors receive, so a change to
+which hour or which fields we extract costs a local replay instead of a
+rate-limited re-crawl.
+
+Every 200 response that goes through metrics.http_get is appended, zlib
+compressed, to an append-only segment file per source:
+
+    outputs/archive/segments/<source>-00001.seg   (rolls over at SEGMENT_BYTES)
+    outputs/archive/index.db                      (SQLite: source, endpoint,
+                                                   params, time -> segment, offset)
+
+Each record in a segment is a one-line JSON header followed by the
+compressed body, so the index can be rebuilt from the segments alone
+(`reindex`). A response identical to the latest one archived for the same
+(source, endpoint, params) is not stored again. Secrets (apiKey) are
+dropped from the archived params. PAYLOAD_ARCHIVE=0 turns archiving off.
+
+Replay rebuilds Games, Weather, AirQuality and Moon_Data from the latest
+payload per request, through the same extract/insert functions the
+collectors use and without their 25-rows-per-run limit:
+
+    python payload_archive.py stats
+    python payload_archive.py replay --db outputs/replay.db --rebuild
+    python payload_archive.py replay --tables Weather          # fill gaps only
+    python payload_archive.py reindex
+"""
+import argparse
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+from utils import connect_db
+
+ARCHIVE_DIR = os.path.join('outputs', 'archive')
+SEGMENT_BYTES = 64 * 1024 * 1024
+COMPRESS_LEVEL = 6
+SECRET_PARAMS = {'apiKey', 'api_key', 'key', 'token'}
+TABLES = ['Games', 'Weather', 'AirQuality', 'Moon_Data', 'Plays']
+
+INDEX_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS Payloads (
+        payload_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source TEXT NOT NULL,
+        endpoint TEXT NOT NULL,
+        params_key TEXT NOT NULL,
+        fetched_at REAL NOT NULL,
+        segment TEXT NOT NULL,
+        offset INTEGER NOT NULL,
+        length INTEGER NOT NULL,
+        raw_bytes INTEGER NOT NULL,
+        sha256 TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_payloads_request ON Payloads (source, endpoint, params_key, payload_id);
+    CREATE INDEX IF NOT EXISTS idx_payloads_time ON Payloads (fetched_at);
+'''
+
+_lock = threading.Lock()
+_indexes = {}    # archive dir -> open index connection
+
+
+def enabled():
+    return os.environ.get('PAYLOAD_ARCHIVE', '1') not in ('', '0')
+
+
+def _params_key(params):
+    clean = {k: v for k, v in (params or {}).items() if k not in SECRET_PARAMS}
+    return json.dumps(clean, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def _index(archive_dir):
+    conn = _indexes.get(archive_dir)
+    if conn is None:
+        os.makedirs(os.path.join(archive_dir, 'segments'), exist_ok=True)
+        conn = connect_db(os.path.join(archive_dir, 'index.db'))
+        conn.executescript(INDEX_SCHEMA)
+        _indexes[archive_dir] = conn
+    return conn
+
+
+def _segment_for(archive_dir, source):
+    """Newest segment of `source`, or the next one once it reaches SEGMENT_BYTES."""
+    existing = sorted(glob.glob(os.path.join(archive_dir, 'segments', f"{source}-*.seg")))
+    n = int(existing[-1].rsplit('-', 1)[1][:-4]) if existing else 1
+    if existing and os.path.getsize(existing[-1]) >= SEGMENT_BYTES:
+        n += 1
+    return os.path.join('segments', f"{source}-{n:05d}.seg")
+
+
+def record(source, url, params, body, fetched_at=None, archive_dir=ARCHIVE_DIR):
+    """Append one raw response body (bytes). Returns its payload_id, or None if unchanged."""
+    endpoint = urlsplit(url).path
+    params_key = _params_key(params)
+    digest = hashlib.sha256(body).hexdigest()
+    fetched_at = time.time() if fetched_at is None else fetched_at
+    with _lock:
+        conn = _index(archive_dir)
+        latest = conn.execute(
+            "SELECT sha256 FROM Payloads WHERE source = ? AND endpoint = ? AND params_key = ?"
+            " ORDER BY payload_id DESC LIMIT 1", (source, endpoint, params_key)).fetchone()
+        if latest and latest[0] == digest:
+            return None
+        compressed = zlib.compress(body, COMPRESS_LEVEL)
+        header = json.dumps({'source': source, 'endpoint': endpoint, 'params': params_key,
+                             'fetched_at': fetched_at, 'length': len(compressed),
+                             'raw_bytes': len(body), 'sha256': digest}).encode() + b'\n'
+        segment = _segment_for(archive_dir, source)
+        with open(os.path.join(archive_dir, segment), 'ab') as f:
+            # Another collector process may be appending to the same segment
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                offset = f.seek(0, os.SEEK_END) + len(header)
+                f.write(header + compressed)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        cur = conn.execute(
+            "INSERT INTO Payloads (source, endpoint, params_key, fetched_at, segment, offset, length,"
+            " raw_bytes, sha256) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (source, endpoint, params_key, fetched_at, segment, offset, len(compressed), len(body), digest))
+        conn.commit()
+        return cur.lastrowid
+
+
+def reindex(archive_dir=ARCHIVE_DIR):
+    """Rebuild index.db by scanning the segment files. Returns the number of records."""
+    with _lock:
+        conn = _indexes.pop(archive_dir, None)
+        if conn is not None:
+            conn.close()
+        path = os.path.join(archive_dir, 'index.db')
+        if os.path.exists(path):
+            os.remove(path)
+        conn = _index(archive_dir)
+        rows = []
+        for seg_path in sorted(glob.glob(os.path.join(archive_dir, 'segments', '*.seg'))):
+            segment = os.path.relpath(seg_path, archive_dir)
+            with open(seg_path, 'rb') as f:
+                while True:
+                    line = f.readline()
+                    if not line:
+                        break
+                    h = json.loads(line)
+                    rows.append((h['source'], h['endpoint'], h['params'], h['fetched_at'], segment,
+                                 f.tell(), h['length'], h['raw_bytes'], h['sha256']))
+                    f.seek(h['length'], os.SEEK_CUR)
+        rows.sort(key=lambda r: r[3])   # payload_id order = fetch order
+        conn.executemany(
+            "INSERT INTO Payloads (source, endpoint, params_key, fetched_at, segment, offset, length,"
+            " raw_bytes, sha256) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+        return len(rows)
+
+
+def iter_latest(source, endpoint, archive_dir=ARCHIVE_DIR):
+    """(params, payload) for the newest response to each distinct request, in segment order."""
+    conn = _index(archive_dir)
+    rows = conn.execute('''
+        SELECT p.params_key, p.segment, p.offset, p.length
+        FROM Payloads p
+        JOIN (SELECT MAX(payload_id) AS payload_id FROM Payloads
+              WHERE source = ? AND endpoint = ? GROUP BY params_key) latest
+          ON p.payload_id = latest.payload_id
+        ORDER BY p.segment, p.offset
+    ''', (source, endpoint)).fetchall()
+    files = {}
+    try:
+        for params_key, segment, offset, length in rows:
+            f = files.get(segment)
+            if f is None:
+                f = files[segment] = open(os.path.join(archive_dir, segment), 'rb')
+            f.seek(offset)
+            yield json.loads(params_key), json.loads(zlib.decompress(f.read(length)))
+    finally:
+        for f in files.values():
+            f.close()
+
+
+def stats(archive_dir=ARCHIVE_DIR):
+    conn = _index(archive_dir)
+    return conn.execute('''
+        SELECT source, endpoint, COUNT(*), COUNT(DISTINCT params_key), SUM(raw_bytes), SUM(length),
+               MIN(fetched_at), MAX(fetched_at)
+        FROM Payloads GROUP BY source, endpoint ORDER BY source, endpoint
+    ''').fetchall()
+
+
+# --- REPLAY ---
+
+def _existing(cursor, table):
+    cursor.execute(f"SELECT t.game_date, l.city_name FROM {table} t JOIN Locations l ON t.location_id = l.location_id")
+    return set(cursor.fetchall())
+
+
+def _city_at(lat, lon):
+    import venues
+    venue, _ = venues.nearest(float(lat), float(lon), venues.ALIAS_KM)
+    return venue.city if venue else None
+
+
+def replay_games(cursor, archive_dir):
+    import college_football
+    import venues
+
+    for _, payload in iter_latest('cfbd', '/venues', archive_dir):
+        venues.register_cfbd(payload)
+    stored = skipped = 0
+    weeks = sorted(iter_latest('cfbd', '/games', archive_dir),
+                   key=lambda item: (int(item[0].get('year', 0)), int(item[0].get('week', 0))))
+    for _, games in weeks:
+        for game in games:
+            city = college_football.get_city_from_venue(game.get('venue', ''), game.get('venueId'))
+            if not city or game.get('homePoints') is None or game.get('awayPoints') is None:
+                skipped += 1
+                continue
+            try:
+                college_football.insert_game(cursor, game, city)
+                stored += 1
+            except sqlite3.IntegrityError:
+                skipped += 1
+    return stored, skipped
+
+
+def _replay_daily(cursor, archive_dir, table, source, endpoint, extract, insert):
+    existing = _existing(cursor, table)
+    stored = skipped = 0
+    for params, payload in iter_latest(source, endpoint, archive_dir):
+        date = params.get('start_date') or params.get('date')
+        city = _city_at(params['latitude'], params['longitude'])
+        value = extract(payload)
+        if city is None or value is None or (date, city) in existing:
+            skipped += 1
+            continue
+        insert(cursor, date, city, value)
+        existing.add((date, city))
+        stored += 1
+    return stored, skipped
+
+
+def replay_weather(cursor, archive_dir):
+    import weather_data
+    return _replay_daily(cursor, archive_dir, 'Weather', 'open_meteo_archive', '/v1/archive',
+                         weather_data.extract_weather, weather_data.insert_weather)
+
+
+def replay_air_quality(cursor, archive_dir):
+    import air_quality
+    return _replay_daily(cursor, archive_dir, 'AirQuality', 'open_meteo_air_quality', '/v1/air-quality',
+                         air_quality.extract_game_aqi, air_quality.insert_air_quality)
+
+
+def replay_moon(cursor, archive_dir):
+    import moon_data
+    existing = _existing(cursor, 'Moon_Data')
+    stored = skipped = 0
+    for params, payload in iter_latest('ipgeolocation', '/v2/astronomy', archive_dir):
+        # moon_data asks for location="<city>, US"
+        city, date = params.get('location', '').removesuffix(', US'), params.get('date')
+        moon = moon_data.extract_moon(payload)
+        if not city or moon is None or (date, city) in existing:
+            skipped += 1
+            continue
+        moon_data.insert_moon(cursor, date, city, moon)
+        existing.add((date, city))
+        stored += 1
+    return stored, skipped
+
+
+def replay_plays(cursor, archive_dir):
+    import play_by_play
+    cursor.execute("SELECT game_id FROM Games")
+    game_ids = {row[0] for row in cursor.fetchall()}
+    codes = play_by_play.Codes(cursor)
+    stored = skipped = 0
+    for _, plays in iter_latest('cfbd', '/plays', archive_dir):
+        n = play_by_play.insert_plays(cursor, plays, game_ids, codes)
+        stored += n
+        skipped += len(plays) - n
+    return stored, skipped
+
+
+REPLAYERS = {
+    'Games': replay_games,
+    'Weather': replay_weather,
+    'AirQuality': replay_air_quality,
+    'Moon_Data': replay_moon,
+    'Plays': replay_plays,
+}
+
+
+def replay(db_path='football_weather.db', tables=TABLES, rebuild=False, archive_dir=ARCHIVE_DIR):
+    """Re-derive `tables` in db_path from the archive. With rebuild, their rows are deleted first."""
+    from createdatabase import create_database
+
+    create_database(db_path)
+    conn = connect_db(db_path)
+    cursor = conn.cursor()
+    if rebuild:
+        for table in tables:
+            cursor.execute(f"DELETE FROM {table}")
+    print(f"Replaying {', '.join(tables)} from {archive_dir} into {db_path}"
+          f"{' (rebuild)' if rebuild else ''}")
+    results = {}
+    for table in tables:
+        start = time.perf_counter()
+        stored, skipped = REPLAYERS[table](cursor, archive_dir)
+        seconds = time.perf_counter() - start
+        results[table] = {'stored': stored, 'skipped': skipped, 'seconds': round(seconds, 3)}
+        print(f"  ✅ {table:<11} {stored:>7} stored {skipped:>7} skipped  {seconds:6.2f}s")
+    conn.commit()
+    conn.close()
+    return results
+
+
+def print_stats(archive_dir=ARCHIVE_DIR):
+    rows = stats(archive_dir)
+    if not rows:
+        print(f"⚠️  Archive at {archive_dir} is empty")
+        return
+    print(f"{'source':<24}{'endpoint':<18}{'payloads':>9}{'requests':>9}{'raw MB':>9}{'stored MB':>10}  last fetched")
+    for source, endpoint, n, distinct, raw, stored, _, last in rows:
+        print(f"{source:<24}{endpoint:<18}{n:>9}{distinct:>9}{raw / 1e6:>9.2f}{stored / 1e6:>10.2f}  "
+              f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(last))}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Raw API payload archive and replay')
+    parser.add_argument('--archive', default=ARCHIVE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('stats', help='Payload counts and sizes per source')
+    p = sub.add_parser('replay', help='Re-derive tables from the archive')
+    p.add_argument('--db', default='football_weather.db')
+    p.add_argument('--tables', nargs='+', choices=TABLES, default=TABLES)
+    p.add_argument('--rebuild', action='store_true', help='Delete the tables\' rows first')
+    sub.add_parser('reindex', help='Rebuild index.db from the segment files')
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        print_stats(args.archive)
+    elif args.command == 'replay':
+        replay(args.db, args.tables, args.rebuild, args.archive)
+    else:
+        print(f"✅ Indexed {reindex(args.archive)} payloads")
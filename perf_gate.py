@@ -0,0 +1,268 @@
+"""perf_gate.py
+
+Performance regression gate: runs a fixed benchmark set and compares it with
+the committed baseline in perf_baseline.json.
+
+    python perf_gate.py                    # exit 1 if anything regressed
+    python perf_gate.py --update-baseline  # re-record (then commit the file)
+
+The benchmarks are the bench_pipeline steps (load_data_with_sql_join,
+optimize_dtypes, each compute_*, export_clean_csvs and each chart) on a
+synthetic database of --games games, plus one run of each collector against
+mock_api.py in a fresh scratch database. Each is repeated --repeats times
+(after one untimed warm-up pass of the pipeline) and summarized as median
+and p95 wall time and median peak RSS.
+
+A benchmark regresses when its median or p95 grows by more than the
+tolerance percentage *and* by more than an absolute floor (so a 2 ms step
+jittering to 3 ms doesn't fail the gate), or when its peak RSS grows by more
+than rss_pct and min_rss_mb. Tolerances come from the baseline file's
+"tolerances" block, overridable on the command line. Timings are only
+comparable on the same machine; a baseline recorded elsewhere gets a warning.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+BASELINE_PATH = 'perf_baseline.json'
+REPORT_PATH = os.path.join('outputs', 'perf_gate.json')
+INGEST_DIR = os.path.join('outputs', 'bench', 'gate_ingest')
+GAMES = 20_000
+REPEATS = 5
+DEFAULT_TOLERANCES = {
+    'median_pct': 25.0,   # allowed median slowdown, percent
+    'p95_pct': 50.0,      # allowed p95 slowdown, percent
+    'rss_pct': 20.0,      # allowed peak RSS growth, percent
+    'min_ms': 5.0,        # ignore timing changes smaller than this
+    'min_rss_mb': 25.0,   # ignore RSS changes smaller than this
+}
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile (q in 0-100) of a non-empty list."""
+    values = sorted(values)
+    pos = (len(values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def summarize(samples):
+    """{name: {'wall': [...], 'rss': [...]}} -> {name: {median_s, p95_s, peak_rss_mb, runs}}."""
+    return {
+        name: {
+            'median_s': round(statistics.median(s['wall']), 4),
+            'p95_s': round(percentile(s['wall'], 95), 4),
+            'peak_rss_mb': round(statistics.median(s['rss']), 1),
+            'runs': len(s['wall']),
+        }
+        for name, s in samples.items()
+    }
+
+
+# --- BENCHMARKS ---
+
+def run_pipeline(games, repeats, seed=0):
+    import bench_pipeline
+
+    workdir = os.path.join(bench_pipeline.BENCH_DIR, f"games_{games}")
+    bench_pipeline.prepare(workdir, games, seed, 0.9)
+    samples = {}
+    for i in range(repeats + 1):
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, steps = bench_pipeline.bench_pipeline(workdir, games)
+        if i == 0:
+            continue  # warm-up: imports, font cache, SQLite page cache
+        for name, step in steps.items():
+            entry = samples.setdefault(name, {'wall': [], 'rss': []})
+            entry['wall'].append(step['wall_s'])
+            entry['rss'].append(step['peak_rss_mb'])
+        print(f"  pipeline run {i}/{repeats}: {sum(s['wall_s'] for s in steps.values()):.2f}s")
+    return samples
+
+
+def _run_child(args, cwd, env):
+    """Run a subprocess; returns (seconds, its own peak RSS in MB)."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(args, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} exited with {proc.returncode}")
+    return wall, usage.ru_maxrss / 1024
+
+
+def run_collectors(repeats, port=8799):
+    """Each collector against the mock, in a fresh database per repeat."""
+    from createdatabase import create_database
+    import mock_api
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    server, _ = mock_api.start_server(port)
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, COLLECTOR_DELAY='0', **{var: url for _, var in mock_api.COLLECTORS.values()})
+    env.pop('SQL_TRACE', None)
+    samples = {}
+    try:
+        for i in range(repeats):
+            shutil.rmtree(INGEST_DIR, ignore_errors=True)
+            os.makedirs(INGEST_DIR)
+            create_database(os.path.join(INGEST_DIR, 'football_weather.db'))
+            for script in mock_api.COLLECTORS:
+                wall, rss = _run_child([sys.executable, os.path.join(here, script)], INGEST_DIR, env)
+                entry = samples.setdefault(f"collector_{script[:-3]}", {'wall': [], 'rss': []})
+                entry['wall'].append(wall)
+                entry['rss'].append(rss)
+            print(f"  collector run {i + 1}/{repeats}")
+    finally:
+        server.shutdown()
+    return samples
+
+
+def measure(games=GAMES, repeats=REPEATS, collectors=True, port=8799):
+    print(f"Benchmarking {games:,} synthetic games x {repeats} repeats...")
+    samples = {}
+    if collectors:
+        # First, while this process is small: a child's peak RSS starts from
+        # the parent's at fork
+        samples.update(run_collectors(repeats, port))
+    samples.update(run_pipeline(games, repeats))
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'node': platform.node(),
+        'cpus': os.cpu_count(),
+        'games': games,
+        'repeats': repeats,
+        'benchmarks': summarize(samples),
+    }
+
+
+# --- COMPARISON ---
+
+def _grew(base, cur, pct, floor):
+    return cur > base * (1 + pct / 100) and cur - base > floor
+
+
+def compare(baseline, current, tol):
+    """One row per benchmark with status regression / improved / ok / new / missing."""
+    rows = []
+    base_all, cur_all = baseline['benchmarks'], current['benchmarks']
+    floor_s = tol['min_ms'] / 1000
+    for name in list(base_all) + [n for n in cur_all if n not in base_all]:
+        base, cur = base_all.get(name), cur_all.get(name)
+        row = {'name': name, 'baseline': base, 'current': cur, 'reasons': []}
+        if base is None or cur is None:
+            row['status'] = 'new' if base is None else 'missing'
+            rows.append(row)
+            continue
+        if _grew(base['median_s'], cur['median_s'], tol['median_pct'], floor_s):
+            row['reasons'].append(f"median {base['median_s'] * 1000:.1f} -> {cur['median_s'] * 1000:.1f} ms")
+        if _grew(base['p95_s'], cur['p95_s'], tol['p95_pct'], floor_s):
+            row['reasons'].append(f"p95 {base['p95_s'] * 1000:.1f} -> {cur['p95_s'] * 1000:.1f} ms")
+        if _grew(base['peak_rss_mb'], cur['peak_rss_mb'], tol['rss_pct'], tol['min_rss_mb']):
+            row['reasons'].append(f"peak RSS {base['peak_rss_mb']:.0f} -> {cur['peak_rss_mb']:.0f} MB")
+        if row['reasons']:
+            row['status'] = 'regression'
+        elif _grew(cur['median_s'], base['median_s'], tol['median_pct'], floor_s):
+            row['status'] = 'improved'
+        else:
+            row['status'] = 'ok'
+        rows.append(row)
+    return rows
+
+
+def print_comparison(rows):
+    icons = {'ok': '✅', 'improved': '🚀', 'regression': '❌', 'new': '➕', 'missing': '⚠️ '}
+    print(f"\n{'':3}{'benchmark':<38}{'base ms':>10}{'now ms':>10}{'change':>9}{'p95 ms':>10}{'RSS MB':>9}")
+    for row in rows:
+        base, cur = row['baseline'], row['current']
+        if base and cur:
+            change = (cur['median_s'] / base['median_s'] - 1) * 100 if base['median_s'] else 0.0
+            print(f"{icons[row['status']]} {row['name']:<38}{base['median_s'] * 1000:>10.1f}"
+                  f"{cur['median_s'] * 1000:>10.1f}{change:>+8.0f}%{cur['p95_s'] * 1000:>10.1f}"
+                  f"{cur['peak_rss_mb']:>9.0f}")
+        else:
+            print(f"{icons[row['status']]} {row['name']:<38}({row['status']})")
+        for reason in row['reasons']:
+            print(f"{'':6}{reason}")
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fail if the pipeline got slower than the committed baseline')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help='Re-record the baseline and exit')
+    parser.add_argument('--games', type=int, help=f'Synthetic size (default: the baseline\'s, else {GAMES})')
+    parser.add_argument('--repeats', type=int, help=f'Timed runs per benchmark (default: {REPEATS})')
+    parser.add_argument('--no-collectors', action='store_true', help='Skip the mock-API collector runs')
+    parser.add_argument('--port', type=int, default=8799, help='Port for the mock APIs')
+    parser.add_argument('--report', default=REPORT_PATH)
+    for key, default in DEFAULT_TOLERANCES.items():
+        parser.add_argument('--' + key.replace('_', '-'), type=float, dest=key,
+                            help=f"Tolerance override (default: baseline file, else {default})")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+    tolerances = dict(DEFAULT_TOLERANCES, **(baseline or {}).get('tolerances', {}))
+    tolerances.update({k: getattr(args, k) for k in DEFAULT_TOLERANCES if getattr(args, k) is not None})
+    games = args.games or (baseline or {}).get('games', GAMES)
+    repeats = args.repeats or (baseline or {}).get('repeats', REPEATS)
+
+    if not args.update_baseline and baseline is None:
+        print(f"❌ No baseline at {args.baseline}; record one with --update-baseline")
+        return 2
+
+    current = measure(games, repeats, collectors=not args.no_collectors, port=args.port)
+    if args.update_baseline:
+        current['tolerances'] = tolerances
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2)
+            f.write('\n')
+        print(f"✅ Saved {args.baseline} ({len(current['benchmarks'])} benchmarks); commit it")
+        return 0
+
+    if (baseline.get('machine'), baseline.get('cpus'), baseline.get('python')) != \
+            (current['machine'], current['cpus'], current['python']):
+        print(f"⚠️  Baseline was recorded on {baseline.get('machine')}/{baseline.get('cpus')} CPUs/"
+              f"Python {baseline.get('python')}; timings may not be comparable")
+    if games != baseline.get('games'):
+        print(f"⚠️  Baseline used {baseline.get('games'):,} games, this run {games:,}")
+
+    rows = compare(baseline, current, tolerances)
+    if args.no_collectors:
+        rows = [r for r in rows if not (r['status'] == 'missing' and r['name'].startswith('collector_'))]
+    print_comparison(rows)
+    regressions = [r for r in rows if r['status'] == 'regression']
+
+    os.makedirs(os.path.dirname(args.report) or '.', exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump({'tolerances': tolerances, 'baseline': args.baseline, 'current': current,
+                   'regressions': [r['name'] for r in regressions], 'rows': rows}, f, indent=2)
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond tolerance (report: {args.report})")
+        return 1
+    print(f"\n✅ No regressions (report: {args.report})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
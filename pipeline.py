@@ -0,0 +1,203 @@
+"""pipeline.py
+
+Make-style runner for the project workflow (create DB -> collectors ->
+analysis -> charts). Each stage declares its inputs and outputs: database
+tables ('table:Games') or files ('outputs/points_by_temp.csv'). Dependencies
+come from matching one stage's outputs to another's inputs.
+
+A stage is skipped when the fingerprint of its inputs and its own script is
+the same as at its last successful run and its file outputs still exist.
+Stages whose dependencies are done run concurrently (as subprocesses);
+stages that share a `lock` (e.g. the collectors, which hold a write
+transaction on football_weather.db for their whole run) take turns.
+
+    python pipeline.py               # refresh analysis + charts
+    python pipeline.py --ingest      # also run the API collectors first
+    python pipeline.py --dry-run     # show what would run
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from result_cache import (table_fingerprint, file_digest, code_version, make_key,
+                          OUTPUT_TABLES, FIGURE_INPUTS)
+from utils import connect_db
+
+STATE_PATH = os.path.join('outputs', '.pipeline_state.json')
+ALL_TABLES = ['Locations', 'Teams', 'Games', 'Weather', 'AirQuality', 'Moon_Data', 'PlayTypes', 'Plays',
+              'Team_Ratings', 'Game_Ratings', 'Rating_State']
+
+
+class Stage:
+    def __init__(self, name, script, inputs=(), outputs=(), args=(), lock=None, ingest=False):
+        self.name = name
+        self.script = script
+        self.args = list(args)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.lock = lock
+        # Collectors are the source of new data: they hit external APIs, only
+        # run with --ingest, and are never skipped when selected
+        self.ingest = ingest
+
+    def command(self):
+        return [sys.executable, self.script] + self.args
+
+
+def tables(*names):
+    return ['table:' + n for n in names]
+
+
+ANALYSIS_TABLES = sorted(set(t for ts in OUTPUT_TABLES.values() for t in ts))
+
+STAGES = [
+    Stage('createdb', 'createdatabase.py', outputs=tables(*ALL_TABLES)),
+    Stage('football', 'college_football.py', inputs=tables('Games'),
+          outputs=tables('Locations', 'Teams', 'Games'), lock='db-write', ingest=True),
+    Stage('weather', 'weather_data.py', inputs=tables('Weather'),
+          outputs=tables('Locations', 'Weather'), lock='db-write', ingest=True),
+    Stage('air', 'air_quality.py', inputs=tables('AirQuality'),
+          outputs=tables('Locations', 'AirQuality'), lock='db-write', ingest=True),
+    Stage('moon', 'moon_data.py', inputs=tables('Moon_Data'),
+          outputs=tables('Locations', 'Moon_Data'), lock='db-write', ingest=True),
+    Stage('plays', 'play_by_play.py', inputs=tables('Games', 'Plays'),
+          outputs=tables('Teams', 'PlayTypes', 'Plays'), lock='db-write', ingest=True),
+    Stage('analyze', 'process_and_analyze.py', inputs=tables(*ANALYSIS_TABLES),
+          outputs=list(OUTPUT_TABLES) + tables('Team_Ratings', 'Game_Ratings', 'Rating_State')),
+    # Game_Ratings: reads the joined query, so runs after analyze has rated the games
+    Stage('inference', 'stats_inference.py', inputs=tables('Games', 'Locations', 'Teams', 'Weather', 'Game_Ratings'),
+          outputs=['outputs/points_by_temp_ci.csv', 'outputs/win_pct_by_stadium_rain_ci.csv']),
+    Stage('plot', 'visualize.py', inputs=sorted(set(FIGURE_INPUTS.values())),
+          outputs=list(FIGURE_INPUTS)),
+]
+
+
+def dependencies(stages):
+    """{stage name: set of stage names it waits for} from inputs/outputs.
+
+    A stage that writes a table it also reads (the collectors) only depends
+    on EARLIER stages producing that table, which keeps the graph acyclic.
+    """
+    deps = {s.name: set() for s in stages}
+    for i, stage in enumerate(stages):
+        for j, other in enumerate(stages):
+            if j < i and set(stage.inputs) & set(other.outputs):
+                deps[stage.name].add(other.name)
+    return deps
+
+
+def input_key(stage, conn):
+    table_names = [i[len('table:'):] for i in stage.inputs if i.startswith('table:')]
+    files = [i for i in stage.inputs if not i.startswith('table:')]
+    return make_key(
+        tables=table_fingerprint(conn, table_names),
+        files={f: file_digest(f) for f in files},
+        code=code_version(stage.script),
+        args=stage.args,
+    )
+
+
+def outputs_exist(stage):
+    return all(os.path.exists(o) for o in stage.outputs if not o.startswith('table:'))
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def run(stages=STAGES, ingest=False, force=False, dry_run=False, jobs=None):
+    """Run the DAG; returns {stage: 'ran' | 'skipped' | 'failed' | 'blocked'}
+    ('would run' instead of 'ran' with dry_run, for a stage and everything downstream of it)."""
+    stages = [s for s in stages if ingest or not s.ingest]
+    by_name = {s.name: s for s in stages}
+    deps = dependencies(stages)
+    state = load_state()
+    status = {}
+    locks = {s.lock: threading.Lock() for s in stages if s.lock}
+    state_lock = threading.Lock()
+
+    def execute(stage):
+        if dry_run and any(status[d] == 'would run' for d in deps[stage.name]):
+            # a producer would rewrite this stage's inputs first
+            return 'would run', 0.0
+        # Input key is taken when the stage is ready, i.e. after its producers ran
+        conn = connect_db()
+        key = input_key(stage, conn)
+        conn.close()
+        if not force and not stage.ingest and state.get(stage.name) == key and outputs_exist(stage):
+            return 'skipped', 0.0
+        if dry_run:
+            return 'would run', 0.0
+
+        lock = locks.get(stage.lock)
+        start = time.perf_counter()
+        if lock:
+            lock.acquire()
+        try:
+            proc = subprocess.run(stage.command())
+        finally:
+            if lock:
+                lock.release()
+        elapsed = time.perf_counter() - start
+        if proc.returncode != 0:
+            return 'failed', elapsed
+
+        # Record the key of the inputs as they are AFTER the run (a stage may
+        # write tables it also reads)
+        conn = connect_db()
+        after = input_key(stage, conn)
+        conn.close()
+        with state_lock:
+            state[stage.name] = after
+            save_state(state)
+        return 'ran', elapsed
+
+    pending = set(by_name)
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        while pending or running:
+            for name in sorted(pending):
+                if any(status.get(d) in ('failed', 'blocked') for d in deps[name]):
+                    status[name] = 'blocked'
+                    pending.discard(name)
+                    print(f"⏭  {name}: blocked (dependency failed)")
+                elif all(d in status for d in deps[name]):
+                    pending.discard(name)
+                    running[pool.submit(execute, by_name[name])] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                result, elapsed = future.result()
+                status[name] = result
+                timing = f" in {elapsed:.1f}s" if result in ('ran', 'failed') else ''
+                print(f"{'✅' if result != 'failed' else '❌'} {name}: {result}{timing}")
+    return status
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the pipeline, skipping up-to-date stages')
+    parser.add_argument('--ingest', action='store_true', help='Also run the API collectors')
+    parser.add_argument('--force', action='store_true', help='Run every stage regardless of inputs')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would run')
+    parser.add_argument('--jobs', type=int, default=None, help='Max concurrent stages')
+    args = parser.parse_args()
+    status = run(ingest=args.ingest, force=args.force, dry_run=args.dry_run, jobs=args.jobs)
+    sys.exit(1 if any(s == 'failed' for s in status.values()) else 0)
@@ -0,0 +1,232 @@
+"""play_by_play.py
+
+Play-by-play collector: every CollegeFootballData play for the games already
+in Games, so wind and rain can be looked at per play type (passing, rushing,
+kicking) instead of only through final scores.
+
+Plays are fetched per CFBD (season, week, seasonType) — one request covers
+every game that week — and only those whose game is in Games and has no
+plays yet are kept. The week is the one CFBD gave the game (Games.season /
+week / season_type), not one derived from game_date: that is the UTC start
+date, which puts Saturday-night and Labor Day games in the following week.
+Games stored before those columns existed get them from one /games request
+per season and season type (backfill_game_weeks).
+Storage is compact and integer-coded (createdatabase.PLAY_TABLES):
+
+    Plays       one row per play: game_id, period, clock_seconds, team ids,
+                down/distance/yards_to_goal/yards_gained, play_type_id, scoring
+    PlayTypes   play_type_id -> CFBD playType name, category (pass, rush,
+                field_goal, extra_point, punt, kickoff, penalty, turnover,
+                other) and outcome (1 completion / kick good, 0 not, NULL n/a)
+
+Play text is not stored (it is most of the payload; the raw responses are in
+the payload archive if it is ever needed). Each week is written with one
+executemany inside one transaction, and Plays is indexed on (game_id, period).
+
+    python play_by_play.py          # CFBD_BASE_URL=http://127.0.0.1:8799 for the mock
+"""
+import os
+import time
+from config import COLLEGE_FOOTBALL_KEY
+from createdatabase import create_play_tables, add_game_week_columns
+import metrics
+import profiling
+from utils import connect_db
+
+CFBD_BASE_URL = os.environ.get('CFBD_BASE_URL', 'https://api.collegefootballdata.com')
+REQUEST_DELAY = float(os.environ.get('COLLECTOR_DELAY', 0.3))
+
+# (lowercase substring of the CFBD playType, category, outcome); first match wins
+PLAY_TYPE_RULES = [
+    ('field goal good', 'field_goal', 1),
+    ('field goal missed', 'field_goal', 0),
+    ('missed field goal', 'field_goal', 0),
+    ('blocked field goal', 'field_goal', 0),
+    ('extra point good', 'extra_point', 1),
+    ('extra point missed', 'extra_point', 0),
+    ('blocked pat', 'extra_point', 0),
+    ('punt', 'punt', None),
+    ('kickoff', 'kickoff', None),
+    ('pass reception', 'pass', 1),
+    ('passing touchdown', 'pass', 1),
+    ('pass completion', 'pass', 1),
+    ('pass incompletion', 'pass', 0),
+    ('interception', 'pass', 0),
+    ('sack', 'pass', 0),
+    ('pass', 'pass', None),
+    ('rush', 'rush', None),
+    ('penalty', 'penalty', None),
+    ('fumble', 'turnover', None),
+]
+
+INSERT_PLAY = '''
+    INSERT OR IGNORE INTO Plays
+    (play_id, game_id, period, clock_seconds, offense_team_id, defense_team_id,
+     down, distance, yards_to_goal, yards_gained, play_type_id, scoring)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def classify(play_type):
+    """(category, outcome) of a CFBD playType name."""
+    name = (play_type or '').lower()
+    for needle, category, outcome in PLAY_TYPE_RULES:
+        if needle in name:
+            return category, outcome
+    return 'other', None
+
+
+def get_plays_from_api(year, week, season_type='regular', base_url=None):
+    """Every play of one week (regular season or postseason) from CollegeFootballData"""
+    url = f"{base_url or CFBD_BASE_URL}/plays"
+    headers = {'Authorization': f'Bearer {COLLEGE_FOOTBALL_KEY}'}
+    params = {'year': year, 'week': week, 'seasonType': season_type}
+    try:
+        response = metrics.http_get('cfbd', url, headers=headers, params=params)
+        if response.status_code == 200:
+            return response.json()
+        print(f"  Error {response.status_code}")
+    except Exception as e:
+        print(f"  Exception: {e}")
+    return []
+
+
+class Codes:
+    """name -> integer id for teams and play types, loaded once and extended as new names appear."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        cursor.execute("SELECT team_name, team_id FROM Teams")
+        self.teams = dict(cursor.fetchall())
+        cursor.execute("SELECT name, play_type_id FROM PlayTypes")
+        self.play_types = dict(cursor.fetchall())
+
+    def team(self, name, conference=None):
+        if not name:
+            return None
+        team_id = self.teams.get(name)
+        if team_id is None:
+            self.cursor.execute("INSERT INTO Teams (team_name, conference) VALUES (?, ?)",
+                                (name, conference or 'Unknown'))
+            team_id = self.teams[name] = self.cursor.lastrowid
+        return team_id
+
+    def play_type(self, name):
+        name = name or 'Uncategorized'
+        type_id = self.play_types.get(name)
+        if type_id is None:
+            category, outcome = classify(name)
+            self.cursor.execute("INSERT INTO PlayTypes (name, category, outcome) VALUES (?, ?, ?)",
+                                (name, category, outcome))
+            type_id = self.play_types[name] = self.cursor.lastrowid
+        return type_id
+
+
+def play_rows(plays, game_ids, codes):
+    """Integer-coded Plays rows for the plays whose gameId is in game_ids."""
+    rows = []
+    for p in plays:
+        game_id = p.get('gameId')
+        if game_id not in game_ids:
+            continue
+        clock = p.get('clock') or {}
+        clock_seconds = (clock.get('minutes') or 0) * 60 + (clock.get('seconds') or 0) if clock else None
+        rows.append((
+            p.get('id'), game_id, p.get('period'), clock_seconds,
+            codes.team(p.get('offense'), p.get('offenseConference')),
+            codes.team(p.get('defense'), p.get('defenseConference')),
+            p.get('down'), p.get('distance'), p.get('yardsToGoal'), p.get('yardsGained'),
+            codes.play_type(p.get('playType')), int(bool(p.get('scoring'))),
+        ))
+    return rows
+
+
+def insert_plays(cursor, plays, game_ids, codes=None):
+    """Bulk-insert one API response's plays for game_ids. Returns rows written."""
+    rows = play_rows(plays, game_ids, codes or Codes(cursor))
+    if not rows:
+        return 0
+    with metrics.span('db_write', table='Plays'):
+        cursor.executemany(INSERT_PLAY, rows)
+    written = cursor.rowcount   # excludes plays already stored (OR IGNORE)
+    metrics.inc('db_rows_written_total', written, table='Plays')
+    return written
+
+
+def backfill_game_weeks(cursor):
+    """Fill Games.season / week / season_type where missing from CFBD's season
+    schedules. Returns the number of games still without a week."""
+    import college_football
+
+    cursor.execute("SELECT DISTINCT game_date FROM Games WHERE week IS NULL")
+    seasons = sorted({int(d[:4]) - (int(d[5:7]) < 3) for (d,) in cursor.fetchall()})
+    for season in seasons:
+        for season_type in ('regular', 'postseason'):
+            games = college_football.get_games_from_api(season, None, season_type=season_type)
+            cursor.executemany(
+                "UPDATE Games SET season = ?, week = ?, season_type = ? WHERE game_id = ? AND week IS NULL",
+                [(g.get('season', season), g.get('week'), g.get('seasonType', season_type), g.get('id'))
+                 for g in games if g.get('week') is not None])
+            time.sleep(REQUEST_DELAY)
+    cursor.execute("SELECT COUNT(*) FROM Games WHERE week IS NULL")
+    return cursor.fetchone()[0]
+
+
+def games_without_plays(cursor):
+    """{(season, week, season_type): {game_id, ...}} for games in Games with no plays yet."""
+    cursor.execute("""
+        SELECT game_id, season, week, season_type FROM Games
+        WHERE week IS NOT NULL AND game_id NOT IN (SELECT game_id FROM Plays)
+    """)
+    weeks = {}
+    for game_id, season, week, season_type in cursor.fetchall():
+        weeks.setdefault((season, week, season_type or 'regular'), set()).add(game_id)
+    return weeks
+
+
+def store_play_by_play():
+    conn = connect_db()
+    add_game_week_columns(conn)
+    create_play_tables(conn)
+    cursor = conn.cursor()
+    unknown_week = backfill_game_weeks(cursor)
+    conn.commit()
+    weeks = games_without_plays(cursor)
+    codes = Codes(cursor)
+
+    print(f"\n{'='*60}")
+    print(f"PLAY-BY-PLAY COLLECTION")
+    print(f"{'='*60}")
+    print(f"Games without plays: {sum(len(ids) for ids in weeks.values())} in {len(weeks)} weeks")
+    if unknown_week:
+        print(f"⚠️  {unknown_week} games not in any CFBD schedule (no week), skipped")
+    print(f"{'='*60}\n")
+
+    stored = 0
+    start = time.perf_counter()
+    for (season, week, season_type), game_ids in sorted(weeks.items()):
+        print(f"{season} {season_type} week {week} ({len(game_ids)} games)...", end=" ")
+        plays = get_plays_from_api(season, week, season_type)
+        n = insert_plays(cursor, plays, game_ids, codes)
+        with metrics.span('db_commit', table='Plays'):
+            conn.commit()
+        stored += n
+        print(f"{len(plays)} plays in feed, {n} stored")
+        time.sleep(REQUEST_DELAY)
+
+    wall = time.perf_counter() - start
+    cursor.execute("SELECT COUNT(*), COUNT(DISTINCT game_id) FROM Plays")
+    total, games = cursor.fetchone()
+    conn.close()
+
+    print(f"\n{'='*60}")
+    print(f"Added: {stored} plays ({stored / wall:,.0f}/s)" if wall > 0 else f"Added: {stored} plays")
+    print(f"Total now: {total} plays in {games} games")
+    print(f"{'='*60}\n")
+
+
+if __name__ == '__main__':
+    metrics.export_on_exit('plays')
+    profiling.enable_from_argv('plays')
+    with profiling.stage('collect'):
+        store_play_by_play()
@@ -4,20 +4,45 @@ Load tables from `football_weather.db`, build a joined dataset, compute
 aggregations, and export CLEAN, READABLE CSV outputs to `outputs/`.
 """
 import argparse
+from dataclasses import dataclass, field
 import pandas as pd
 import numpy as np
 from utils import connect_db, ensure_outputs_dir
+from createdatabase import create_rating_tables
+import scoring_model
+import metrics
+import profiling
+from result_cache import ResultCache, output_cache_keys
 
-def load_data_with_sql_join(conn):
-    """
-    Load data using a massive SQL join. 
-    Note: We select specific columns to keep the dataframe clean from the start.
-    """
-    query = """
+# Bin definitions shared by the compute_* functions and anything that
+# needs to reproduce their cells (e.g. stats_inference.py)
+TEMP_BINS = [-1e9, 39.9, 59.9, 79.9, 1e9]
+TEMP_LABELS = ['Below 40 F', '40-59 F', '60-79 F', '80+ F']
+WIND_BINS = [-1e9, 5.0, 15.0, 1e9]
+WIND_LABELS = ['Low Wind (0-5 mph)', 'Medium Wind (6-15 mph)', 'High Wind (16+ mph)']
+MOON_BINS = [0.0, 0.25, 0.5, 0.75, 1.0]
+MOON_LABELS = ['New Moon (0-25%)', 'Crescent (25-50%)', 'Gibbous (50-75%)', 'Full Moon (75-100%)']
+
+# The join behind the master dataset; sql_analysis.py aggregates over the same rows
+JOINED_FROM = """
+    FROM Games g
+    JOIN Locations loc ON g.location_id = loc.location_id
+    JOIN Teams t_home ON g.home_team_id = t_home.team_id
+    JOIN Teams t_away ON g.away_team_id = t_away.team_id
+    LEFT JOIN Weather w ON g.game_date = w.game_date AND g.location_id = w.location_id
+    LEFT JOIN Moon_Data m ON g.game_date = m.game_date AND g.location_id = m.location_id
+    LEFT JOIN AirQuality aq ON g.game_date = aq.game_date AND g.location_id = aq.location_id
+        AND aq.pollutant_type = 'US_AQI'
+"""
+
+JOINED_QUERY = """
     SELECT 
+        g.game_id,
         g.game_date,
+        g.location_id,
         loc.city_name as stadium_city,
         t_home.team_name AS home_team_name,
+        t_home.conference AS home_conference,
         g.home_score,
         g.away_score,
         t_away.team_name AS away_team_name,
@@ -26,16 +51,63 @@ def load_data_with_sql_join(conn):
         w.wind_speed,
         w.precipitation,
         m.moon_illumination,
-        m.moon_phase
-    FROM Games g
-    JOIN Locations loc ON g.location_id = loc.location_id
-    JOIN Teams t_home ON g.home_team_id = t_home.team_id
-    JOIN Teams t_away ON g.away_team_id = t_away.team_id
-    LEFT JOIN Weather w ON g.game_date = w.game_date AND g.location_id = w.location_id
-    LEFT JOIN Moon_Data m ON g.game_date = m.game_date AND g.location_id = m.location_id
+        m.moon_phase,
+        aq.pollutant_value AS aqi,
+        r.home_rating,
+        r.away_rating,
+        r.home_win_prob""" + JOINED_FROM + """    LEFT JOIN Game_Ratings r ON g.game_id = r.game_id
     ORDER BY g.game_date DESC
+"""
+
+def ensure_joined_tables(conn):
+    """Create Game_Ratings if this database has never been rated, so JOINED_QUERY
+    runs (ratings are NULL until ratings.update_ratings fills them)."""
+    create_rating_tables(conn)
+
+def load_data_with_sql_join(conn):
     """
-    return pd.read_sql_query(query, conn)
+    Load data using a massive SQL join. 
+    Note: We select specific columns to keep the dataframe clean from the start.
+    """
+    ensure_joined_tables(conn)
+    return pd.read_sql_query(JOINED_QUERY, conn)
+
+# Compact dtypes for the joined dataset. Integers that may be NULL (e.g. a
+# game with no score yet) fall back to float32 so NaN still works.
+CATEGORY_COLUMNS = ['stadium_city', 'home_conference', 'home_team_name', 'away_team_name', 'moon_phase']
+INT_COLUMNS = {'game_id': 'int32', 'location_id': 'int16', 'home_score': 'int16',
+               'away_score': 'int16', 'total_points': 'int16'}
+FLOAT_COLUMNS = ['temperature', 'wind_speed', 'precipitation', 'moon_illumination', 'aqi',
+                 'home_rating', 'away_rating', 'home_win_prob']
+
+def optimize_dtypes(joined: pd.DataFrame):
+    """Return a copy of `joined` using category/int16/int32/float32/datetime64 columns."""
+    df = joined.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col, dtype in INT_COLUMNS.items():
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors='coerce')
+            df[col] = values.astype(dtype if values.notna().all() else 'float32')
+    for col in FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+    if 'game_date' in df.columns:
+        df['game_date'] = pd.to_datetime(df['game_date'])
+    return df
+
+def load_data_typed(conn):
+    """load_data_with_sql_join with compact dtypes (see optimize_dtypes)."""
+    return optimize_dtypes(load_data_with_sql_join(conn))
+
+def cut_bins(values, bins, labels, **kwargs):
+    """pd.cut that compares in the column's own float precision, so a float32
+    reading of 79.9 lands in the same bin as the float64 one."""
+    values = pd.to_numeric(values, errors='coerce')
+    if values.dtype == np.float32:
+        bins = np.asarray(bins, dtype=np.float32)
+    return pd.cut(values, bins=bins, labels=labels, **kwargs)
 
 def compute_points_by_temperature_bins(joined: pd.DataFrame):
     df = joined.copy()
@@ -43,9 +115,7 @@ def compute_points_by_temperature_bins(joined: pd.DataFrame):
     if temp_col not in df.columns:
         df[temp_col] = np.nan
 
-    bins = [-1e9, 39.9, 59.9, 79.9, 1e9]
-    labels = ['Below 40 F', '40-59 F', '60-79 F', '80+ F'] # More readable labels
-    df['temp_bin'] = pd.cut(df[temp_col].astype(float), bins=bins, labels=labels)
+    df['temp_bin'] = cut_bins(df[temp_col], TEMP_BINS, TEMP_LABELS)
 
     agg = df.groupby('temp_bin', observed=True).agg(
         count=('total_points', 'count'),
@@ -60,12 +130,10 @@ def compute_points_by_wind_precip(joined: pd.DataFrame):
     df = joined.copy()
     wind_col = 'wind_speed'
     
-    bins = [-1e9, 5.0, 15.0, 1e9]
-    labels = ['Low Wind (0-5 mph)', 'Medium Wind (6-15 mph)', 'High Wind (16+ mph)']
-    df['wind_bin'] = pd.cut(df[wind_col].astype(float), bins=bins, labels=labels)
+    df['wind_bin'] = cut_bins(df[wind_col], WIND_BINS, WIND_LABELS)
     
     # Convert boolean to text immediately for clarity
-    df['Condition'] = df.get('precipitation', 0).fillna(0).apply(lambda x: 'Rainy' if x > 0 else 'Dry')
+    df['Condition'] = np.where(df.get('precipitation', 0).fillna(0) > 0, 'Rainy', 'Dry')
 
     agg = df.groupby(['wind_bin', 'Condition'], observed=True).agg(
         count=('total_points', 'count'),
@@ -94,9 +162,7 @@ def compute_points_by_moon_illumination(joined: pd.DataFrame):
     df[col] = pd.to_numeric(df[col], errors='coerce') / 100.0
     df_valid = df[(df[col].notna()) & (df[col] >= 0.0) & (df[col] <= 1.0) & (df['total_points'].notna())].copy()
     
-    bins = [0.0, 0.25, 0.5, 0.75, 1.0]
-    labels = ['New Moon (0-25%)', 'Crescent (25-50%)', 'Gibbous (50-75%)', 'Full Moon (75-100%)']
-    df_valid['moon_bin'] = pd.cut(df_valid[col].astype(float), bins=bins, labels=labels, include_lowest=True)
+    df_valid['moon_bin'] = cut_bins(df_valid[col], MOON_BINS, MOON_LABELS, include_lowest=True)
 
     agg = df_valid.groupby('moon_bin', observed=True).agg(
         count=('total_points', 'count'),
@@ -110,7 +176,7 @@ def compute_win_pct_by_stadium_rain(joined: pd.DataFrame):
     df['rainy'] = df.get('precipitation', 0).fillna(0) > 0
     df['home_win'] = df['home_score'] > df['away_score']
     
-    agg = df.groupby(['stadium_city', 'rainy']).agg(
+    agg = df.groupby(['stadium_city', 'rainy'], observed=True).agg(
         num_games=('home_score', 'count'),
         num_wins=('home_win', 'sum')
     ).reset_index()
@@ -118,101 +184,321 @@ def compute_win_pct_by_stadium_rain(joined: pd.DataFrame):
     agg['win_pct'] = agg['num_wins'] / agg['num_games']
     return agg
 
-# --- THE CLEANING FUNCTION ---
-def export_clean_csvs(joined, by_temp, by_wind, corr, by_moon, by_rain):
-    ensure_outputs_dir()
-    
-    # 1. Master Dataset: Sort by Date, round numbers, rename columns
+def compute_scoring_model(joined: pd.DataFrame, conn=None):
+    """
+    Least-squares fit of total points and home margin on the weather features.
+    With `conn`, new games are folded into the sufficient statistics stored in
+    the database (O(k^2) per game); without it, the fit is done on `joined`.
+    """
+    if conn is not None:
+        models, _ = scoring_model.update_models(conn, joined)
+    else:
+        models = scoring_model.fit_models(joined)
+    return scoring_model.models_to_frame(models)
+
+# --- THE RESULTS OBJECT ---
+@dataclass
+class AnalysisResults:
+    """Everything main() computes, in the internal (snake_case) schema.
+
+    This is what visualize.py plots from; the CSVs are just one sink for it.
+    Tables that were not (re)computed are empty DataFrames.
+    """
+    joined: pd.DataFrame = field(default_factory=pd.DataFrame)
+    by_temp: pd.DataFrame = field(default_factory=pd.DataFrame)
+    by_wind: pd.DataFrame = field(default_factory=pd.DataFrame)
+    corr: pd.DataFrame = field(default_factory=pd.DataFrame)
+    by_moon: pd.DataFrame = field(default_factory=pd.DataFrame)
+    by_rain: pd.DataFrame = field(default_factory=pd.DataFrame)
+    model: pd.DataFrame = field(default_factory=pd.DataFrame)
+    by_play: pd.DataFrame = field(default_factory=pd.DataFrame)
+
+def run_analysis(conn, outputs=None, update_model=True):
+    """
+    Load the joined dataset and compute the tables. `outputs` (a set of
+    output CSV paths) limits the work to those tables; None computes all.
+    """
+    needs = lambda path: outputs is None or path in outputs
+    with metrics.span('compute', stage='load_data'), profiling.stage('load_data'):
+        joined = load_data_typed(conn)
+    metrics.inc('rows_loaded_total', len(joined))
+    results = AnalysisResults(joined=joined)
+    if joined.empty:
+        return results
+
+    if needs('outputs/points_by_temp.csv'):
+        with metrics.span('compute', stage='points_by_temp'), profiling.stage('points_by_temp'):
+            results.by_temp = compute_points_by_temperature_bins(joined)
+    if needs('outputs/points_by_wind_precip.csv'):
+        with metrics.span('compute', stage='points_by_wind_precip'), profiling.stage('points_by_wind_precip'):
+            results.by_wind = compute_points_by_wind_precip(joined)
+    if needs('outputs/correlation_matrix.csv'):
+        with metrics.span('compute', stage='correlation_matrix'), profiling.stage('correlation_matrix'):
+            results.corr = compute_correlation_matrix(joined)
+    if needs('outputs/points_by_moon_illumination.csv'):
+        with metrics.span('compute', stage='points_by_moon_illumination'), profiling.stage('points_by_moon_illumination'):
+            results.by_moon = compute_points_by_moon_illumination(joined)
+    if needs('outputs/win_pct_by_stadium_rain.csv'):
+        with metrics.span('compute', stage='win_pct_by_stadium_rain'), profiling.stage('win_pct_by_stadium_rain'):
+            results.by_rain = compute_win_pct_by_stadium_rain(joined)
+    if needs('outputs/scoring_model.csv'):
+        with metrics.span('compute', stage='scoring_model'), profiling.stage('scoring_model'):
+            results.model = compute_scoring_model(joined, conn if update_model else None)
+    if needs('outputs/play_types_by_weather.csv'):
+        # Plays stay in SQLite: hundreds per game, aggregated where they live
+        from sql_analysis import sql_play_types_by_weather
+        with metrics.span('compute', stage='play_types_by_weather'), profiling.stage('play_types_by_weather'):
+            results.by_play = sql_play_types_by_weather(conn)
+    return results
+
+# --- CSV SCHEMA (internal name -> human-readable CSV header) ---
+JOINED_COLUMNS = {
+    'game_date': 'Date',
+    'stadium_city': 'Stadium City',
+    'home_team_name': 'Home Team',
+    'home_score': 'Home Pts',
+    'away_score': 'Away Pts',
+    'away_team_name': 'Away Team',
+    'total_points': 'Total Pts',
+    'temperature': 'Temp (F)',
+    'wind_speed': 'Wind (mph)',
+    'precipitation': 'Precip (in)',
+    'moon_illumination': 'Moon %',
+    'moon_phase': 'Moon Phase',
+    'aqi': 'AQI',
+    'home_rating': 'Home Elo (pre-game)',
+    'away_rating': 'Away Elo (pre-game)',
+    'home_win_prob': 'Home Win Prob'
+}
+JOINED_ROUNDING = {'temperature': 1, 'wind_speed': 1, 'precipitation': 2, 'moon_illumination': 1, 'aqi': 1,
+                   'home_rating': 1, 'away_rating': 1, 'home_win_prob': 3}
+TEMP_COLUMNS = {'temp_bin': 'Temperature Range', 'count': 'Games Played', 'avg_total_points': 'Avg Total Score',
+                'min_score': 'Lowest Score', 'max_score': 'Highest Score'}
+WIND_COLUMNS = {'wind_bin': 'Wind Category', 'Condition': 'Weather Condition', 'count': 'Games Played',
+                'avg_total_points': 'Avg Total Score'}
+MOON_COLUMNS = {'moon_bin': 'Moon Phase Category', 'count': 'Games Played', 'avg_total_points': 'Avg Total Score'}
+RAIN_COLUMNS = {'stadium_city': 'Stadium', 'rainy': 'Condition', 'num_games': 'Total Games',
+                'num_wins': 'Home Wins', 'win_pct': 'Home Win %'}
+CORR_NAMES = {
+    'temperature': 'Temp (F)', 'wind_speed': 'Wind (mph)', 'precipitation': 'Precip (in)',
+    'moon_illumination': 'Moon Illum %', 'total_points': 'Total Points Scored'
+}
+MODEL_COLUMNS = {'target': 'Outcome', 'term': 'Term', 'coef': 'Coefficient', 'std_err': 'Std Error',
+                 't_stat': 't', 'p_value': 'p-value', 'n': 'Games Used', 'r_squared': 'R Squared'}
+PLAY_COLUMNS = {'wind_bin': 'Wind Category', 'Condition': 'Weather Condition', 'play_category': 'Play Type',
+                'plays': 'Plays', 'pct_of_plays': '% of Plays', 'avg_yards': 'Avg Yards Gained',
+                'success_rate': 'Success %'}
+MODEL_TARGETS = {'total_points': 'Total Points', 'home_margin': 'Home Margin'}
+MODEL_TERMS = {
+    'intercept': 'Intercept', 'temperature': 'Temp (F)', 'wind_speed': 'Wind (mph)',
+    'precipitation': 'Precip (in)', 'moon_illumination': 'Moon Illum %', 'aqi': 'AQI'
+}
+
+def _invert(mapping):
+    return {v: k for k, v in mapping.items()}
+
+# --- THE CLEANING FUNCTIONS ---
+def export_joined_dataset(joined):
+    # Master Dataset: Sort by Date, round numbers, rename columns
     joined_clean = joined.copy()
-    joined_clean = joined_clean.round({
-        'temperature': 1, 'wind_speed': 1, 'precipitation': 2, 'moon_illumination': 1
-    })
-    joined_clean = joined_clean.rename(columns={
-        'game_date': 'Date',
-        'stadium_city': 'Stadium City',
-        'home_team_name': 'Home Team',
-        'home_score': 'Home Pts',
-        'away_score': 'Away Pts',
-        'away_team_name': 'Away Team',
-        'total_points': 'Total Pts',
-        'temperature': 'Temp (F)',
-        'wind_speed': 'Wind (mph)',
-        'precipitation': 'Precip (in)',
-        'moon_illumination': 'Moon %',
-        'moon_phase': 'Moon Phase'
-    })
+    joined_clean = joined_clean.round(JOINED_ROUNDING)
+    joined_clean = joined_clean.rename(columns=JOINED_COLUMNS)
     # Reorder for logic: Date -> Location -> Matchup -> Scores -> Weather
-    cols_order = ['Date', 'Stadium City', 'Home Team', 'Home Pts', 'Away Pts', 'Away Team', 
-                  'Total Pts', 'Temp (F)', 'Wind (mph)', 'Precip (in)', 'Moon %', 'Moon Phase']
+    cols_order = list(JOINED_COLUMNS.values())
     # Only keep columns that exist (in case moon_phase is missing)
     cols_final = [c for c in cols_order if c in joined_clean.columns]
     
     joined_clean[cols_final].to_csv('outputs/joined_dataset.csv', index=False)
 
+def export_clean_csvs(joined, by_temp, by_wind, corr, by_moon, by_rain, model=None, only=None, by_play=None):
+    """Write the readable CSVs. `only` limits the export to those output paths."""
+    ensure_outputs_dir()
+    wanted = lambda path: only is None or path in only
+
+    # 1. Master Dataset
+    if not joined.empty and wanted('outputs/joined_dataset.csv'):
+        export_joined_dataset(joined)
+
     # 2. Temperature Analysis
-    if not by_temp.empty:
-        temp_clean = by_temp.copy()
-        temp_clean.columns = ['Temperature Range', 'Games Played', 'Avg Total Score', 'Lowest Score', 'Highest Score']
+    if not by_temp.empty and wanted('outputs/points_by_temp.csv'):
+        temp_clean = by_temp.rename(columns=TEMP_COLUMNS)
         temp_clean = temp_clean.round(1)
         temp_clean.to_csv('outputs/points_by_temp.csv', index=False)
 
     # 3. Wind Analysis
-    if not by_wind.empty:
-        wind_clean = by_wind.copy()
-        wind_clean.columns = ['Wind Category', 'Weather Condition', 'Games Played', 'Avg Total Score']
+    if not by_wind.empty and wanted('outputs/points_by_wind_precip.csv'):
+        wind_clean = by_wind.rename(columns=WIND_COLUMNS)
         wind_clean = wind_clean.round(1)
         wind_clean.to_csv('outputs/points_by_wind_precip.csv', index=False)
 
     # 4. Correlation Matrix (Rename index/cols for humans)
-    if not corr.empty:
+    if not corr.empty and wanted('outputs/correlation_matrix.csv'):
         corr_clean = corr.round(2)
-        name_map = {
-            'temperature': 'Temp (F)', 'wind_speed': 'Wind (mph)', 'precipitation': 'Precip (in)',
-            'moon_illumination': 'Moon Illum %', 'total_points': 'Total Points Scored'
-        }
-        corr_clean = corr_clean.rename(index=name_map, columns=name_map)
+        corr_clean = corr_clean.rename(index=CORR_NAMES, columns=CORR_NAMES)
         corr_clean.to_csv('outputs/correlation_matrix.csv')
 
     # 5. Moon Analysis
-    if not by_moon.empty:
-        moon_clean = by_moon.copy()
-        moon_clean.columns = ['Moon Phase Category', 'Games Played', 'Avg Total Score']
+    if not by_moon.empty and wanted('outputs/points_by_moon_illumination.csv'):
+        moon_clean = by_moon.rename(columns=MOON_COLUMNS)
         moon_clean = moon_clean.round(1)
         moon_clean.to_csv('outputs/points_by_moon_illumination.csv', index=False)
 
     # 6. Win % by Rain
-    if not by_rain.empty:
+    if not by_rain.empty and wanted('outputs/win_pct_by_stadium_rain.csv'):
         rain_clean = by_rain.copy()
         rain_clean['rainy'] = rain_clean['rainy'].map({True: 'Rainy', False: 'Dry'})
         rain_clean['win_pct'] = (rain_clean['win_pct'] * 100).round(1)
-        rain_clean.columns = ['Stadium', 'Condition', 'Total Games', 'Home Wins', 'Home Win %']
+        rain_clean = rain_clean.rename(columns=RAIN_COLUMNS)
         rain_clean.to_csv('outputs/win_pct_by_stadium_rain.csv', index=False)
 
+    # 7. Weather Regression
+    if model is not None and not model.empty and wanted('outputs/scoring_model.csv'):
+        model_clean = model.copy()
+        model_clean['target'] = model_clean['target'].map(MODEL_TARGETS)
+        model_clean['term'] = model_clean['term'].map(MODEL_TERMS)
+        model_clean = model_clean.round({'coef': 3, 'std_err': 3, 't_stat': 2,
+                                         'p_value': 4, 'r_squared': 3})
+        model_clean = model_clean.rename(columns=MODEL_COLUMNS)
+        model_clean.to_csv('outputs/scoring_model.csv', index=False)
+
+    # 8. Play Types by Weather (header only until play_by_play.py has run, so the cache sees it)
+    if by_play is not None and wanted('outputs/play_types_by_weather.csv'):
+        play_clean = by_play.reindex(columns=list(PLAY_COLUMNS))
+        play_clean['success_rate'] = play_clean['success_rate'] * 100
+        play_clean = play_clean.round({'pct_of_plays': 1, 'avg_yards': 2, 'success_rate': 1})
+        play_clean = play_clean.rename(columns=PLAY_COLUMNS)
+        play_clean.to_csv('outputs/play_types_by_weather.csv', index=False)
+
     print("\n✅ CLEAN CSVs saved to outputs/")
 
-def main(save_csv=False):
+def export_results(results: AnalysisResults, only=None, conn=None):
+    """
+    Write every table in `results`. With `conn`, the master dataset is
+    streamed straight from SQLite (stream_export) instead of copied and
+    renamed in pandas, which keeps export memory flat.
+    """
+    joined = results.joined
+    if conn is not None and (only is None or 'outputs/joined_dataset.csv' in only):
+        import stream_export
+        ensure_outputs_dir()
+        stream_export.export_joined_dataset(conn, 'outputs/joined_dataset.csv')
+        joined = pd.DataFrame()
+    export_clean_csvs(joined, results.by_temp, results.by_wind, results.corr,
+                      results.by_moon, results.by_rain, results.model, only=only, by_play=results.by_play)
+
+def read_clean_csvs(tables=None):
+    """
+    Inverse of export_clean_csvs: read outputs/*.csv back into an
+    AnalysisResults with internal column names. `tables` limits which
+    attributes are read (e.g. ['by_temp']); missing files stay empty.
+    """
+    wanted = lambda name: tables is None or name in tables
+
+    def read(path, **kwargs):
+        try:
+            return pd.read_csv(path, **kwargs)
+        except FileNotFoundError:
+            return pd.DataFrame()
+
+    results = AnalysisResults()
+    if wanted('joined'):
+        results.joined = read('outputs/joined_dataset.csv').rename(columns=_invert(JOINED_COLUMNS))
+    if wanted('by_temp'):
+        results.by_temp = read('outputs/points_by_temp.csv').rename(columns=_invert(TEMP_COLUMNS))
+    if wanted('by_wind'):
+        results.by_wind = read('outputs/points_by_wind_precip.csv').rename(columns=_invert(WIND_COLUMNS))
+    if wanted('by_moon'):
+        results.by_moon = read('outputs/points_by_moon_illumination.csv').rename(columns=_invert(MOON_COLUMNS))
+
+    if wanted('corr'):
+        corr = read('outputs/correlation_matrix.csv', index_col=0)
+        results.corr = corr.rename(index=_invert(CORR_NAMES), columns=_invert(CORR_NAMES))
+
+    if wanted('by_rain'):
+        rain = read('outputs/win_pct_by_stadium_rain.csv').rename(columns=_invert(RAIN_COLUMNS))
+        if not rain.empty:
+            rain['rainy'] = rain['rainy'] == 'Rainy'
+            rain['win_pct'] = rain['win_pct'] / 100.0
+        results.by_rain = rain
+
+    if wanted('model'):
+        model = read('outputs/scoring_model.csv').rename(columns=_invert(MODEL_COLUMNS))
+        if not model.empty:
+            model['target'] = model['target'].map(_invert(MODEL_TARGETS))
+            model['term'] = model['term'].map(_invert(MODEL_TERMS))
+        results.model = model
+
+    if wanted('by_play'):
+        play = read('outputs/play_types_by_weather.csv').rename(columns=_invert(PLAY_COLUMNS))
+        if not play.empty:
+            play['success_rate'] = play['success_rate'] / 100.0
+        results.by_play = play
+    return results
+
+def main(save_csv=True, force=False, backend='pandas'):
+    """
+    Run the analysis; returns an AnalysisResults (None if nothing to do).
+    backend='sql' aggregates inside SQLite (sql_analysis.py) instead of
+    loading the joined dataset into pandas.
+    """
     conn = connect_db()
-    print("Loading data...")
-    joined = load_data_with_sql_join(conn)
-    
-    if joined.empty:
-        print("Error: No data found.")
-        return
 
-    print(f"Loaded {len(joined)} games.")
+    # Rate new games first: their pre-game ratings are part of the joined dataset
+    import ratings
+    with metrics.span('compute', stage='ratings'), profiling.stage('ratings'):
+        rated = ratings.update_ratings(conn)
+    if rated:
+        print(f"Rated {rated} games")
+
+    # Skip everything whose input tables and code are unchanged
+    cache = ResultCache()
+    keys = output_cache_keys(conn)
+    stale = cache.stale(keys, force=force)
+    if not stale:
+        print("✅ Outputs up to date (database unchanged)")
+        conn.close()
+        return None
+
+    if backend == 'sql':
+        import sql_analysis
+        games = sql_analysis.count_rows(conn)
+        if games:
+            print(f"Aggregating {games} games in SQLite...")
+            results = sql_analysis.run_analysis_sql(conn, outputs=stale)
+    else:
+        print("Loading data...")
+        results = run_analysis(conn, outputs=stale)
+        games = len(results.joined)
+
+    if not games:
+        print("Error: No data found.")
+        conn.close()
+        return None
 
-    # Compute stats
-    by_temp = compute_points_by_temperature_bins(joined)
-    by_wind = compute_points_by_wind_precip(joined)
-    corr = compute_correlation_matrix(joined)
-    by_moon = compute_points_by_moon_illumination(joined)
-    by_rain = compute_win_pct_by_stadium_rain(joined)
+    if backend != 'sql':
+        print(f"Loaded {games} games.")
 
     # Export
-    export_clean_csvs(joined, by_temp, by_wind, corr, by_moon, by_rain)
+    if save_csv:
+        with metrics.span('export', stage='csv'), profiling.stage('export_csv'):
+            export_results(results, only=stale, conn=conn)
+        for path in stale:
+            cache.record(path, keys[path])
+        cache.save()
+    conn.close()
+    return results
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    parser.add_argument('--save-csv', action='store_true', help='Save CSV outputs to outputs/')
+    parser.add_argument('--save-csv', action='store_true', help='Save CSV outputs to outputs/ (the default)')
+    parser.add_argument('--no-csv', action='store_true', help='Compute only; do not write CSVs to outputs/')
+    parser.add_argument('--force', action='store_true', help='Regenerate outputs even if inputs are unchanged')
+    parser.add_argument('--backend', choices=['pandas', 'sql'], default='pandas',
+                        help='sql: bin and group inside SQLite without loading the joined rows')
+    parser.add_argument('--profile', action='store_true',
+                        help='cProfile + tracemalloc per stage into outputs/profile/analyze/ (use with --force)')
     args = parser.parse_args()
-    main(save_csv=args.save_csv)
+    metrics.export_on_exit('analyze')
+    if args.profile:
+        profiling.enable('analyze')
+    main(save_csv=not args.no_csv, force=args.force, backend=args.backend)
@@ -0,0 +1,278 @@
+"""profiling.py
+
+Opt-in CPU and allocation profiling per pipeline stage (`--profile` on
+process_and_analyze.py, visualize.py, the collectors and cli.py).
+
+For each stage (a `with profiling.stage(name):` block) it writes to
+outputs/profile/<run>/:
+  <stage>.prof     cProfile stats (pstats / snakeviz / gprof2dot)
+  <stage>.txt      top functions by cumulative time
+  <stage>.folded   collapsed stacks from a sampling thread, for flamegraph.pl,
+                   speedscope or inferno
+and at exit:
+  allocations.txt  top-N allocation sites per stage at the stage's memory
+                   peak (tracemalloc), with DataFrame .copy() sites and
+                   copy() call counts flagged
+  summary.json     per-stage wall time, peak/retained traced memory, copies
+
+Temporary allocations (like a defensive `joined.copy()` freed when a
+compute_* returns) are gone by the end of a stage, so the sampler also keeps
+the tracemalloc snapshot taken at the stage's highest traced memory.
+
+tracemalloc runs only inside a stage (started on entry, stopped on exit), so
+everything it reports was allocated by that stage and code between stages
+runs at full speed. When profiling is off, stage() is a no-op context
+manager. Stages don't nest: an inner stage inside an active one is folded
+into the outer stage.
+"""
+import atexit
+import contextlib
+import cProfile
+import io
+import json
+import linecache
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+PROFILE_DIR = os.path.join('outputs', 'profile')
+SAMPLE_INTERVAL = 0.002   # seconds between stack samples
+TOP_N = 15
+TRACE_FRAMES = 25
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_SKIP = {os.path.abspath(__file__), tracemalloc.__file__}
+
+_profiler = None
+
+
+class _Sampler(threading.Thread):
+    """Samples one thread's stack and keeps the tracemalloc snapshot at peak memory."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stop_event = threading.Event()
+        self.peak_bytes = 0
+        self.peak_snapshot = None
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+            self.check_peak()
+
+    def check_peak(self):
+        current, _ = tracemalloc.get_traced_memory()   # (0, 0) while not tracing
+        # Re-snapshot only on a >10% new high to bound the snapshot cost
+        if current > self.peak_bytes * 1.1:
+            self.peak_bytes = current
+            self.peak_snapshot = tracemalloc.take_snapshot()
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def _site_of(frames):
+    """Innermost project frame of a raw (most-recent-first) traceback, else the innermost frame."""
+    for frame in frames:
+        if frame[0].startswith(PROJECT_ROOT):
+            return frame
+    return frames[0]
+
+
+def _sites(snapshot):
+    """{(file, line): [bytes, blocks]} keyed by the innermost frame in this project.
+
+    numpy/pandas allocations are traced at the library line that made them
+    (e.g. BlockManager.copy); walking out to the first project frame charges
+    them to the line that asked for them, like `df = joined.copy()`.
+    Snapshot.statistics('traceback') hashes every Traceback and takes seconds
+    per snapshot once pandas is loaded, so the raw trace tuples are walked
+    directly (tracebacks are shared between traces, hence the memo). Raw
+    traces are private to tracemalloc; without them (another Python) the
+    public Trace objects are walked instead, slower but the same result.
+    """
+    sites, memo = {}, {}
+    raw = getattr(snapshot.traces, '_traces', None)
+    if raw is None:
+        # Rebuilt per trace: an id() memo would see recycled ids, so none
+        memo = None
+        raw = ((None, trace.size, tuple((f.filename, f.lineno) for f in reversed(trace.traceback)), None)
+               for trace in snapshot.traces)
+    for _, size, frames, _ in raw:
+        if memo is None:
+            site = _site_of(frames)
+        else:
+            site = memo.get(id(frames))
+            if site is None:
+                site = memo[id(frames)] = _site_of(frames)
+        if site[0] in _SKIP:
+            continue
+        entry = sites.get(site)
+        if entry is None:
+            entry = sites[site] = [0, 0]
+        entry[0] += size
+        entry[1] += 1
+    return sites
+
+
+def _copy_calls(stats):
+    """(calls, seconds) of DataFrame/Series .copy() in a pstats.Stats."""
+    calls, seconds = 0, 0.0
+    for (filename, _, name), (_, ncalls, _, cumtime, _) in stats.stats.items():
+        if name == 'copy' and 'pandas' in filename and filename.endswith('generic.py'):
+            calls += ncalls
+            seconds += cumtime
+    return calls, seconds
+
+
+class Profiler:
+    def __init__(self, run, directory=PROFILE_DIR, top=TOP_N):
+        self.run = run
+        self.directory = os.path.join(directory, run)
+        self.top = top
+        self.stages = []
+        self.active = False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.active:
+            yield
+            return
+        self.active = True
+        os.makedirs(self.directory, exist_ok=True)
+        sampler = _Sampler(threading.get_ident())
+        profile = cProfile.Profile()
+        sampler.start()
+        # Tracing only inside the stage: every live trace belongs to it, and
+        # the (allocation-heavy) reporting below isn't slowed by tracing
+        tracemalloc.start(TRACE_FRAMES)
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            wall = time.perf_counter() - start
+            sampler.stop()
+            sampler.check_peak()
+            end_snapshot = tracemalloc.take_snapshot()
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.active = False
+            self._record(name, wall, profile, sampler, end_snapshot, retained, peak)
+
+    def _record(self, name, wall, profile, sampler, end_snapshot, retained, peak):
+        base = os.path.join(self.directory, name)
+        profile.dump_stats(base + '.prof')
+        text = io.StringIO()
+        stats = pstats.Stats(profile, stream=text)
+        stats.sort_stats('cumulative').print_stats(30)
+        with open(base + '.txt', 'w') as f:
+            f.write(text.getvalue())
+        with open(base + '.folded', 'w') as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        at_peak = _sites(sampler.peak_snapshot or end_snapshot)
+        copy_calls, copy_seconds = _copy_calls(stats)
+        self.stages.append({
+            'stage': name,
+            'wall_s': round(wall, 4),
+            'peak_traced_mb': round(peak / 1e6, 3),
+            'retained_mb': round(retained / 1e6, 3),
+            'samples': sum(sampler.stacks.values()),
+            'copy_calls': copy_calls,
+            'copy_s': round(copy_seconds, 4),
+            'top_allocations': [_site(where, size, count) for where, (size, count)
+                                in sorted(at_peak.items(), key=lambda kv: -kv[1][0])[:self.top]],
+        })
+
+    def write_report(self):
+        if not self.stages:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, 'summary.json'), 'w') as f:
+            json.dump({'run': self.run, 'stages': self.stages}, f, indent=2)
+
+        lines = [f"Allocation report: {self.run}", '']
+        copies = {}   # source text -> [KB, {site: stage}]
+        for st in self.stages:
+            lines.append(f"== {st['stage']}: {st['wall_s'] * 1000:.1f} ms, peak {st['peak_traced_mb']:.2f} MB, "
+                         f"retained {st['retained_mb']:.2f} MB, DataFrame.copy() x{st['copy_calls']} "
+                         f"({st['copy_s'] * 1000:.1f} ms)")
+            for site in st['top_allocations']:
+                flag = '  ⚠️  copy' if site['copy'] else ''
+                lines.append(f"  {site['kb']:>10.1f} KB {site['count']:>7}  {site['where']}  {site['source']}{flag}")
+                if site['copy']:
+                    entry = copies.setdefault(site['source'], [0.0, {}])
+                    entry[0] += site['kb']
+                    entry[1][site['where']] = st['stage']
+            lines.append('')
+        if copies:
+            lines.append('Copies live at a stage peak (same source line in several places = repeated copy):')
+            for source, (kb, where) in sorted(copies.items(), key=lambda kv: -kv[1][0]):
+                lines.append(f"  {kb:>10.1f} KB  x{len(where)}  {source}")
+                for site, stage_name in where.items():
+                    lines.append(f"{'':>22}{site} ({stage_name})")
+        with open(os.path.join(self.directory, 'allocations.txt'), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        n = len(self.stages)
+        print(f"🔍 Profile written to {self.directory}/ ({n} stage{'s' if n != 1 else ''})")
+
+
+def _site(where, size, count):
+    filename, lineno = where
+    source = linecache.getline(filename, lineno).strip()
+    return {
+        'where': f"{os.path.basename(filename)}:{lineno}",
+        'source': source[:80],
+        'kb': round(size / 1024, 1),
+        'count': count,
+        'copy': '.copy(' in source,
+    }
+
+
+def enable(run, directory=PROFILE_DIR):
+    """Turn profiling on for this process; reports are written at exit."""
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler(run, directory)
+        atexit.register(_profiler.write_report)
+    return _profiler
+
+
+def enable_from_argv(run, argv=None):
+    """For scripts without argparse: enable if '--profile' is on the command line."""
+    argv = sys.argv if argv is None else argv
+    if '--profile' in argv:
+        return enable(run)
+    return None
+
+
+def is_enabled():
+    return _profiler is not None
+
+
+def stage(name):
+    """Profile the enclosed block as one stage (no-op unless enabled)."""
+    if _profiler is None:
+        return contextlib.nullcontext()
+    return _profiler.stage(name)
@@ -0,0 +1,256 @@
+"""query_service.py
+
+Read-only local HTTP/JSON service over the analysis results, built on
+asyncio (no web framework needed).
+
+    python query_service.py [--port 8765]
+
+    GET /health                      -> {"version": n, "games": n, "loaded_at": ...}
+    GET /tables                      -> names of the available tables
+    GET /tables/<name>               -> by_temp, by_wind, by_moon, by_rain, model, corr
+    GET /games?<filters>             -> games matching game_query filters, e.g.
+                                        /games?wind_speed__gt=15&home_conference=SEC
+    GET /similar?<conditions>        -> k games played in the most similar conditions
+                                        (similar_games), e.g. /similar?temperature=38
+                                        &wind_speed=18&k=20&city=Iowa City
+
+Everything is served from an in-memory snapshot built once per database
+change: tables are pre-serialized to JSON bytes with an ETag, and game
+filters go through a game_query.GameIndex. A background task polls
+`PRAGMA data_version` and rebuilds the snapshot (in a worker thread) only
+when another connection has committed. Clients that send If-None-Match get
+304 Not Modified without a body. Query ETags come from a digest of the
+snapshot's contents, not the data version: that counter is per connection
+and starts over when the service restarts.
+
+Binds to 127.0.0.1 only.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from urllib.parse import urlsplit, parse_qsl
+from utils import connect_db
+import pandas as pd
+from result_cache import DatabaseWatcher, code_version
+
+TABLES = ['by_temp', 'by_wind', 'by_moon', 'by_rain', 'model', 'corr']
+GAME_COLUMNS = ['game_id', 'game_date', 'stadium_city', 'home_team_name', 'away_team_name',
+                'home_score', 'away_score', 'total_points', 'temperature', 'wind_speed',
+                'precipitation', 'moon_illumination', 'moon_phase', 'aqi']
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 503: 'Service Unavailable'}
+
+
+def _etag(body):
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def _records(df):
+    """JSON records valued like joined_dataset.csv: readings back to float64 and
+    rounded per JOINED_ROUNDING (not float32 noise), dates as YYYY-MM-DD."""
+    from process_and_analyze import JOINED_ROUNDING
+    rounding = {c: d for c, d in JOINED_ROUNDING.items() if c in df.columns}
+    df = df.astype({c: 'float64' for c in rounding}).round(rounding)
+    if 'game_date' in df.columns:
+        df['game_date'] = pd.to_datetime(df['game_date']).dt.strftime('%Y-%m-%d')
+    return df.to_json(orient='records').encode()
+
+
+class Snapshot:
+    """Precomputed JSON bodies + game index for one database version."""
+
+    def __init__(self, version, previous=None):
+        from process_and_analyze import run_analysis
+        from game_query import GameIndex
+        from similar_games import SimilarGames
+
+        conn = connect_db()
+        # update_model=False: the service never writes results to the
+        # database (the only write is run_analysis creating the empty rating
+        # tables of a never-rated database, see ensure_joined_tables)
+        results = run_analysis(conn, update_model=False)
+        conn.close()
+
+        self.version = version
+        self.loaded_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.joined = results.joined
+        self.index = GameIndex(results.joined) if not results.joined.empty else None
+        if results.joined.empty:
+            self.similar = None
+        elif previous is not None and previous.similar is not None:
+            # new games go into the previous index's insert buffer; its trees are kept
+            self.similar = previous.similar.updated(results.joined)
+        else:
+            self.similar = SimilarGames(results.joined)
+        self.tables = {}
+        for name in TABLES:
+            df = getattr(results, name)
+            if name == 'corr':
+                body = df.to_json(orient='index').encode()
+            else:
+                body = df.to_json(orient='records', date_format='iso').encode()
+            self.tables[name] = (body, _etag(body))
+
+        # Content digest for the /games and /similar ETags: the same rows
+        # and code give the same tag across restarts, different rows never do
+        digest = hashlib.sha1(code_version('query_service.py', 'game_query.py', 'similar_games.py').encode())
+        digest.update(pd.util.hash_pandas_object(results.joined, index=False).values.tobytes())
+        for body, _ in self.tables.values():
+            digest.update(body)
+        self.digest = digest.hexdigest()
+
+    def query_etag(self, path, params):
+        return '"' + hashlib.sha1(f"{self.digest}{path}?{params}".encode()).hexdigest() + '"'
+
+    def games(self, params):
+        from game_query import _parse_filter
+        if self.index is None:
+            return b'[]'
+        filters = dict(_parse_filter(f"{k}={v}") for k, v in params)
+        rows = self.index.rows(self.index.query(**filters))
+        cols = [c for c in GAME_COLUMNS if c in self.joined.columns]
+        return _records(self.joined.iloc[rows][cols])
+
+    def similar_games(self, params):
+        if self.similar is None:
+            return b'[]'
+        options = dict(params)
+        k = int(options.pop('k', 20))
+        city, before = options.pop('city', None), options.pop('before', None)
+        conditions = {key: float(value) for key, value in options.items()}
+        games = self.similar.query(k, city=city, before=before, **conditions)
+        return _records(games)
+
+
+class QueryService:
+    def __init__(self, poll_seconds=2.0):
+        self.poll_seconds = poll_seconds
+        self.snapshot = None
+        self.watch_conn = connect_db()
+        self.watcher = DatabaseWatcher(self.watch_conn)
+        self.reloads = 0
+
+    async def reload_if_changed(self):
+        if self.watcher.changed() or self.snapshot is None:
+            version = self.watcher.last
+            # Build off the event loop; swap in one assignment so requests
+            # always see a complete snapshot
+            snapshot = await asyncio.to_thread(Snapshot, version, self.snapshot)
+            self.snapshot = snapshot
+            self.reloads += 1
+            print(f"🔄 Loaded snapshot v{version} ({len(snapshot.joined)} games)")
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.reload_if_changed()
+            except Exception as e:
+                print(f"❌ Reload failed: {e}")
+
+    def route(self, path, query, headers):
+        """Return (status, body bytes, etag or None)."""
+        snap = self.snapshot
+        if snap is None:
+            return 503, b'{"error": "loading"}', None
+
+        if path == '/health':
+            body = json.dumps({'version': snap.version, 'games': len(snap.joined),
+                               'loaded_at': snap.loaded_at, 'reloads': self.reloads}).encode()
+            return 200, body, None
+        if path == '/tables':
+            body = json.dumps(TABLES).encode()
+            return 200, body, _etag(body)
+        if path.startswith('/tables/'):
+            name = path[len('/tables/'):]
+            if name not in snap.tables:
+                return 404, b'{"error": "unknown table"}', None
+            body, etag = snap.tables[name]
+            return 200, body, etag
+        if path == '/games':
+            params = sorted(parse_qsl(query))
+            # ETag from (snapshot contents, query) so repeat polls get a 304 without filtering
+            etag = snap.query_etag(path, params)
+            if headers.get('if-none-match') == etag:
+                return 304, b'', etag
+            try:
+                return 200, snap.games(params), etag
+            except (KeyError, ValueError) as e:
+                return 400, json.dumps({'error': str(e)}).encode(), None
+        if path == '/similar':
+            params = sorted(parse_qsl(query))
+            etag = snap.query_etag(path, params)
+            if headers.get('if-none-match') == etag:
+                return 304, b'', etag
+            try:
+                return 200, snap.similar_games(params), etag
+            except ValueError as e:
+                return 400, json.dumps({'error': str(e)}).encode(), None
+        return 404, b'{"error": "not found"}', None
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+
+                if method != 'GET':
+                    status, body, etag = 405, b'{"error": "GET only"}', None
+                else:
+                    url = urlsplit(target)
+                    status, body, etag = self.route(url.path, url.query, headers)
+                    if status == 200 and etag and headers.get('if-none-match') == etag:
+                        status, body = 304, b''
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                        "Content-Type: application/json",
+                        f"Content-Length: {len(body)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                if etag:
+                    head.append(f"ETag: {etag}")
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        await self.reload_if_changed()
+        server = await asyncio.start_server(self.handle, host, port)
+        watcher = asyncio.create_task(self.watch())
+        print(f"✅ Serving on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+            self.watch_conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local read-only JSON API over the analysis results')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--poll', type=float, default=2.0, help='Seconds between database change checks')
+    args = parser.parse_args()
+    try:
+        asyncio.run(QueryService(poll_seconds=args.poll).serve(port=args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,359 @@
+"""ratings.py
+
+Elo-style team ratings, so weather effects can be looked at net of who is
+playing. Games are rated in date order from their final scores:
+
+    dr        = (home_rating - away_rating + home) * (1 - weather * severity)
+    p(home)   = 1 / (1 + 10 ** (-dr / 400))
+    change    = k * mov_multiplier * (result - p(home))
+
+severity is 0 in calm, dry weather and rises to 1 with wind (WIND_FULL mph)
+and rain, so bad-weather games are predicted closer to a coin flip and an
+upset in them moves ratings less. Ratings regress toward INITIAL by `revert`
+between seasons. All parameters are in DEFAULTS.
+
+Two ways to compute them:
+  update_ratings(conn)  persisted and incremental: Team_Ratings holds the
+                        current rating per team, Game_Ratings the pre-game
+                        ratings and home win probability per game. Each new
+                        game reads and writes two teams, O(1). A game older
+                        than the last one rated, or different parameters,
+                        triggers a rebuild.
+  simulate(schedule)    full recompute in one vectorized pass: games are
+                        grouped into rounds (one date, no team twice), each
+                        round is one array update, and every parameter
+                        setting is a row of the rating matrix, so a whole
+                        grid search is a single pass (grid_search).
+
+Game_Ratings is joined into the master dataset (home_rating, away_rating,
+home_win_prob). process_and_analyze.main() brings it up to date first.
+
+    python ratings.py                 # update, print the top teams
+    python ratings.py --rebuild --k 25 --weather 0.3
+    python ratings.py --grid          # log loss per setting -> outputs/rating_grid.csv
+"""
+import argparse
+import itertools
+import json
+import os
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from createdatabase import create_rating_tables
+from utils import connect_db, ensure_outputs_dir
+
+INITIAL = 1500.0
+WIND_FULL = 30.0       # mph at which wind alone gives severity 1
+RAIN_SEVERITY = 0.5    # severity added by any precipitation
+DEFAULTS = {
+    'k': 20.0,         # rating points per unit of surprise
+    'home': 55.0,      # home-field advantage in rating points
+    'weather': 0.25,   # share of the rating gap lost at severity 1
+    'revert': 0.33,    # share of the distance to INITIAL lost between seasons
+    'mov': 1.0,        # 1: scale by margin of victory, 0: win/loss only
+}
+GRID = {
+    'k': [15.0, 20.0, 25.0, 30.0, 40.0],
+    'home': [35.0, 55.0, 75.0],
+    'weather': [0.0, 0.25, 0.5],
+    'revert': [0.2, 0.33, 0.5],
+    'mov': [0.0, 1.0],
+}
+GRID_PATH = os.path.join('outputs', 'rating_grid.csv')
+
+# One row per scored game, weather averaged (Weather is not unique per date/location)
+SCHEDULE_QUERY = """
+    SELECT g.game_id, g.game_date, g.home_team_id, g.away_team_id, g.home_score, g.away_score,
+           AVG(w.wind_speed) AS wind_speed, MAX(w.precipitation) AS precipitation
+    FROM Games g
+    LEFT JOIN Weather w ON g.game_date = w.game_date AND g.location_id = w.location_id
+    WHERE g.home_score IS NOT NULL AND g.away_score IS NOT NULL {where}
+    GROUP BY g.game_id
+    ORDER BY g.game_date, g.game_id
+"""
+
+
+# --- RATING MATH (scalars for update_ratings, arrays for simulate) ---
+
+def severity(wind_speed, precipitation):
+    """0 (calm, dry, or unknown) to 1 (WIND_FULL mph, or strong wind plus rain)."""
+    wind = np.nan_to_num(np.asarray(wind_speed, dtype=float), nan=0.0)
+    rain = np.nan_to_num(np.asarray(precipitation, dtype=float), nan=0.0) > 0
+    return np.clip(wind / WIND_FULL + RAIN_SEVERITY * rain, 0.0, 1.0)
+
+
+def expected(dr):
+    return 1.0 / (1.0 + 10.0 ** (-dr / 400.0))
+
+
+def rating_change(dr, margin, k, mov):
+    """Points the home team gains (the away team loses the same)."""
+    result = np.where(margin > 0, 1.0, np.where(margin < 0, 0.0, 0.5))
+    # Winner's expected edge damps blowouts by favourites (autocorrelation correction)
+    winner_dr = dr * np.sign(margin)
+    multiplier = np.log(np.maximum(np.abs(margin), 1) + 1.0) * 2.2 / (winner_dr * 0.001 + 2.2)
+    return k * (mov * multiplier + (1.0 - mov)) * (result - expected(dr))
+
+
+def season_of(game_date):
+    """Season of an ISO date string; January/February games belong to the previous one."""
+    return int(game_date[:4]) - (int(game_date[5:7]) < 3)
+
+
+# --- VECTORIZED FULL RECOMPUTE ---
+
+@dataclass
+class Schedule:
+    game_ids: np.ndarray
+    home: np.ndarray          # team ids, used directly as column indexes
+    away: np.ndarray
+    margin: np.ndarray
+    severity: np.ndarray
+    season: np.ndarray
+    rounds: list              # index arrays; within a round no team plays twice
+    new_season: list          # per round: first round of a later season
+    n_teams: int
+
+
+def load_schedule(conn, where=''):
+    return pd.read_sql_query(SCHEDULE_QUERY.format(where=where), conn)
+
+
+def make_schedule(games: pd.DataFrame):
+    """Schedule arrays for simulate() from load_schedule() rows (date order)."""
+    home = games['home_team_id'].to_numpy(dtype=np.int64)
+    away = games['away_team_id'].to_numpy(dtype=np.int64)
+    dates = games['game_date'].astype(str).str[:10].to_numpy()
+    season = np.array([season_of(d) for d in dates], dtype=np.int64)
+
+    rounds, new_season = [], []
+    current_date, busy, base = None, {}, 0
+    for i in range(len(games)):
+        if dates[i] != current_date:
+            current_date, busy, base = dates[i], {}, len(rounds)
+        level = max(busy.get(home[i], -1), busy.get(away[i], -1)) + 1
+        busy[home[i]] = busy[away[i]] = level
+        if base + level == len(rounds):
+            new_season.append(bool(rounds) and season[i] != season[rounds[-1][0]])
+            rounds.append([])
+        rounds[base + level].append(i)
+
+    return Schedule(
+        game_ids=games['game_id'].to_numpy(dtype=np.int64),
+        home=home,
+        away=away,
+        margin=(games['home_score'] - games['away_score']).to_numpy(dtype=float),
+        severity=severity(games['wind_speed'], games['precipitation']),
+        season=season,
+        rounds=[np.asarray(r, dtype=np.int64) for r in rounds],
+        new_season=new_season,
+        n_teams=int(max(home.max(initial=0), away.max(initial=0))) + 1,
+    )
+
+
+def _param_columns(params):
+    """{name: (P, 1) array}; scalars and equal-length lists broadcast together."""
+    values = {name: np.atleast_1d(np.asarray(params.get(name, default), dtype=float))
+              for name, default in DEFAULTS.items()}
+    p = max(len(v) for v in values.values())
+    return {name: np.broadcast_to(v, (p,))[:, None] for name, v in values.items()}, p
+
+
+def simulate(schedule: Schedule, **params):
+    """
+    Rate every game of `schedule` for one or many parameter settings (each
+    parameter a scalar or a length-P array). Returns (home_pre, away_pre,
+    home_win_prob, final) with shapes (P, games) x 3 and (P, teams).
+    """
+    p, n_settings = _param_columns(params)
+    ratings = np.full((n_settings, schedule.n_teams), INITIAL)
+    n = len(schedule.game_ids)
+    home_pre = np.empty((n_settings, n))
+    away_pre = np.empty((n_settings, n))
+    prob = np.empty((n_settings, n))
+
+    for idx, new_season in zip(schedule.rounds, schedule.new_season):
+        if new_season:
+            ratings = INITIAL + (ratings - INITIAL) * (1.0 - p['revert'])
+        h, a = schedule.home[idx], schedule.away[idx]
+        rh, ra = ratings[:, h], ratings[:, a]
+        dr = (rh - ra + p['home']) * (1.0 - p['weather'] * schedule.severity[idx])
+        delta = rating_change(dr, schedule.margin[idx], p['k'], p['mov'])
+        home_pre[:, idx], away_pre[:, idx], prob[:, idx] = rh, ra, expected(dr)
+        ratings[:, h] = rh + delta
+        ratings[:, a] = ra - delta
+    return home_pre, away_pre, prob, ratings
+
+
+def grid_search(schedule: Schedule, grid=GRID):
+    """Log loss and Brier score of every combination in `grid`, best first.
+
+    The first season is burn-in (everyone starts at INITIAL) and is not
+    scored unless it is the only one. Ties are left out.
+    """
+    names = list(grid)
+    combos = list(itertools.product(*(grid[name] for name in names)))
+    settings = {name: [c[i] for c in combos] for i, name in enumerate(names)}
+    _, _, prob, _ = simulate(schedule, **settings)
+
+    scored = schedule.margin != 0
+    if len(np.unique(schedule.season)) > 1:
+        scored &= schedule.season != schedule.season.min()
+    won = (schedule.margin[scored] > 0).astype(float)
+    prob = np.clip(prob[:, scored], 1e-9, 1 - 1e-9)
+    out = pd.DataFrame(settings)
+    out['log_loss'] = -(won * np.log(prob) + (1 - won) * np.log(1 - prob)).mean(axis=1)
+    out['brier'] = ((prob - won) ** 2).mean(axis=1)
+    out['accuracy'] = ((prob > 0.5) == (won == 1)).mean(axis=1)
+    out['games'] = int(scored.sum())
+    return out.sort_values('log_loss', ignore_index=True)
+
+
+# --- PERSISTED, INCREMENTAL ---
+
+def _state(conn):
+    return dict(conn.execute("SELECT key, value FROM Rating_State").fetchall())
+
+
+def _save_state(cursor, params, last_date, season):
+    cursor.executemany("INSERT OR REPLACE INTO Rating_State (key, value) VALUES (?, ?)",
+                       [('params', json.dumps(params, sort_keys=True)),
+                        ('last_date', last_date), ('season', str(season))])
+
+
+def rebuild(conn, params=None):
+    """Recompute every rating with simulate() and replace the stored ones. Returns games rated."""
+    params = {**DEFAULTS, **(params or {})}
+    create_rating_tables(conn)
+    games = load_schedule(conn)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM Game_Ratings")
+    cursor.execute("DELETE FROM Team_Ratings")
+    cursor.execute("DELETE FROM Rating_State")
+    if games.empty:
+        _save_state(cursor, params, '', 0)
+        conn.commit()
+        return 0
+
+    schedule = make_schedule(games)
+    home_pre, away_pre, prob, final = simulate(schedule, **params)
+    cursor.executemany(
+        "INSERT INTO Game_Ratings (game_id, home_rating, away_rating, home_win_prob) VALUES (?, ?, ?, ?)",
+        zip(schedule.game_ids.tolist(), home_pre[0].tolist(), away_pre[0].tolist(), prob[0].tolist()))
+    played = np.bincount(np.concatenate([schedule.home, schedule.away]), minlength=schedule.n_teams)
+    teams = np.flatnonzero(played)
+    cursor.executemany("INSERT INTO Team_Ratings (team_id, rating, games) VALUES (?, ?, ?)",
+                       zip(teams.tolist(), final[0, teams].tolist(), played[teams].tolist()))
+    _save_state(cursor, params, str(games['game_date'].iloc[-1])[:10], int(schedule.season[-1]))
+    conn.commit()
+    return len(games)
+
+
+def update_ratings(conn, params=None):
+    """
+    Rate the scored games not yet in Game_Ratings. `params` (default: the
+    ones the stored ratings were built with, else DEFAULTS) that differ from
+    the stored ones, or a game dated before the last one rated, rebuild
+    instead. Returns the number of games rated.
+    """
+    create_rating_tables(conn)
+    state = _state(conn)
+    stored = json.loads(state['params']) if 'params' in state else None
+    params = {**DEFAULTS, **(params or stored or {})}
+    if stored != params:
+        return rebuild(conn, params)
+
+    new = load_schedule(conn, where="AND g.game_id NOT IN (SELECT game_id FROM Game_Ratings)")
+    if new.empty:
+        return 0
+    last_date, season = state.get('last_date', ''), int(state.get('season', 0))
+    if str(new['game_date'].iloc[0])[:10] < last_date:
+        return rebuild(conn, params)
+
+    cursor = conn.cursor()
+    ratings = {}   # team_id -> [rating, games] for the teams touched so far
+
+    def team(team_id):
+        if team_id not in ratings:
+            row = cursor.execute("SELECT rating, games FROM Team_Ratings WHERE team_id = ?", (team_id,)).fetchone()
+            ratings[team_id] = list(row) if row else [INITIAL, 0]
+        return ratings[team_id]
+
+    def flush():
+        cursor.executemany("INSERT OR REPLACE INTO Team_Ratings (team_id, rating, games) VALUES (?, ?, ?)",
+                           [(t, r, g) for t, (r, g) in ratings.items()])
+        ratings.clear()
+
+    rows = []
+    for g in new.itertuples(index=False):
+        game_date = str(g.game_date)[:10]
+        game_season = season_of(game_date)
+        if season and game_season > season:
+            # once per season, every team at once
+            flush()
+            cursor.execute("UPDATE Team_Ratings SET rating = ? + (rating - ?) * ?",
+                           (INITIAL, INITIAL, 1.0 - params['revert']))
+        season = game_season
+        home, away = team(int(g.home_team_id)), team(int(g.away_team_id))
+        dr = (home[0] - away[0] + params['home']) * (1.0 - params['weather'] * severity(g.wind_speed, g.precipitation))
+        delta = float(rating_change(dr, g.home_score - g.away_score, params['k'], params['mov']))
+        rows.append((int(g.game_id), home[0], away[0], float(expected(dr))))
+        home[0] += delta
+        away[0] -= delta
+        home[1] += 1
+        away[1] += 1
+        last_date = game_date
+
+    flush()
+    cursor.executemany(
+        "INSERT INTO Game_Ratings (game_id, home_rating, away_rating, home_win_prob) VALUES (?, ?, ?, ?)", rows)
+    _save_state(cursor, params, last_date, season)
+    conn.commit()
+    return len(rows)
+
+
+def top_teams(conn, n=10):
+    return pd.read_sql_query("""
+        SELECT t.team_name, r.rating, r.games
+        FROM Team_Ratings r JOIN Teams t ON r.team_id = t.team_id
+        ORDER BY r.rating DESC LIMIT ?
+    """, conn, params=(n,))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Weather-adjusted Elo team ratings')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute every rating (vectorized)')
+    parser.add_argument('--grid', action='store_true', help='Score every GRID setting, write outputs/rating_grid.csv')
+    parser.add_argument('--apply-best', action='store_true', help='With --grid: rebuild with the best setting')
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f'--{name}', type=float, help=f'(default {default})')
+    args = parser.parse_args()
+    chosen = {name: getattr(args, name) for name in DEFAULTS if getattr(args, name) is not None}
+
+    conn = connect_db()
+    create_rating_tables(conn)
+    if args.grid:
+        import time
+        games = load_schedule(conn)
+        if games.empty:
+            print("❌ No scored games")
+            raise SystemExit(1)
+        start = time.perf_counter()
+        schedule = make_schedule(games)
+        results = grid_search(schedule)
+        seconds = time.perf_counter() - start
+        ensure_outputs_dir()
+        results.to_csv(GRID_PATH, index=False)
+        print(f"✅ {len(results)} settings x {len(games)} games in {seconds:.2f}s -> {GRID_PATH}")
+        print(results.head(10).to_string(index=False))
+        if args.apply_best:
+            chosen = results.iloc[0][list(DEFAULTS)].to_dict()
+            args.rebuild = True
+    if args.rebuild:
+        stored = _state(conn).get('params')
+        params = {**(json.loads(stored) if stored else DEFAULTS), **chosen}
+        print(f"✅ Rebuilt ratings for {rebuild(conn, params)} games with {params}")
+    else:
+        print(f"✅ Rated {update_ratings(conn, chosen or None)} new games")
+    print(top_teams(conn).to_string(index=False))
+    conn.close()
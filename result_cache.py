@@ -0,0 +1,198 @@
+"""result_cache.py
+
+Skip regenerating outputs whose inputs have not changed.
+
+Every output (CSV or figure) gets a cache key built from what it depends on:
+  - database tables: row count, max rowid and a content checksum of each
+    table it reads (the checksum catches in-place UPDATEs and REPLACEs under
+    the same rowid, e.g. corrected scores or dates; append-only tables skip it)
+  - files: sha256 of each input file (e.g. a CSV a chart is drawn from)
+  - code: sha256 of the source files that produce it, plus CACHE_VERSION
+
+Keys are stored in a small JSON manifest next to the outputs. When every key
+matches and the files still exist, the run is a no-op.
+
+`PRAGMA data_version` only has meaning inside one connection (it changes when
+ANOTHER connection commits), so it is used by long-running processes to
+notice new writes cheaply via `DatabaseWatcher`, not in the persisted keys.
+"""
+import hashlib
+import json
+import os
+import zlib
+
+CACHE_VERSION = 1
+CACHE_PATH = os.path.join('outputs', '.result_cache.json')
+
+# What each pipeline output depends on. Kept here (stdlib only) so status
+# checks can run without importing pandas/matplotlib.
+#
+# Tables each CSV reads. Every output goes through the Games/Locations/Teams
+# join; the rest is what its compute_* function actually uses.
+JOIN_TABLES = ['Games', 'Locations', 'Teams']
+OUTPUT_TABLES = {
+    'outputs/joined_dataset.csv': JOIN_TABLES + ['Weather', 'Moon_Data', 'AirQuality', 'Game_Ratings'],
+    'outputs/points_by_temp.csv': JOIN_TABLES + ['Weather'],
+    'outputs/points_by_wind_precip.csv': JOIN_TABLES + ['Weather'],
+    'outputs/correlation_matrix.csv': JOIN_TABLES + ['Weather', 'Moon_Data'],
+    'outputs/points_by_moon_illumination.csv': JOIN_TABLES + ['Moon_Data'],
+    'outputs/win_pct_by_stadium_rain.csv': JOIN_TABLES + ['Weather'],
+    'outputs/scoring_model.csv': JOIN_TABLES + ['Weather', 'Moon_Data', 'AirQuality'],
+    'outputs/play_types_by_weather.csv': JOIN_TABLES + ['Weather', 'Plays', 'PlayTypes'],
+}
+# Figure -> the CSV (AnalysisResults table) it is drawn from
+FIGURE_INPUTS = {
+    'figures/1_temperature_impact.png': 'outputs/points_by_temp.csv',
+    'figures/2_wind_impact.png': 'outputs/points_by_wind_precip.csv',
+    'figures/3_rain_scoring_box.png': 'outputs/joined_dataset.csv',
+    'figures/4_rain_win_pct.png': 'outputs/win_pct_by_stadium_rain.csv',
+    'figures/5_correlation_matrix.png': 'outputs/correlation_matrix.csv',
+}
+
+
+# Only ever INSERTed into (play_by_play.py), so count + max rowid is enough
+# and the checksum scan of their many rows is skipped
+APPEND_ONLY_TABLES = {'Plays', 'PlayTypes'}
+
+
+def _text_crc(rowid, *values):
+    """crc32 of one row's text/blob values (non-text ones arrive as None)."""
+    return zlib.crc32(repr((rowid,) + values).encode())
+
+
+def _checksum_sql(cursor, table):
+    """SQL for the checksums of table: one position-weighted sum per column
+    plus a sum of per-row crc32s over the full text values.
+
+    Numbers are summed in plain SQL (one sum per column, so a large column
+    like game_id cannot swallow a small change in another). Text has no
+    SQL hash, so each row's text goes through _text_crc once; the rowid is
+    part of what is hashed, and a sum of 32-bit values stays exact.
+    """
+    cursor.execute(f"PRAGMA table_info({table})")
+    cols = [row[1] for row in cursor.fetchall()]
+    sums = [f"TOTAL(CASE WHEN typeof(\"{col}\") IN ('integer', 'real') THEN \"{col}\" ELSE 0 END "
+            f"* (rowid % 1009 + 1))" for col in cols]
+    text = [f"CASE WHEN typeof(\"{col}\") IN ('text', 'blob') THEN \"{col}\" END" for col in cols]
+    sums.append(f"SUM(_text_crc({', '.join(['rowid'] + text)}))")
+    return sums
+
+
+def table_fingerprint(conn, tables):
+    """
+    {table: [row_count, max_rowid, [column checksums]]} for each table
+    (missing tables -> None; APPEND_ONLY_TABLES have no checksums).
+    """
+    conn.create_function('_text_crc', -1, _text_crc, deterministic=True)
+    cursor = conn.cursor()
+    fp = {}
+    for table in sorted(tables):
+        try:
+            sums = [] if table in APPEND_ONLY_TABLES else _checksum_sql(cursor, table)
+            cursor.execute(f"SELECT {', '.join(['COUNT(*)', 'MAX(rowid)'] + sums)} FROM {table}")
+            row = cursor.fetchone()
+            fp[table] = list(row[:2]) + ([list(row[2:])] if sums else [])
+        except Exception:
+            fp[table] = None
+    return fp
+
+
+def data_version(conn):
+    return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def file_digest(path):
+    """sha256 of a file's contents, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def code_version(*paths):
+    """Hash of the given source files plus CACHE_VERSION."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha256(str(CACHE_VERSION).encode())
+    for p in paths:
+        h.update((file_digest(os.path.join(here, p)) or p).encode())
+    return h.hexdigest()
+
+
+def make_key(**parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def output_cache_keys(conn):
+    """{CSV path: cache key} from the tables it reads and the analysis code."""
+    all_tables = sorted(set(t for tables in OUTPUT_TABLES.values() for t in tables))
+    fingerprint = table_fingerprint(conn, all_tables)
+    code = code_version('process_and_analyze.py', 'sql_analysis.py', 'scoring_model.py', 'ratings.py', 'utils.py',
+                        'stream_export.py')
+    return {
+        path: make_key(tables={t: fingerprint[t] for t in tables}, code=code)
+        for path, tables in OUTPUT_TABLES.items()
+    }
+
+
+def figure_cache_keys(input_keys=None):
+    """
+    {figure path: cache key}. Inputs are keyed by CSV content, or by
+    `input_keys` ({CSV path: key}) when plotting straight from memory.
+    """
+    code = code_version('visualize.py')
+    keys = {}
+    for png, csv in FIGURE_INPUTS.items():
+        source = input_keys.get(csv) if input_keys is not None else file_digest(csv)
+        keys[png] = make_key(input=source, code=code)
+    return keys
+
+
+class ResultCache:
+    """JSON manifest of {output_path: key}."""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def is_fresh(self, output, key):
+        return self.entries.get(output) == key and os.path.exists(output)
+
+    def stale(self, keys, force=False):
+        """Subset of {output: key} that needs regenerating."""
+        return {out for out, key in keys.items() if force or not self.is_fresh(out, key)}
+
+    def record(self, output, key):
+        self.entries[output] = key
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+class DatabaseWatcher:
+    """Cheap change detection for a long-lived connection.
+
+    changed() is True the first time and whenever another connection has
+    committed since the last call (PRAGMA data_version moved).
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.last = None
+
+    def changed(self):
+        current = data_version(self.conn)
+        if current != self.last:
+            self.last = current
+            return True
+        return False
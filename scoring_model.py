@@ -0,0 +1,230 @@
+"""scoring_model.py
+
+Least-squares model of total points (and home margin) on the weather
+features: temperature, wind, precipitation, moon illumination and AQI.
+
+Only the normal-equation sufficient statistics (XᵀX, Xᵀy, yᵀy, n) are
+kept, and they are persisted in `football_weather.db`. Adding a game is a
+rank-1 update, O(k²) per row, so the weekly in-season refresh never refits
+from scratch.
+
+Model_Games keeps the row each game contributed. A game whose score or
+weather was corrected since is subtracted with its stored row and added
+back with the new one, and a game that dropped out of the join (or lost a
+feature) is subtracted.
+"""
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+FEATURES = ['temperature', 'wind_speed', 'precipitation', 'moon_illumination', 'aqi']
+TERMS = ['intercept'] + FEATURES
+TARGETS = {
+    'total_points': lambda df: df['home_score'] + df['away_score'],
+    'home_margin': lambda df: df['home_score'] - df['away_score'],
+}
+# What Model_Games stores per game: enough to take the game out again
+MODEL_COLUMNS = ['home_score', 'away_score'] + FEATURES
+# A stored row counts as unchanged within this relative tolerance: the
+# pandas path reads features as float32, the SQL path as float64
+RTOL = 1e-6
+
+
+class IncrementalLeastSquares:
+    """Running XᵀX / Xᵀy for one target; solve() gives the OLS fit."""
+
+    def __init__(self, k=len(TERMS)):
+        self.k = k
+        self.n = 0
+        self.xtx = np.zeros((k, k))
+        self.xty = np.zeros(k)
+        self.yty = 0.0
+
+    def add(self, x, y):
+        """Absorb one row (x without the intercept term)."""
+        x = np.concatenate(([1.0], np.asarray(x, dtype=float)))
+        self.xtx += np.outer(x, x)
+        self.xty += x * y
+        self.yty += y * y
+        self.n += 1
+
+    def add_many(self, X, y, sign=1):
+        """Absorb a block of rows in one matrix product (sign=-1 takes them out)."""
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if len(X) == 0:
+            return
+        X = np.column_stack([np.ones(len(X)), X])
+        self.xtx += sign * (X.T @ X)
+        self.xty += sign * (X.T @ y)
+        self.yty += sign * float(y @ y)
+        self.n += sign * len(X)
+
+    def remove_many(self, X, y):
+        """Take out rows absorbed earlier."""
+        self.add_many(X, y, sign=-1)
+
+    def merge(self, other, sign=1):
+        """Add (sign=-1: subtract) another model's sums."""
+        self.n += sign * other.n
+        self.xtx += sign * other.xtx
+        self.xty += sign * other.xty
+        self.yty += sign * other.yty
+
+    def solve(self):
+        """Return a coefficient table (coef, std_err, t, p) plus n and R²."""
+        k, n = self.k, self.n
+        out = pd.DataFrame({'term': TERMS[:k]})
+        if n <= k:
+            out['coef'] = np.nan
+            out['std_err'] = np.nan
+            out['t_stat'] = np.nan
+            out['p_value'] = np.nan
+            out['n'] = n
+            out['r_squared'] = np.nan
+            return out
+
+        # pinv handles collinear features (e.g. no rainy games yet)
+        xtx_inv = np.linalg.pinv(self.xtx)
+        beta = xtx_inv @ self.xty
+        sse = max(self.yty - beta @ self.xty, 0.0)
+        y_mean = self.xty[0] / n
+        sst = self.yty - n * y_mean ** 2
+        dof = n - k
+        sigma2 = sse / dof
+        std_err = np.sqrt(np.clip(np.diag(xtx_inv) * sigma2, 0.0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_stat = beta / std_err
+        out['coef'] = beta
+        out['std_err'] = std_err
+        out['t_stat'] = t_stat
+        out['p_value'] = 2 * stats.t.sf(np.abs(t_stat), dof)
+        out['n'] = n
+        out['r_squared'] = 1 - sse / sst if sst > 0 else np.nan
+        return out
+
+
+def create_model_tables(conn):
+    """Tables holding the sufficient statistics and the row of each game in them."""
+    cursor = conn.cursor()
+    have = {row[1] for row in cursor.execute("PRAGMA table_info(Model_Games)")}
+    if have and not set(MODEL_COLUMNS) <= have:
+        # Model_Games from before it kept each game's row: its games could
+        # not be taken out again, so the statistics are refitted from scratch
+        cursor.execute("DROP TABLE Model_Games")
+        cursor.execute("DROP TABLE IF EXISTS Model_Stats")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Model_Stats (
+            target TEXT PRIMARY KEY,
+            n INTEGER NOT NULL,
+            xtx BLOB NOT NULL,
+            xty BLOB NOT NULL,
+            yty REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Model_Games (
+            game_id INTEGER PRIMARY KEY,
+            home_score REAL NOT NULL,
+            away_score REAL NOT NULL,
+            temperature REAL NOT NULL,
+            wind_speed REAL NOT NULL,
+            precipitation REAL NOT NULL,
+            moon_illumination REAL NOT NULL,
+            aqi REAL NOT NULL,
+            FOREIGN KEY (game_id) REFERENCES Games(game_id)
+        )
+    ''')
+    conn.commit()
+
+
+def load_models(conn):
+    """Return {target: IncrementalLeastSquares} from the database."""
+    create_model_tables(conn)
+    models = {t: IncrementalLeastSquares() for t in TARGETS}
+    rows = conn.execute("SELECT target, n, xtx, xty, yty FROM Model_Stats").fetchall()
+    for target, n, xtx, xty, yty in rows:
+        if target not in models:
+            continue
+        m = models[target]
+        m.n = n
+        m.xtx = np.frombuffer(xtx, dtype=np.float64).reshape(m.k, m.k).copy()
+        m.xty = np.frombuffer(xty, dtype=np.float64).copy()
+        m.yty = yty
+    return models
+
+
+def save_models(conn, models, added_rows=(), removed_ids=()):
+    """
+    Persist the statistics; added_rows are (game_id, *MODEL_COLUMNS) tuples
+    now in them, removed_ids the games taken out (a corrected game is both).
+    """
+    cursor = conn.cursor()
+    for target, m in models.items():
+        cursor.execute('''
+            INSERT OR REPLACE INTO Model_Stats (target, n, xtx, xty, yty)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (target, m.n, m.xtx.astype(np.float64).tobytes(),
+              m.xty.astype(np.float64).tobytes(), float(m.yty)))
+    cursor.executemany("DELETE FROM Model_Games WHERE game_id = ?", [(int(g),) for g in removed_ids])
+    cursor.executemany(
+        f"INSERT OR REPLACE INTO Model_Games (game_id, {', '.join(MODEL_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * (len(MODEL_COLUMNS) + 1))})",
+        [(int(row[0]),) + tuple(float(v) for v in row[1:]) for row in added_rows])
+    conn.commit()
+
+
+def complete_rows(joined: pd.DataFrame):
+    """Games with a score and every feature present (the only usable rows)."""
+    cols = ['home_score', 'away_score'] + FEATURES
+    if any(c not in joined.columns for c in cols):
+        return joined.iloc[0:0]
+    df = joined.copy()
+    df[cols] = df[cols].apply(pd.to_numeric, errors='coerce')
+    return df.dropna(subset=cols)
+
+
+def update_models(conn, joined: pd.DataFrame):
+    """
+    Bring the persisted statistics in line with `joined` (the full dataset):
+    new games are added, corrected ones swapped for their new row, and ones
+    no longer complete taken out. Games missing a feature are skipped (and
+    retried on a later run once their weather/moon/AQ rows exist).
+    """
+    models = load_models(conn)
+    current = complete_rows(joined)[['game_id'] + MODEL_COLUMNS].astype(float)
+    stored = pd.read_sql_query(f"SELECT game_id, {', '.join(MODEL_COLUMNS)} FROM Model_Games", conn).astype(float)
+    both = current.merge(stored, on='game_id', how='outer', suffixes=('', '_stored'), indicator=True)
+    same = (both['_merge'] == 'both') & np.isclose(
+        both[MODEL_COLUMNS].to_numpy(), both[[c + '_stored' for c in MODEL_COLUMNS]].to_numpy(),
+        rtol=RTOL, atol=0).all(axis=1)
+    added = both[(both['_merge'] != 'right_only') & ~same][['game_id'] + MODEL_COLUMNS]
+    removed = both[(both['_merge'] != 'left_only') & ~same]
+    removed = removed[['game_id'] + [c + '_stored' for c in MODEL_COLUMNS]].set_axis(added.columns, axis=1)
+
+    if len(added) or len(removed):
+        for target, fn in TARGETS.items():
+            models[target].remove_many(removed[FEATURES].to_numpy(), fn(removed).to_numpy())
+            models[target].add_many(added[FEATURES].to_numpy(), fn(added).to_numpy())
+        save_models(conn, models, added.itertuples(index=False), removed['game_id'])
+
+    return models, len(added)
+
+
+def fit_models(joined: pd.DataFrame):
+    """Fit from scratch on `joined` (no persistence)."""
+    models = {t: IncrementalLeastSquares() for t in TARGETS}
+    df = complete_rows(joined)
+    X = df[FEATURES].to_numpy(dtype=float)
+    for target, fn in TARGETS.items():
+        models[target].add_many(X, fn(df).to_numpy(dtype=float))
+    return models
+
+
+def models_to_frame(models):
+    frames = []
+    for target, m in models.items():
+        f = m.solve()
+        f.insert(0, 'target', target)
+        frames.append(f)
+    return pd.concat(frames, ignore_index=True)
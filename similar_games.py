@@ -0,0 +1,280 @@
+"""similar_games.py
+
+"Similar conditions" search: the k past games whose weather, moon and air
+quality were closest to a given forecast, e.g. the 20 games most like this
+Saturday's forecast at Kinnick.
+
+Built from the rows `load_data_with_sql_join` selects. Each game is a vector
+of FEATURES, standardized with the index's own mean and standard deviation
+(a missing reading sits at the mean, so it neither helps nor hurts), and
+searched with a scipy cKDTree. A query only uses the features it gives, with
+one tree per feature subset, built on first use.
+
+New games go into a small insert buffer that every query also scans with a
+vectorized distance computation. When the buffer passes REBUILD_FRACTION of
+the index, it is merged in, the scaling is refit and the trees are rebuilt.
+A city / date filter that keeps only a few rows (one stadium) scans those
+rows directly instead of over-fetching from the tree.
+updated(joined) is how a long-running reader (query_service) keeps up: a
+copy of the index with every game not indexed yet added (whenever its
+weather arrived, whatever its date), or a fresh index if an indexed game
+was corrected or removed.
+
+    python similar_games.py --temperature 38 --wind-speed 18 --precipitation 0.1 -k 20
+    python similar_games.py --venue "Kinnick Stadium" --temperature 45 --wind-speed 12 --same-venue
+    python similar_games.py --bench       # query latency over random forecasts
+"""
+import argparse
+import copy
+import time
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from utils import connect_db
+from process_and_analyze import load_data_with_sql_join
+
+FEATURES = ['temperature', 'wind_speed', 'precipitation', 'moon_illumination', 'aqi']
+INFO_COLUMNS = ['game_id', 'game_date', 'stadium_city', 'home_team_name', 'away_team_name',
+                'home_score', 'away_score', 'total_points']
+REQUIRED = ['temperature', 'wind_speed']   # a game is indexed once its weather is in
+REBUILD_FRACTION = 0.02                    # buffer size (share of the index) that triggers a merge
+REBUILD_MIN = 256                          # buffer size always tolerated on small indexes
+BRUTE_FRACTION = 0.05                      # filters keeping fewer rows than this skip the tree
+
+
+def _usable(joined: pd.DataFrame):
+    """Rows with a score and the REQUIRED readings, columns INFO_COLUMNS + FEATURES."""
+    df = joined.reindex(columns=INFO_COLUMNS + FEATURES).copy()
+    df[FEATURES] = df[FEATURES].apply(pd.to_numeric, errors='coerce')
+    df = df.dropna(subset=REQUIRED + ['home_score', 'away_score'])
+    df['game_date'] = pd.to_datetime(df['game_date']).dt.normalize()
+    return df.reset_index(drop=True)
+
+
+class SimilarGames:
+    """k-nearest-neighbour index over standardized game conditions."""
+
+    def __init__(self, joined: pd.DataFrame):
+        self.info = _usable(joined)
+        self.buffer = self.info.iloc[0:0]    # rows added since the last merge
+        self.buffer_scaled = np.empty((0, len(FEATURES)))
+        self.ids = set(self.info['game_id'].tolist())
+        self._fit()
+
+    def _fit(self):
+        """(Re)compute scaling, filter arrays and drop the trees (rebuilt on demand)."""
+        features = self.info[FEATURES].astype(float)
+        self.mean = features.mean().fillna(0.0).to_numpy()
+        std = features.std(ddof=0).fillna(0.0).to_numpy()
+        self.std = np.where(std > 0, std, 1.0)
+        self.scaled = self._scale(features.to_numpy())
+        self.buffer_scaled = self._scale(self.buffer[FEATURES].to_numpy(dtype=float))
+        self.trees = {}
+        self._filters()
+
+    def _scale(self, raw):
+        return np.nan_to_num((raw - self.mean) / self.std, nan=0.0)
+
+    def _filters(self):
+        """City codes and dates over index + buffer rows, for the city / before filters."""
+        cities = pd.concat([self.info['stadium_city'], self.buffer['stadium_city']], ignore_index=True)
+        self.city_code, self.cities = pd.factorize(cities.astype(str))
+        dates = pd.concat([self.info['game_date'], self.buffer['game_date']], ignore_index=True)
+        self.dates = dates.to_numpy(dtype='datetime64[D]')
+
+    def __len__(self):
+        return len(self.info) + len(self.buffer)
+
+    # --- UPDATES ---
+
+    def add(self, joined: pd.DataFrame):
+        """Index new games (rows shaped like load_data_with_sql_join). Returns how many were added."""
+        rows = _usable(joined)
+        rows = rows[~rows['game_id'].isin(self.ids)].drop_duplicates('game_id')
+        if rows.empty:
+            return 0
+        self.ids.update(rows['game_id'].tolist())
+        self.buffer = pd.concat([self.buffer, rows], ignore_index=True)
+        if len(self.buffer) > max(REBUILD_MIN, REBUILD_FRACTION * len(self.info)):
+            self.info = pd.concat([self.info, self.buffer], ignore_index=True)
+            self.buffer = self.info.iloc[0:0]
+            self._fit()
+        else:
+            self.buffer_scaled = self._scale(self.buffer[FEATURES].to_numpy(dtype=float))
+            self._filters()
+        return len(rows)
+
+    def updated(self, joined: pd.DataFrame):
+        """
+        Index for the full dataset `joined`: a copy of this one with the games
+        not indexed yet added, or a new index if any indexed game changed or
+        is gone. self is left as it was, so it can keep serving queries.
+        """
+        rows = _usable(joined)
+        indexed = pd.concat([self.info, self.buffer], ignore_index=True).sort_values('game_id', kind='stable')
+        known = rows[rows['game_id'].isin(self.ids)].sort_values('game_id', kind='stable')
+        if not known.reset_index(drop=True).equals(indexed.reset_index(drop=True)):
+            return SimilarGames(joined)
+        index = copy.copy(self)
+        index.ids = set(self.ids)
+        index.add(rows)
+        return index
+
+    # --- QUERIES ---
+
+    def _tree(self, cols):
+        if cols not in self.trees:
+            self.trees[cols] = cKDTree(self.scaled[:, list(cols)])
+        return self.trees[cols]
+
+    def neighbours(self, k=20, city=None, before=None, **conditions):
+        """(row positions, distances) of the k nearest games, nearest first.
+
+        conditions are FEATURES values (None / missing ones are not compared);
+        city keeps games at that stadium city, before keeps games dated
+        earlier than it.
+        """
+        unknown = set(conditions) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown condition(s): {', '.join(sorted(unknown))}")
+        cols = tuple(i for i, f in enumerate(FEATURES) if conditions.get(f) is not None)
+        if not cols:
+            raise ValueError(f"Give at least one of {', '.join(FEATURES)}")
+        point = (np.array([conditions[FEATURES[i]] for i in cols], dtype=float)
+                 - self.mean[list(cols)]) / self.std[list(cols)]
+
+        keep = None
+        if city is not None:
+            code = self.cities.get_loc(city) if city in self.cities else -1
+            keep = self.city_code == code
+        if before is not None:
+            earlier = self.dates < np.datetime64(pd.Timestamp(before).date(), 'D')
+            keep = earlier if keep is None else keep & earlier
+
+        n = len(self.info)
+        if keep is not None and keep.sum() < BRUTE_FRACTION * len(self):
+            # e.g. one stadium: scanning its rows beats over-fetching from the tree
+            pos = np.flatnonzero(keep)
+            scaled = np.concatenate([self.scaled[pos[pos < n]], self.buffer_scaled[pos[pos >= n] - n]])
+            dist = np.sqrt(((scaled[:, list(cols)] - point) ** 2).sum(axis=1))
+            order = np.argsort(dist, kind='stable')[:k]
+            return pos[order], dist[order]
+
+        buffer_pos = np.arange(n, len(self))
+        buffer_dist = np.sqrt(((self.buffer_scaled[:, list(cols)] - point) ** 2).sum(axis=1))
+        # Filtered queries over-fetch from the tree until k survivors (or the whole index)
+        fetch = k if keep is None else 4 * k
+        while True:
+            fetch = min(fetch, n)
+            if fetch:
+                dist, pos = self._tree(cols).query(point, k=fetch)
+                dist, pos = np.atleast_1d(dist), np.atleast_1d(pos)
+            else:
+                dist, pos = np.empty(0), np.empty(0, dtype=np.int64)
+            dist, pos = np.concatenate([dist, buffer_dist]), np.concatenate([pos, buffer_pos])
+            if keep is not None:
+                dist, pos = dist[keep[pos]], pos[keep[pos]]
+            if len(pos) >= k or fetch >= n:
+                break
+            fetch *= 4
+        order = np.argsort(dist, kind='stable')[:k]
+        return pos[order], dist[order]
+
+    def query(self, k=20, city=None, before=None, **conditions):
+        """The k nearest games as a DataFrame (INFO_COLUMNS, FEATURES, distance)."""
+        pos, dist = self.neighbours(k, city, before, **conditions)
+        n = len(self.info)
+        in_index = pos < n
+        if in_index.all():
+            out = self.info.iloc[pos].reset_index(drop=True)
+            out['distance'] = dist
+            return out
+        out = pd.concat([self.info.iloc[pos[in_index]], self.buffer.iloc[pos[~in_index] - n]])
+        # back to nearest-first order (index rows came before buffer rows)
+        rank = np.concatenate([np.flatnonzero(in_index), np.flatnonzero(~in_index)])
+        out = out.iloc[np.argsort(rank)].reset_index(drop=True)
+        out['distance'] = dist
+        return out
+
+
+def summarize(games: pd.DataFrame):
+    """Average total points and home win rate of a query() result."""
+    n = len(games)
+    return {
+        'count': n,
+        'avg_total_points': float(games['total_points'].mean()) if n else np.nan,
+        'home_win_pct': float((games['home_score'] > games['away_score']).mean()) if n else np.nan,
+        'max_distance': float(games['distance'].max()) if n else np.nan,
+    }
+
+
+def build_index(conn=None):
+    own_conn = conn is None
+    if own_conn:
+        conn = connect_db()
+    joined = load_data_with_sql_join(conn)
+    if own_conn:
+        conn.close()
+    return SimilarGames(joined)
+
+
+def bench(index, queries=2000, k=20, seed=0):
+    """Mean / p99 query latency in µs over random forecasts drawn from the index's own ranges."""
+    rng = np.random.default_rng(seed)
+    features = index.info[FEATURES].astype(float)
+    lo, hi = features.min().fillna(0.0).to_numpy(), features.max().fillna(0.0).to_numpy()
+    forecasts = rng.uniform(lo, hi, size=(queries, len(FEATURES)))
+    index.neighbours(k, **dict(zip(FEATURES, forecasts[0])))    # build the tree outside the timing
+    times = []
+    for row in forecasts:
+        start = time.perf_counter()
+        index.neighbours(k, **dict(zip(FEATURES, row)))
+        times.append((time.perf_counter() - start) * 1e6)
+    return float(np.mean(times)), float(np.percentile(times, 99))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find past games played in conditions like a forecast')
+    parser.add_argument('--temperature', type=float, help='°F')
+    parser.add_argument('--wind-speed', type=float, help='mph')
+    parser.add_argument('--precipitation', type=float, help='inches')
+    parser.add_argument('--moon-illumination', type=float, help='%')
+    parser.add_argument('--aqi', type=float)
+    parser.add_argument('-k', type=int, default=20)
+    parser.add_argument('--venue', help='Stadium the forecast is for (its city is shown; see --same-venue)')
+    parser.add_argument('--city', help='Only games in this stadium city')
+    parser.add_argument('--same-venue', action='store_true', help='Only games in the --venue city')
+    parser.add_argument('--before', help='Only games before this date (YYYY-MM-DD)')
+    parser.add_argument('--bench', action='store_true', help='Time random queries instead')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build_index()
+    print(f"Indexed {len(index)} games in {(time.perf_counter() - start) * 1000:.0f} ms")
+    if args.bench:
+        mean_us, p99_us = bench(index, k=args.k)
+        print(f"k={args.k}: mean {mean_us:.0f} µs, p99 {p99_us:.0f} µs per query")
+        raise SystemExit(0)
+
+    city = args.city
+    if args.venue:
+        import venues
+        venue = venues.resolve(args.venue)
+        if venue is None:
+            print(f"❌ Unknown venue: {args.venue}")
+            raise SystemExit(1)
+        print(f"🔍 Forecast at {venue.name} ({venue.city})")
+        if args.same_venue:
+            city = venue.city
+
+    conditions = {f: getattr(args, f) for f in FEATURES}
+    try:
+        start = time.perf_counter()
+        games = index.query(args.k, city=city, before=args.before, **conditions)
+        elapsed_us = (time.perf_counter() - start) * 1e6
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    print(f"Found {len(games)} games in {elapsed_us:.0f} µs")
+    print(games.assign(game_date=games['game_date'].dt.date).round(2).to_string(index=False))
+    print(summarize(games))
@@ -0,0 +1,357 @@
+"""sql_analysis.py
+
+SQL-pushdown backend for the analysis tables: the temperature / wind / moon
+bins are CASE expressions and the grouping is a GROUP BY inside SQLite, so
+only the small aggregates come back to Python. The joined dataset is never
+materialized, which keeps memory flat at tens of millions of games.
+
+Each sql_* function returns the same table as its compute_* counterpart in
+process_and_analyze.py (same columns, row order and categorical bins):
+
+    compute_points_by_temperature_bins  -> sql_points_by_temperature_bins
+    compute_points_by_wind_precip       -> sql_points_by_wind_precip
+    compute_correlation_matrix          -> sql_correlation_matrix     (sums per NULL pattern)
+    compute_points_by_moon_illumination -> sql_points_by_moon_illumination
+    compute_win_pct_by_stadium_rain     -> sql_win_pct_by_stadium_rain
+    compute_scoring_model               -> sql_scoring_model          (XᵀX / Xᵀy sums)
+
+sql_play_types_by_weather (play-type mix by wind bin and rain) has no pandas
+counterpart; both backends call it.
+
+The pandas path compares float32 columns (optimize_dtypes) while SQLite
+compares the stored float64 values; with readings at 0.1 resolution the bins
+agree, and the correlations/regression differ only in the ~7th digit.
+
+    python process_and_analyze.py --backend sql
+    python sql_analysis.py --check      # compare with the pandas backend
+"""
+import argparse
+import numpy as np
+import pandas as pd
+import metrics
+import profiling
+import scoring_model
+from createdatabase import create_join_indexes
+from process_and_analyze import (JOINED_FROM, TEMP_BINS, TEMP_LABELS, WIND_BINS, WIND_LABELS,
+                                 MOON_BINS, MOON_LABELS, CORR_NAMES, AnalysisResults)
+from utils import connect_db
+
+# The joined rows the aggregates run over (no ORDER BY, only the used columns)
+JOINED_ROWS = """
+    SELECT
+        g.game_id,
+        loc.city_name AS stadium_city,
+        g.home_score,
+        g.away_score,
+        (g.home_score + g.away_score) AS total_points,
+        w.temperature,
+        w.wind_speed,
+        w.precipitation,
+        m.moon_illumination,
+        aq.pollutant_value AS aqi""" + JOINED_FROM
+
+RAINY = "COALESCE(precipitation, 0) > 0"
+
+
+def case_bins(expr, bins, include_lowest=False):
+    """CASE expression giving the pd.cut bin index (right-closed) of `expr`, NULL outside."""
+    whens = []
+    for i, (lo, hi) in enumerate(zip(bins[:-1], bins[1:])):
+        low = f"{expr} >= {lo!r}" if include_lowest and i == 0 else f"{expr} > {lo!r}"
+        whens.append(f"WHEN {low} AND {expr} <= {hi!r} THEN {i}")
+    return f"CASE {' '.join(whens)} END"
+
+
+def _bin_column(codes, labels):
+    """Bin indexes -> the ordered categorical pd.cut produces."""
+    return pd.Categorical.from_codes(np.asarray(codes, dtype=int), categories=labels, ordered=True)
+
+
+def _query(conn, sql, params=()):
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+def sql_points_by_temperature_bins(conn):
+    agg = _query(conn, f"""
+        SELECT {case_bins('temperature', TEMP_BINS)} AS temp_bin,
+               COUNT(total_points) AS count,
+               AVG(total_points) AS avg_total_points,
+               MIN(total_points) AS min_score,
+               MAX(total_points) AS max_score
+        FROM ({JOINED_ROWS}) AS j
+        GROUP BY temp_bin HAVING temp_bin IS NOT NULL
+        ORDER BY temp_bin
+    """)
+    agg['temp_bin'] = _bin_column(agg['temp_bin'], TEMP_LABELS)
+    return agg
+
+
+def sql_points_by_wind_precip(conn):
+    agg = _query(conn, f"""
+        SELECT {case_bins('wind_speed', WIND_BINS)} AS wind_bin,
+               CASE WHEN {RAINY} THEN 'Rainy' ELSE 'Dry' END AS Condition,
+               COUNT(total_points) AS count,
+               AVG(total_points) AS avg_total_points
+        FROM ({JOINED_ROWS}) AS j
+        GROUP BY wind_bin, Condition HAVING wind_bin IS NOT NULL
+        ORDER BY wind_bin, Condition
+    """)
+    agg['wind_bin'] = _bin_column(agg['wind_bin'], WIND_LABELS)
+    return agg
+
+
+def sql_correlation_matrix(conn):
+    """
+    Pearson correlations over pairwise-complete rows (like DataFrame.corr).
+    Rows are grouped by which columns are NULL (at most 2^5 groups), so the
+    per-pair sums are plain SUMs; a pair's totals add up the groups where
+    both of its columns are present.
+    """
+    cols = list(CORR_NAMES)
+    pairs = [(a, b) for i, a in enumerate(cols) for b in cols[i:]]
+    mask = ' | '.join(f"(({c} IS NULL) << {i})" for i, c in enumerate(cols))
+    exprs = [f"SUM({c})" for c in cols] + [f"SUM({a} * {b})" for a, b in pairs]
+    rows = conn.execute(f"""
+        SELECT {mask} AS null_mask, COUNT(*), {', '.join(exprs)}
+        FROM ({JOINED_ROWS}) AS j
+        GROUP BY null_mask
+    """).fetchall()
+
+    groups = [(mask_bits, n, dict(zip(cols, row[:len(cols)])), dict(zip(pairs, row[len(cols):])))
+              for mask_bits, n, *row in rows]
+    corr = pd.DataFrame(np.nan, index=cols, columns=cols)
+    for a, b in pairs:
+        absent = 1 << cols.index(a) | 1 << cols.index(b)
+        n = sx = sy = sxy = sxx = syy = 0.0
+        for mask_bits, count, sums, products in groups:
+            if mask_bits & absent:
+                continue
+            n += count
+            sx += sums[a]
+            sy += sums[b]
+            sxy += products[(a, b)]
+            sxx += products[(a, a)]
+            syy += products[(b, b)]
+        if n == 0:
+            continue
+        cov = sxy - sx * sy / n
+        var = (sxx - sx * sx / n) * (syy - sy * sy / n)
+        if var > 0:
+            corr.loc[a, b] = corr.loc[b, a] = 1.0 if a == b else float(np.clip(cov / np.sqrt(var), -1, 1))
+    return corr
+
+
+def sql_points_by_moon_illumination(conn):
+    illum = "(moon_illumination / 100.0)"
+    agg = _query(conn, f"""
+        SELECT {case_bins(illum, MOON_BINS, include_lowest=True)} AS moon_bin,
+               COUNT(total_points) AS count,
+               AVG(total_points) AS avg_total_points
+        FROM ({JOINED_ROWS}) AS j
+        WHERE {illum} BETWEEN 0.0 AND 1.0 AND total_points IS NOT NULL
+        GROUP BY moon_bin
+        ORDER BY moon_bin
+    """)
+    agg['moon_bin'] = _bin_column(agg['moon_bin'], MOON_LABELS)
+    return agg
+
+
+def sql_win_pct_by_stadium_rain(conn):
+    agg = _query(conn, f"""
+        SELECT stadium_city,
+               {RAINY} AS rainy,
+               COUNT(home_score) AS num_games,
+               SUM(COALESCE(home_score > away_score, 0)) AS num_wins
+        FROM ({JOINED_ROWS}) AS j
+        GROUP BY stadium_city, rainy
+        ORDER BY stadium_city, rainy
+    """)
+    agg['rainy'] = agg['rainy'].astype(bool)
+    agg['win_pct'] = agg['num_wins'] / agg['num_games']
+    return agg
+
+
+# --- SCORING MODEL ---
+
+TARGET_SQL = {'total_points': 'home_score + away_score', 'home_margin': 'home_score - away_score'}
+COMPLETE = ' AND '.join(f"{c} IS NOT NULL" for c in ['home_score', 'away_score'] + scoring_model.FEATURES)
+
+
+def _same_row(a, b):
+    """SQL: rows a and b hold the same MODEL_COLUMNS values (see scoring_model.RTOL)."""
+    return ' AND '.join(f"abs({a}.{c} - {b}.{c}) <= {scoring_model.RTOL!r} * abs({b}.{c})"
+                        for c in scoring_model.MODEL_COLUMNS)
+
+
+# Complete games whose stored Model_Games row is missing or out of date, and
+# stored rows no longer matching a complete game (over temp.model_current)
+ADDED = f"NOT EXISTS (SELECT 1 FROM Model_Games s WHERE s.game_id = j.game_id AND {_same_row('s', 'j')})"
+STALE = f"NOT EXISTS (SELECT 1 FROM temp.model_current c WHERE c.game_id = j.game_id AND {_same_row('j', 'c')})"
+
+
+def _model_sums(conn, where=COMPLETE, source=f"({JOINED_ROWS})"):
+    """{target: IncrementalLeastSquares} holding the sums over the rows of `source` matching `where`."""
+    terms = ['1.0'] + scoring_model.FEATURES
+    k = len(terms)
+    upper = [(i, j) for i in range(k) for j in range(i, k)]
+    exprs = ['COUNT(*)'] + [f"SUM({terms[i]} * {terms[j]})" for i, j in upper]
+    for y in TARGET_SQL.values():
+        exprs += [f"SUM({t} * ({y}))" for t in terms] + [f"SUM(({y}) * ({y}))"]
+    row = conn.execute(f"SELECT {', '.join(exprs)} FROM {source} AS j WHERE {where}").fetchone()
+    row = [v or 0 for v in row]
+
+    xtx = np.zeros((k, k))
+    for (i, j), v in zip(upper, row[1:1 + len(upper)]):
+        xtx[i, j] = xtx[j, i] = v
+    models = {}
+    offset = 1 + len(upper)
+    for target in TARGET_SQL:
+        m = scoring_model.IncrementalLeastSquares(k)
+        m.n = row[0]
+        m.xtx = xtx.copy()
+        m.xty = np.array(row[offset:offset + k], dtype=float)
+        m.yty = float(row[offset + k])
+        models[target] = m
+        offset += k + 1
+    return models
+
+
+PLAY_COLUMNS = ['wind_bin', 'Condition', 'play_category', 'plays', 'pct_of_plays', 'avg_yards', 'success_rate']
+
+
+def sql_play_types_by_weather(conn):
+    """
+    Plays per category (play_by_play.py) in each wind bin x rain condition:
+    count, share of that cell's plays, mean yards gained and success rate
+    (completion / kick made, where PlayTypes.outcome applies). Both backends
+    use this: plays are never loaded into pandas.
+    """
+    try:
+        agg = _query(conn, f"""
+            SELECT {case_bins('j.wind_speed', WIND_BINS)} AS wind_bin,
+                   CASE WHEN COALESCE(j.precipitation, 0) > 0 THEN 'Rainy' ELSE 'Dry' END AS Condition,
+                   pt.category AS play_category,
+                   COUNT(*) AS plays,
+                   AVG(p.yards_gained) AS avg_yards,
+                   AVG(pt.outcome) AS success_rate
+            FROM ({JOINED_ROWS}) AS j
+            JOIN Plays p ON p.game_id = j.game_id
+            JOIN PlayTypes pt ON p.play_type_id = pt.play_type_id
+            GROUP BY wind_bin, Condition, play_category HAVING wind_bin IS NOT NULL
+            ORDER BY wind_bin, Condition, plays DESC
+        """)
+    except pd.errors.DatabaseError:   # database from before play_by_play.py (no Plays table)
+        return pd.DataFrame(columns=PLAY_COLUMNS)
+    if agg.empty:
+        return pd.DataFrame(columns=PLAY_COLUMNS)
+    agg['wind_bin'] = _bin_column(agg['wind_bin'], WIND_LABELS)
+    cell_total = agg.groupby(['wind_bin', 'Condition'], observed=True)['plays'].transform('sum')
+    agg['pct_of_plays'] = agg['plays'] / cell_total * 100
+    return agg[PLAY_COLUMNS]
+
+
+def sql_scoring_model(conn, update=False):
+    """
+    With update=True, the persisted statistics are brought in line with the
+    complete games (like compute_scoring_model(joined, conn): new games
+    added, corrected ones swapped, stale ones taken out); otherwise the fit
+    is over every complete game.
+    """
+    if not update:
+        return scoring_model.models_to_frame(_model_sums(conn))
+    models = scoring_model.load_models(conn)
+    columns = ', '.join(['game_id'] + scoring_model.MODEL_COLUMNS)
+    conn.execute("DROP TABLE IF EXISTS temp.model_current")
+    conn.execute(f"CREATE TEMP TABLE model_current AS SELECT {columns} FROM ({JOINED_ROWS}) AS j WHERE {COMPLETE}")
+    conn.execute("CREATE UNIQUE INDEX temp.model_current_game ON model_current (game_id)")
+    try:
+        added = _model_sums(conn, ADDED, source='temp.model_current')
+        stale = _model_sums(conn, STALE, source='Model_Games')
+        if added['total_points'].n or stale['total_points'].n:
+            for target, m in models.items():
+                m.merge(stale[target], sign=-1)
+                m.merge(added[target])
+            rows = conn.execute(f"SELECT {columns} FROM temp.model_current AS j WHERE {ADDED}").fetchall()
+            ids = [r[0] for r in conn.execute(f"SELECT game_id FROM Model_Games AS j WHERE {STALE}")]
+            scoring_model.save_models(conn, models, rows, ids)
+    finally:
+        conn.execute("DROP TABLE IF EXISTS temp.model_current")
+    return scoring_model.models_to_frame(models)
+
+
+# --- DRIVER ---
+
+def count_rows(conn):
+    return conn.execute(f"SELECT COUNT(*) FROM ({JOINED_ROWS}) AS j").fetchone()[0]
+
+
+def run_analysis_sql(conn, outputs=None, update_model=True):
+    """
+    Same contract as process_and_analyze.run_analysis, but every table is
+    aggregated in SQLite. `joined` stays empty: the master dataset is
+    streamed by export_results(conn=...) instead.
+    """
+    needs = lambda path: outputs is None or path in outputs
+    try:
+        create_join_indexes(conn)
+    except Exception as e:  # read-only database: the queries still work, just slower
+        print(f"⚠️  Could not create join indexes: {e}")
+
+    results = AnalysisResults()
+    steps = [
+        ('outputs/points_by_temp.csv', 'by_temp', 'points_by_temp', sql_points_by_temperature_bins),
+        ('outputs/points_by_wind_precip.csv', 'by_wind', 'points_by_wind_precip', sql_points_by_wind_precip),
+        ('outputs/correlation_matrix.csv', 'corr', 'correlation_matrix', sql_correlation_matrix),
+        ('outputs/points_by_moon_illumination.csv', 'by_moon', 'points_by_moon_illumination',
+         sql_points_by_moon_illumination),
+        ('outputs/win_pct_by_stadium_rain.csv', 'by_rain', 'win_pct_by_stadium_rain', sql_win_pct_by_stadium_rain),
+        ('outputs/play_types_by_weather.csv', 'by_play', 'play_types_by_weather', sql_play_types_by_weather),
+    ]
+    for path, attr, stage, fn in steps:
+        if needs(path):
+            with metrics.span('compute', stage=stage, backend='sql'), profiling.stage(stage):
+                setattr(results, attr, fn(conn))
+    if needs('outputs/scoring_model.csv'):
+        with metrics.span('compute', stage='scoring_model', backend='sql'), profiling.stage('scoring_model'):
+            results.model = sql_scoring_model(conn, update=update_model)
+    return results
+
+
+def check(conn, rtol=1e-5):
+    """Compare every table with the pandas backend; returns True if all match."""
+    import process_and_analyze as pa
+
+    joined = pa.load_data_typed(conn)
+    pairs = [
+        ('by_temp', pa.compute_points_by_temperature_bins(joined), sql_points_by_temperature_bins(conn)),
+        ('by_wind', pa.compute_points_by_wind_precip(joined), sql_points_by_wind_precip(conn)),
+        ('corr', pa.compute_correlation_matrix(joined), sql_correlation_matrix(conn)),
+        ('by_moon', pa.compute_points_by_moon_illumination(joined), sql_points_by_moon_illumination(conn)),
+        ('by_rain', pa.compute_win_pct_by_stadium_rain(joined), sql_win_pct_by_stadium_rain(conn)),
+        ('model', pa.compute_scoring_model(joined), sql_scoring_model(conn)),
+    ]
+    ok = True
+    for name, expected, actual in pairs:
+        try:
+            pd.testing.assert_frame_equal(expected.reset_index(drop=name != 'corr'),
+                                          actual.reset_index(drop=name != 'corr'),
+                                          check_dtype=False, check_categorical=False, rtol=rtol)
+            print(f"✅ {name}: {len(actual)} rows match")
+        except AssertionError as e:
+            ok = False
+            print(f"❌ {name} differs:\n{e}")
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Aggregate the analysis tables inside SQLite')
+    parser.add_argument('--db', default='football_weather.db')
+    parser.add_argument('--check', action='store_true', help='Compare each table with the pandas backend')
+    args = parser.parse_args()
+    conn = connect_db(args.db)
+    if args.check:
+        raise SystemExit(0 if check(conn) else 1)
+    results = run_analysis_sql(conn, update_model=False)
+    for attr in ['by_temp', 'by_wind', 'by_moon', 'by_rain', 'corr', 'model']:
+        print(f"\n{attr}\n{getattr(results, attr)}")
+    conn.close()
@@ -0,0 +1,220 @@
+"""sql_trace.py
+
+Per-statement SQL timing for connections opened with tracing on:
+
+    SQL_TRACE=1 python process_and_analyze.py --force
+    python cli.py --trace-sql ingest football
+    conn = utils.connect_db(trace=True)
+
+Every statement run through the connection is timed from execute() to its
+last fetched row and grouped by normalized SQL text. The sqlite3 trace
+callback only fires before a statement starts, so timing comes from a
+cursor factory instead. A progress handler counts SQLite VM steps per
+statement, a rough measure of how many rows it had to touch.
+
+The first time a statement is seen, its EXPLAIN QUERY PLAN is captured.
+Executions slower than SQL_SLOW_MS (default 50) are appended to
+outputs/sql_slow.log along with their plan. At exit, the top statements by
+total time are printed and all of them are written to outputs/sql_trace.json,
+with full scans flagged. A full scan is a plan step like 'SCAN g' on a table
+instead of a 'SEARCH ... USING INDEX'.
+"""
+import atexit
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+SLOW_LOG_PATH = os.path.join('outputs', 'sql_slow.log')
+REPORT_PATH = os.path.join('outputs', 'sql_trace.json')
+PROGRESS_EVERY = 1000   # VM instructions per progress-handler call
+TOP_N = 10
+
+_lock = threading.Lock()
+_stats = {}     # normalized sql -> dict
+_registered = False
+
+
+def slow_threshold():
+    return float(os.environ.get('SQL_SLOW_MS', 50)) / 1000
+
+
+def normalize(sql):
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def _explain(conn, sql, params):
+    """EXPLAIN QUERY PLAN details for `sql`, or None if it can't be explained."""
+    if not re.match(r'\s*(SELECT|INSERT|UPDATE|DELETE|WITH|REPLACE)\b', sql, re.IGNORECASE):
+        return None
+    try:
+        rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    except sqlite3.Error:
+        return None
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan):
+    return [step for step in plan or [] if step.startswith('SCAN ') and 'CONSTANT ROW' not in step]
+
+
+def _entry(conn, sql, params):
+    key = normalize(sql)
+    with _lock:
+        entry = _stats.get(key)
+        if entry is not None:
+            return entry
+    # Unbound parameters explain fine as NULLs
+    plan = _explain(conn, sql, params if params is not None else [None] * sql.count('?'))
+    with _lock:
+        return _stats.setdefault(key, {'sql': key, 'calls': 0, 'seconds': 0.0, 'max_s': 0.0,
+                                       'rows': 0, 'vm_steps': 0, 'plan': plan})
+
+
+class TracedCursor(sqlite3.Cursor):
+    def _begin(self, sql, params, executemany=False):
+        self._entry = _entry(self.connection, sql, None if executemany else params)
+        self._params = None if executemany else params
+        self._elapsed = 0.0
+        self._logged = False
+        with _lock:
+            self._entry['calls'] += 1
+
+    def _account(self, seconds, steps, rows=0):
+        entry = self._entry
+        self._elapsed += seconds
+        with _lock:
+            entry['seconds'] += seconds
+            entry['vm_steps'] += steps
+            entry['rows'] += rows
+            entry['max_s'] = max(entry['max_s'], self._elapsed)
+        if not self._logged and self._elapsed >= slow_threshold():
+            self._logged = True
+            _log_slow(entry, self._elapsed, self._params)
+
+    def _timed(self, fn, *args):
+        steps = self.connection.vm_steps
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._pending = (time.perf_counter() - start, (self.connection.vm_steps - steps) * PROGRESS_EVERY)
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        result = self._timed(super().execute, sql, parameters)
+        self._account(*self._pending)
+        return result
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql, None, executemany=True)
+        result = self._timed(super().executemany, sql, seq_of_parameters)
+        self._account(*self._pending, rows=max(self.rowcount, 0))
+        return result
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        self._account(*self._pending, rows=row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, size if size is not None else self.arraysize)
+        self._account(*self._pending, rows=len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._account(*self._pending, rows=len(rows))
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._account(*self._pending)
+            raise
+        self._account(*self._pending, rows=1)
+        return row
+
+
+class TracedConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.vm_steps = 0
+        self.set_progress_handler(self._progress, PROGRESS_EVERY)
+
+    def _progress(self):
+        self.vm_steps += 1
+        return 0
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or TracedCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        start = time.perf_counter()
+        super().commit()
+        seconds = time.perf_counter() - start
+        with _lock:
+            entry = _stats.setdefault('COMMIT', {'sql': 'COMMIT', 'calls': 0, 'seconds': 0.0, 'max_s': 0.0,
+                                                 'rows': 0, 'vm_steps': 0, 'plan': None})
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+            entry['max_s'] = max(entry['max_s'], seconds)
+
+
+def _log_slow(entry, seconds, params):
+    os.makedirs(os.path.dirname(SLOW_LOG_PATH), exist_ok=True)
+    lines = [f"{time.strftime('%Y-%m-%dT%H:%M:%S')} {seconds * 1000:.1f} ms  {entry['sql']}"]
+    if params:
+        lines.append(f"    params: {str(params)[:200]}")
+    for step in entry['plan'] or []:
+        lines.append(f"    plan: {step}")
+    with _lock, open(SLOW_LOG_PATH, 'a') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def connect(db_path='football_weather.db'):
+    """sqlite3 connection whose statements are timed (see module docstring)."""
+    global _registered
+    if not _registered:
+        atexit.register(report)
+        _registered = True
+    return sqlite3.connect(db_path, factory=TracedConnection)
+
+
+def top_queries(n=TOP_N):
+    with _lock:
+        entries = sorted((dict(e) for e in _stats.values()), key=lambda e: e['seconds'], reverse=True)
+    return entries[:n] if n else entries
+
+
+def report(path=REPORT_PATH, top=TOP_N, stream=sys.stderr):
+    """Print the top statements by total time and write them all to `path`."""
+    entries = top_queries(None)
+    if not entries:
+        return
+    for e in entries:
+        e['full_scans'] = full_scans(e['plan'])
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'slow_ms': slow_threshold() * 1000, 'statements': entries}, f, indent=2)
+
+    print(f"\nSQL trace: {sum(e['calls'] for e in entries)} statements, "
+          f"{sum(e['seconds'] for e in entries) * 1000:.1f} ms total (full list: {path})", file=stream)
+    print(f"{'total ms':>9} {'calls':>6} {'mean ms':>8} {'rows':>8} {'vm steps':>9}  statement", file=stream)
+    for e in entries[:top]:
+        sql = e['sql'] if len(e['sql']) <= 70 else e['sql'][:67] + '...'
+        mean = e['seconds'] / e['calls'] * 1000 if e['calls'] else 0
+        print(f"{e['seconds'] * 1000:>9.1f} {e['calls']:>6} {mean:>8.2f} {e['rows']:>8} {e['vm_steps']:>9}  {sql}",
+              file=stream)
+        for step in e['full_scans']:
+            print(f"{'':>45}⚠️  {step}", file=stream)
@@ -0,0 +1,218 @@
+"""stats_inference.py
+
+Bootstrap confidence intervals and permutation-test p-values for the
+cells of the scoring and home-win tables built in `process_and_analyze.py`.
+
+Resamples are drawn as batched NumPy index matrices (one row per resample)
+instead of Python loops, so 10k resamples over every cell stays fast.
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from scipy import stats
+from utils import connect_db, ensure_outputs_dir
+from process_and_analyze import load_data_with_sql_join, TEMP_BINS, TEMP_LABELS
+
+N_RESAMPLES = 10_000
+CONFIDENCE = 0.95
+# Upper bound on resample matrix size (elements) so big cells are done in chunks
+MAX_BATCH_ELEMENTS = 5_000_000
+
+
+def bootstrap_mean_ci(values, n_resamples=N_RESAMPLES, confidence=CONFIDENCE, rng=None):
+    """
+    Percentile bootstrap CI for the mean of `values`.
+    Every resample is one row of an (n_resamples, n) index matrix.
+    Returns (low, high); NaNs for empty input.
+    """
+    rng = np.random.default_rng(rng)
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n == 0:
+        return np.nan, np.nan
+
+    rows_per_batch = max(1, MAX_BATCH_ELEMENTS // n)
+    means = np.empty(n_resamples)
+    for start in range(0, n_resamples, rows_per_batch):
+        stop = min(start + rows_per_batch, n_resamples)
+        idx = rng.integers(0, n, size=(stop - start, n))
+        means[start:stop] = values[idx].mean(axis=1)
+
+    alpha = (1.0 - confidence) / 2.0
+    low, high = np.quantile(means, [alpha, 1.0 - alpha])
+    return low, high
+
+
+def permutation_pvalues(values, cell_codes, n_cells, n_resamples=N_RESAMPLES, rng=None):
+    """
+    Two-sided permutation p-value for every cell: is the cell mean different
+    from the mean of all other games?
+
+    Under the null a cell of size k is a random k-subset of all games, so the
+    first k columns of a shuffled copy of `values` are a valid draw for EVERY
+    cell. One (n_resamples, N) permutation matrix plus a cumulative sum
+    therefore gives the null distribution for all cell sizes at once.
+    """
+    rng = np.random.default_rng(rng)
+    values = np.asarray(values, dtype=float)
+    cell_codes = np.asarray(cell_codes)
+    N = len(values)
+    total = values.sum()
+
+    sizes = np.bincount(cell_codes, minlength=n_cells)
+    sums = np.bincount(cell_codes, weights=values, minlength=n_cells)
+    pvalues = np.full(n_cells, np.nan)
+    testable = (sizes > 0) & (sizes < N)
+    if not testable.any():
+        return pvalues
+
+    def mean_diff(cell_sum, k):
+        return cell_sum / k - (total - cell_sum) / (N - k)
+
+    k = sizes[testable]
+    observed = np.abs(mean_diff(sums[testable], k))
+    exceed = np.zeros(len(k))
+
+    rows_per_batch = max(1, MAX_BATCH_ELEMENTS // N)
+    for start in range(0, n_resamples, rows_per_batch):
+        stop = min(start + rows_per_batch, n_resamples)
+        shuffled = rng.permuted(np.broadcast_to(values, (stop - start, N)), axis=1)
+        prefix = np.cumsum(shuffled, axis=1)
+        null = np.abs(mean_diff(prefix[:, k - 1], k))
+        # small tolerance so ties with the observed statistic count as extreme
+        exceed += (null >= observed - 1e-12).sum(axis=0)
+
+    pvalues[testable] = (exceed + 1) / (n_resamples + 1)
+    return pvalues
+
+
+def _cell_inference(values, cell_codes, n_cells, n_resamples, confidence, seed):
+    """Bootstrap CI + permutation p-value (raw and BH-adjusted) per cell."""
+    rng = np.random.default_rng(seed)
+    values = np.asarray(values, dtype=float)
+    cell_codes = np.asarray(cell_codes)
+
+    ci_low = np.full(n_cells, np.nan)
+    ci_high = np.full(n_cells, np.nan)
+    for c in range(n_cells):
+        cell_values = values[cell_codes == c]
+        if len(cell_values):
+            ci_low[c], ci_high[c] = bootstrap_mean_ci(cell_values, n_resamples, confidence, rng)
+
+    p = permutation_pvalues(values, cell_codes, n_cells, n_resamples, rng)
+    p_adj = np.full(n_cells, np.nan)
+    ok = ~np.isnan(p)
+    if ok.any():
+        # Benjamini-Hochberg: many cells are tested at once
+        p_adj[ok] = stats.false_discovery_control(p[ok], method='bh')
+    return ci_low, ci_high, p, p_adj
+
+
+def compute_temperature_bin_inference(joined: pd.DataFrame, n_resamples=N_RESAMPLES,
+                                      confidence=CONFIDENCE, seed=0):
+    """
+    Same cells as compute_points_by_temperature_bins, plus a bootstrap CI
+    for avg_total_points and a permutation p-value (cell vs. all other games).
+    """
+    df = joined[['temperature', 'total_points']].apply(pd.to_numeric, errors='coerce')
+    df = df[df['total_points'].notna()]
+    temp_bin = pd.cut(df['temperature'], bins=TEMP_BINS, labels=TEMP_LABELS)
+    has_bin = temp_bin.notna().to_numpy()
+
+    codes = temp_bin.cat.codes.to_numpy()[has_bin]
+    values = df['total_points'].to_numpy()[has_bin]
+    ci_low, ci_high, p, p_adj = _cell_inference(
+        values, codes, len(TEMP_LABELS), n_resamples, confidence, seed)
+
+    counts = np.bincount(codes, minlength=len(TEMP_LABELS))
+    sums = np.bincount(codes, weights=values, minlength=len(TEMP_LABELS))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+
+    out = pd.DataFrame({
+        'temp_bin': TEMP_LABELS,
+        'count': counts,
+        'avg_total_points': means,
+        'ci_low': ci_low,
+        'ci_high': ci_high,
+        'p_value': p,
+        'p_value_bh': p_adj,
+    })
+    return out[out['count'] > 0].reset_index(drop=True)
+
+
+def compute_win_pct_inference(joined: pd.DataFrame, n_resamples=N_RESAMPLES,
+                              confidence=CONFIDENCE, seed=0):
+    """
+    Same cells as compute_win_pct_by_stadium_rain, plus a bootstrap CI for
+    win_pct and a permutation p-value (cell vs. all other games).
+    """
+    df = joined.copy()
+    df['rainy'] = df.get('precipitation', 0).fillna(0) > 0
+    home_win = (df['home_score'] > df['away_score']).astype(float).to_numpy()
+
+    cells = df.groupby(['stadium_city', 'rainy'], sort=True).ngroup().to_numpy()
+    keys = df.groupby(['stadium_city', 'rainy'], sort=True).size().reset_index()
+    n_cells = len(keys)
+    ci_low, ci_high, p, p_adj = _cell_inference(
+        home_win, cells, n_cells, n_resamples, confidence, seed)
+
+    counts = np.bincount(cells, minlength=n_cells)
+    wins = np.bincount(cells, weights=home_win, minlength=n_cells)
+
+    out = keys[['stadium_city', 'rainy']].copy()
+    out['num_games'] = counts
+    out['num_wins'] = wins.astype(int)
+    out['win_pct'] = wins / counts
+    out['ci_low'] = ci_low
+    out['ci_high'] = ci_high
+    out['p_value'] = p
+    out['p_value_bh'] = p_adj
+    return out
+
+
+def export_inference_csvs(temp_ci, rain_ci):
+    ensure_outputs_dir()
+
+    if not temp_ci.empty:
+        temp_clean = temp_ci.copy()
+        temp_clean.columns = ['Temperature Range', 'Games Played', 'Avg Total Score',
+                              'CI Low', 'CI High', 'p-value', 'p-value (BH)']
+        temp_clean = temp_clean.round({'Avg Total Score': 1, 'CI Low': 1, 'CI High': 1,
+                                       'p-value': 4, 'p-value (BH)': 4})
+        temp_clean.to_csv('outputs/points_by_temp_ci.csv', index=False)
+
+    if not rain_ci.empty:
+        rain_clean = rain_ci.copy()
+        rain_clean['rainy'] = rain_clean['rainy'].map({True: 'Rainy', False: 'Dry'})
+        for c in ['win_pct', 'ci_low', 'ci_high']:
+            rain_clean[c] = (rain_clean[c] * 100).round(1)
+        rain_clean = rain_clean.round({'p_value': 4, 'p_value_bh': 4})
+        rain_clean.columns = ['Stadium', 'Condition', 'Total Games', 'Home Wins', 'Home Win %',
+                              'CI Low %', 'CI High %', 'p-value', 'p-value (BH)']
+        rain_clean.to_csv('outputs/win_pct_by_stadium_rain_ci.csv', index=False)
+
+    print("✅ Inference CSVs saved to outputs/")
+
+
+def main(n_resamples=N_RESAMPLES, seed=0):
+    conn = connect_db()
+    joined = load_data_with_sql_join(conn)
+    conn.close()
+
+    if joined.empty:
+        print("Error: No data found.")
+        return
+
+    temp_ci = compute_temperature_bin_inference(joined, n_resamples, seed=seed)
+    rain_ci = compute_win_pct_inference(joined, n_resamples, seed=seed)
+    print(temp_ci.round(3).to_string(index=False))
+    export_inference_csvs(temp_ci, rain_ci)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--resamples', type=int, default=N_RESAMPLES, help='Bootstrap/permutation resamples')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+    main(n_resamples=args.resamples, seed=args.seed)
@@ -0,0 +1,121 @@
+"""stream_export.py
+
+Export query results straight from a SQLite cursor to CSV, gzip-CSV or
+newline-delimited JSON, without building a DataFrame.
+
+Rows are fetched in batches, renamed/rounded one row at a time, and written
+to a temp file in the destination directory that is renamed over the
+target at the end, so readers never see a half-written file. Memory use is
+constant regardless of table size.
+
+    python stream_export.py                                  # outputs/joined_dataset.csv
+    python stream_export.py --out outputs/joined_dataset.csv.gz
+    python stream_export.py --out outputs/joined_dataset.ndjson
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import tempfile
+from utils import connect_db, ensure_outputs_dir
+
+BATCH_SIZE = 10_000
+
+
+def detect_format(path):
+    if path.endswith('.csv.gz'):
+        return 'csv.gz'
+    if path.endswith('.ndjson') or path.endswith('.jsonl'):
+        return 'ndjson'
+    return 'csv'
+
+
+def _round(value, digits):
+    """Round like numpy/pandas (scale, round half-even, unscale) so streamed
+    files match DataFrame.round output byte for byte."""
+    if not isinstance(value, float):
+        return value
+    scale = 10.0 ** digits
+    return round(value * scale) / scale
+
+
+def stream_rows(cursor, columns, rounding=None, batch_size=BATCH_SIZE):
+    """
+    Yield tuples of the requested `columns` (in that order) from an executed
+    cursor, rounding float values per `rounding` ({column: digits}).
+    """
+    names = [d[0] for d in cursor.description]
+    picks = [names.index(c) for c in columns]
+    digits = [(rounding or {}).get(c) for c in columns]
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return
+        for row in batch:
+            yield tuple(row[i] if d is None else _round(row[i], d) for i, d in zip(picks, digits))
+
+
+def write_atomic(path, rows, headers, fmt=None):
+    """Write `rows` to `path` via a temp file + rename. Returns rows written."""
+    fmt = fmt or detect_format(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    os.close(fd)
+    os.chmod(tmp, 0o644)  # mkstemp creates 0600; outputs should be readable like the rest
+
+    count = 0
+    try:
+        if fmt == 'csv.gz':
+            f = gzip.open(tmp, 'wt', newline='', encoding='utf-8', compresslevel=6)
+        else:
+            f = open(tmp, 'w', newline='', encoding='utf-8')
+        with f:
+            if fmt == 'ndjson':
+                for row in rows:
+                    f.write(json.dumps(dict(zip(headers, row))))
+                    f.write('\n')
+                    count += 1
+            else:
+                writer = csv.writer(f, lineterminator='\n')
+                writer.writerow(headers)
+                for row in rows:
+                    writer.writerow(row)
+                    count += 1
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return count
+
+
+def export_query(conn, query, path, columns, headers=None, rounding=None, fmt=None, params=()):
+    """Run `query` and stream the chosen `columns` to `path` (CSV, csv.gz or ndjson)."""
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    rows = stream_rows(cursor, columns, rounding)
+    return write_atomic(path, rows, headers or columns, fmt)
+
+
+def export_joined_dataset(conn, path='outputs/joined_dataset.csv', fmt=None):
+    """Streaming equivalent of process_and_analyze.export_joined_dataset."""
+    from process_and_analyze import JOINED_QUERY, JOINED_COLUMNS, JOINED_ROUNDING, ensure_joined_tables
+    ensure_joined_tables(conn)
+    columns = list(JOINED_COLUMNS)
+    headers = [JOINED_COLUMNS[c] for c in columns]
+    return export_query(conn, JOINED_QUERY, path, columns, headers, JOINED_ROUNDING, fmt)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stream the joined dataset to disk')
+    parser.add_argument('--out', default='outputs/joined_dataset.csv',
+                        help='Destination (.csv, .csv.gz or .ndjson)')
+    args = parser.parse_args()
+
+    ensure_outputs_dir()
+    conn = connect_db()
+    n = export_joined_dataset(conn, args.out)
+    conn.close()
+    print(f"✅ Wrote {n} rows to {args.out}")
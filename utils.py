@@ -1,10 +1,20 @@
 import sqlite3
 import os
 import re
+from datetime import date, timedelta
 
 
-def connect_db(db_path: str = 'football_weather.db'):
-    """Return a sqlite3 connection to the project database."""
+def connect_db(db_path: str = 'football_weather.db', trace=None):
+    """Return a sqlite3 connection to the project database.
+
+    With trace=True (or SQL_TRACE=1 in the environment) every statement is
+    timed and slow ones are logged with their query plan; see sql_trace.py.
+    """
+    if trace is None:
+        trace = os.environ.get('SQL_TRACE', '') not in ('', '0')
+    if trace:
+        import sql_trace
+        return sql_trace.connect(db_path)
     return sqlite3.connect(db_path)
 
 
@@ -23,6 +33,19 @@ def normalize_location(value):
     return s
 
 
+def season_week(day):
+    """(season, week) of a datetime.date, by the rule of weather_cube.season_and_week.
+
+    January/February games belong to the previous season; week 1 starts on
+    the Sunday before the last Saturday of August (earlier games are week 0).
+    """
+    season = day.year - (day.month < 3)
+    aug31 = date(season, 8, 31)
+    last_saturday = aug31 - timedelta(days=(aug31.weekday() - 5) % 7)
+    week = (day - (last_saturday - timedelta(days=6))).days // 7 + 1
+    return season, max(week, 0)
+
+
 def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
@@ -0,0 +1,254 @@
+"""venues.py
+
+Single registry of the stadiums we collect for: name, city, coordinates and
+timezone. Replaces the STADIUM_TO_CITY / STADIUMS / CITIES tables that were
+copied across the collectors.
+
+Lookups:
+  resolve(name, venue_id)   O(1) dict lookup by CFBD venue id, then by
+                            normalized name or alias ("Ben Hill Griffin
+                            Stadium at Florida Field" also tries each side
+                            of " at " and "/")
+  nearest(lat, lon, max_km) nearest venue through a 1-degree grid index,
+                            searching outward ring by ring
+  city_coords()             {city: {'lat', 'lon', 'timezone'}} for the
+                            weather / air quality / moon collectors
+
+The 25 built-in venues are always present. college_football.py also loads
+the CFBD /venues list through register_cfbd(): a venue whose name we don't
+know but which sits within ALIAS_KM of one we do becomes an alias of it,
+anything else is registered as a new venue. Registered venues are saved to
+outputs/venues.json and loaded on import, so the other collectors see the
+same cities.
+"""
+import itertools
+import json
+import math
+import os
+import re
+from dataclasses import dataclass, field, asdict
+from utils import normalize_location
+
+VENUES_PATH = os.path.join('outputs', 'venues.json')
+GRID_DEG = 1.0        # grid cell size for nearest()
+ALIAS_KM = 5.0        # a CFBD venue this close to a known one is the same place for weather
+CITY_KM = 25.0        # same city name further apart than this gets ", <state>" appended
+EARTH_KM = 6371.0
+
+
+@dataclass
+class Venue:
+    name: str
+    city: str
+    lat: float
+    lon: float
+    timezone: str
+    state: str = None
+    venue_id: int = None
+    aliases: list = field(default_factory=list)
+
+
+# name, city, state, lat, lon, timezone, aliases
+BUILTIN = [
+    ('Michigan Stadium', 'Ann Arbor', 'MI', 42.2808, -83.7430, 'America/Detroit', ['The Big House']),
+    ('Ohio Stadium', 'Columbus', 'OH', 40.0012, -83.0302, 'America/New_York', []),
+    ('Beaver Stadium', 'State College', 'PA', 40.7982, -77.8599, 'America/New_York', []),
+    ('Camp Randall Stadium', 'Madison', 'WI', 43.0731, -89.4012, 'America/Chicago', []),
+    ('Kinnick Stadium', 'Iowa City', 'IA', 41.6611, -91.5302, 'America/Chicago', []),
+    ('Autzen Stadium', 'Eugene', 'OR', 44.0521, -123.0868, 'America/Los_Angeles', []),
+    ('DKR-Texas Memorial Stadium', 'Austin', 'TX', 30.2849, -97.7341, 'America/Chicago',
+     ['Darrell K Royal-Texas Memorial Stadium']),
+    ('Bryant-Denny Stadium', 'Tuscaloosa', 'AL', 33.2098, -87.5692, 'America/Chicago', []),
+    ('Sanford Stadium', 'Athens', 'GA', 33.9519, -83.3576, 'America/New_York', []),
+    ('Tiger Stadium (LA)', 'Baton Rouge', 'LA', 30.4515, -91.1871, 'America/Chicago', []),
+    ('Spartan Stadium', 'East Lansing', 'MI', 42.7370, -84.4839, 'America/Detroit', []),
+    ('Memorial Stadium (Lincoln, NE)', 'Lincoln', 'NE', 40.8136, -96.7026, 'America/Chicago', []),
+    ('Memorial Stadium (Champaign, IL)', 'Champaign', 'IL', 40.1164, -88.2434, 'America/Chicago', []),
+    ('Ross-Ade Stadium', 'West Lafayette', 'IN', 40.4259, -86.9081, 'America/Indiana/Indianapolis', []),
+    ('Memorial Stadium (Bloomington, IN)', 'Bloomington', 'IN', 39.1653, -86.5264,
+     'America/Indiana/Indianapolis', []),
+    ('Neyland Stadium', 'Knoxville', 'TN', 35.9606, -83.9207, 'America/New_York', []),
+    ('Jordan-Hare Stadium', 'Auburn', 'AL', 32.5990, -85.4808, 'America/Chicago', []),
+    ('Kyle Field', 'College Station', 'TX', 30.6280, -96.3344, 'America/Chicago', []),
+    ('Davis Wade Stadium', 'Starkville', 'MS', 33.4504, -88.8184, 'America/Chicago', []),
+    ('Williams-Brice Stadium', 'Columbia', 'SC', 34.0007, -81.0348, 'America/New_York', []),
+    ('Ben Hill Griffin Stadium', 'Gainesville', 'FL', 29.6516, -82.3248, 'America/New_York', ['Florida Field']),
+    ('Doak Campbell Stadium', 'Tallahassee', 'FL', 30.4383, -84.2807, 'America/New_York', []),
+    ('Lane Stadium', 'Blacksburg', 'VA', 37.2296, -80.4139, 'America/New_York', ['Worsham Field']),
+    ('Memorial Stadium (Clemson, SC)', 'Clemson', 'SC', 34.6834, -82.8374, 'America/New_York',
+     ['Clemson Memorial Stadium']),
+    ('Bobby Dodd Stadium', 'Atlanta', 'GA', 33.7756, -84.3963, 'America/New_York', []),
+]
+
+_venues = []     # registration order (built-ins first)
+_by_key = {}     # normalized name / alias -> Venue
+_by_id = {}      # CFBD venue id -> Venue
+_by_city = {}    # city -> first Venue registered there
+_grid = {}       # (lat cell, lon cell) -> [Venue]
+_grid_box = []   # [min lat cell, max lat cell, min lon cell, max lon cell] of _grid
+
+
+def key(name):
+    """Normalized lookup key: 'DKR-Texas Memorial Stadium' -> 'dkr texas memorial stadium'."""
+    if not name:
+        return None
+    return normalize_location(str(name).replace('-', ' ').replace('/', ' ')) or None
+
+
+def _cell(lat, lon):
+    return int(math.floor(lat / GRID_DEG)), int(math.floor(lon / GRID_DEG))
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_KM * math.asin(math.sqrt(a))
+
+
+def _index(venue, names):
+    for name in names:
+        k = key(name)
+        if k and k not in _by_key:
+            _by_key[k] = venue
+
+
+def register(name, city, lat, lon, timezone, state=None, venue_id=None, aliases=()):
+    """Add a venue (or merge aliases / id into the one already registered under `name`)."""
+    venue = _by_key.get(key(name))
+    if venue is None:
+        venue = Venue(name, city, float(lat), float(lon), timezone, state, venue_id)
+        _venues.append(venue)
+        _by_city.setdefault(city, venue)
+        i, j = _cell(venue.lat, venue.lon)
+        _grid.setdefault((i, j), []).append(venue)
+        _grid_box[:] = ([min(_grid_box[0], i), max(_grid_box[1], i), min(_grid_box[2], j), max(_grid_box[3], j)]
+                        if _grid_box else [i, i, j, j])
+        _index(venue, [name])
+    for alias in aliases:
+        if alias != venue.name and alias not in venue.aliases:
+            venue.aliases.append(alias)
+    _index(venue, venue.aliases)
+    if venue_id is not None:
+        venue.venue_id = venue.venue_id if venue.venue_id is not None else venue_id
+        _by_id.setdefault(venue_id, venue)
+    return venue
+
+
+def _candidates(name):
+    """Full name first, then each part of 'X at Y' / 'X/Y' names."""
+    yield name
+    parts = re.split(r'\s+at\s+|/', name)
+    if len(parts) > 1:
+        yield from parts
+
+
+def nearest(lat, lon, max_km=None):
+    """(venue, km) of the registered venue closest to (lat, lon), or (None, None).
+
+    Searches the grid ring by ring and stops once no unvisited cell can hold
+    anything closer than the best hit (or than max_km), or once the rings
+    cover every occupied cell. Each ring only walks its cells inside the
+    occupied cells' bounding box, so a point far from every venue (Honolulu,
+    the open ocean) costs the width of that box per ring, not the ring.
+    """
+    if not _venues:
+        return None, None
+    best, best_km = None, math.inf
+    ci, cj = _cell(lat, lon)
+    imin, imax, jmin, jmax = _grid_box
+    limit = max_km if max_km is not None else math.inf
+    for r in itertools.count():
+        # Anything in ring r is at least (r - 1) cells away; a lon degree is
+        # shortest at the ring's most poleward latitude
+        ring_lat = min(89.0, abs(lat) + r * GRID_DEG)
+        ring_km = max(0, r - 1) * GRID_DEG * 111.2 * math.cos(math.radians(ring_lat))
+        if ring_km > min(best_km, limit):
+            break
+        cells = []
+        for i in (ci - r, ci + r) if r else (ci,):
+            if imin <= i <= imax:
+                cells += [(i, j) for j in range(max(cj - r, jmin), min(cj + r, jmax) + 1)]
+        for j in (cj - r, cj + r) if r else ():
+            if jmin <= j <= jmax:
+                cells += [(i, j) for i in range(max(ci - r + 1, imin), min(ci + r - 1, imax) + 1)]
+        for cell in cells:
+            for venue in _grid.get(cell, ()):
+                d = haversine_km(lat, lon, venue.lat, venue.lon)
+                if d < best_km:
+                    best, best_km = venue, d
+        if ci - r <= imin and ci + r >= imax and cj - r <= jmin and cj + r >= jmax:
+            break   # every occupied cell has been visited
+    if best is None or best_km > limit:
+        return None, None
+    return best, best_km
+
+
+def resolve(name=None, venue_id=None, lat=None, lon=None):
+    """The registered Venue for a CFBD venue id / name, else the one within ALIAS_KM of (lat, lon)."""
+    if venue_id is not None and venue_id in _by_id:
+        return _by_id[venue_id]
+    if name:
+        for candidate in _candidates(name):
+            venue = _by_key.get(key(candidate))
+            if venue is not None:
+                return venue
+    if lat is not None and lon is not None:
+        return nearest(lat, lon, ALIAS_KM)[0]
+    return None
+
+
+def register_cfbd(records):
+    """Register venues from the CFBD /venues payload. Returns the number of new venues."""
+    added = 0
+    for rec in records or []:
+        name, loc = rec.get('name'), rec.get('location') or {}
+        # CFBD puts latitude in x and longitude in y
+        lat, lon = loc.get('x'), loc.get('y')
+        if not name or lat is None or lon is None:
+            continue
+        venue = resolve(name, rec.get('id'), lat, lon)
+        if venue is not None:
+            register(venue.name, venue.city, venue.lat, venue.lon, venue.timezone,
+                     venue_id=rec.get('id'), aliases=[name])
+            continue
+        city, state = rec.get('city') or name, rec.get('state')
+        same_city = _by_city.get(city)
+        if same_city is not None and haversine_km(lat, lon, same_city.lat, same_city.lon) > CITY_KM:
+            city = f"{city}, {state}" if state else f"{city} ({name})"
+        register(name, city, lat, lon, rec.get('timezone') or 'America/New_York', state, rec.get('id'))
+        added += 1
+    return added
+
+
+def all_venues():
+    return list(_venues)
+
+
+def city_coords():
+    """{city: {'lat', 'lon', 'timezone'}} in registration order, one entry per city."""
+    return {city: {'lat': v.lat, 'lon': v.lon, 'timezone': v.timezone} for city, v in _by_city.items()}
+
+
+def save(path=VENUES_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump([asdict(v) for v in _venues], f, indent=1)
+
+
+def load(path=VENUES_PATH):
+    """Register the venues saved by save(); a missing file is fine."""
+    try:
+        with open(path) as f:
+            records = json.load(f)
+    except FileNotFoundError:
+        return 0
+    for rec in records:
+        register(rec['name'], rec['city'], rec['lat'], rec['lon'], rec['timezone'],
+                 rec.get('state'), rec.get('venue_id'), rec.get('aliases', ()))
+    return len(records)
+
+
+for _name, _city, _state, _lat, _lon, _tz, _aliases in BUILTIN:
+    register(_name, _city, _lat, _lon, _tz, _state, aliases=_aliases)
+load()
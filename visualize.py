@@ -1,38 +1,54 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import time
+import argparse
+import matplotlib
+from concurrent.futures import ProcessPoolExecutor
+from result_cache import ResultCache, figure_cache_keys
+import metrics
+import profiling
+from process_and_analyze import read_clean_csvs, CORR_NAMES
+
+# Every plot function takes a table in the internal (snake_case) schema of
+# process_and_analyze.AnalysisResults. With no argument, it falls back to
+# reading the matching CSV from outputs/ via read_clean_csvs.
 
 def ensure_figures_dir():
     if not os.path.exists('figures'):
         os.makedirs('figures')
 
+def _table(df, name):
+    if df is None:
+        df = getattr(read_clean_csvs([name]), name)
+    return df
+
 # 1. TEMPERATURE CHART
-def plot_temp_impact():
-    try:
-        df = pd.read_csv('outputs/points_by_temp.csv')
-    except FileNotFoundError:
-        print("❌ Missing points_by_temp.csv")
+def plot_temp_impact(by_temp=None):
+    df = _table(by_temp, 'by_temp')
+    if df.empty:
+        print("❌ Missing points_by_temp data")
         return
 
-    # Filter empty bins. New column names:
-    df = df[df['Games Played'] > 0].copy().reset_index(drop=True)
+    # Filter empty bins
+    df = df[df['count'] > 0].copy().reset_index(drop=True)
+    df['temp_bin'] = df['temp_bin'].astype(str)
 
     plt.figure(figsize=(10, 6))
     sns.set_theme(style="whitegrid")
 
     ax = sns.barplot(
-        data=df, 
-        x='Temperature Range',      # Updated name
-        y='Avg Total Points',       # Updated name
-        hue='Temperature Range', 
-        palette='RdBu_r', 
+        data=df,
+        x='temp_bin',
+        y='avg_total_points',
+        hue='temp_bin',
+        palette='RdBu_r',
         edgecolor='black'
     )
 
     for i, row in df.iterrows():
-        height = row['Avg Total Points']
-        count = int(row['Games Played'])
+        height = row['avg_total_points']
+        count = int(row['count'])
         text_color = 'black' if i == 1 else 'white'
         ax.text(i, height + 1, f'{height:.1f} pts', ha='center', fontweight='bold', color='black')
         ax.text(i, height - 4, f'(n={count})', ha='center', color=text_color, fontweight='bold')
@@ -40,39 +56,37 @@ def plot_temp_impact():
     plt.title('Impact of Temperature on Total Scoring', fontsize=14)
     plt.xlabel('Temperature (°F)', fontsize=12)
     plt.ylabel('Average Total Points', fontsize=12)
-    plt.ylim(0, max(df['Avg Total Points']) * 1.2)
-    
+    plt.ylim(0, max(df['avg_total_points']) * 1.2)
+
     ensure_figures_dir()
     plt.savefig('figures/1_temperature_impact.png', dpi=300, bbox_inches='tight')
     plt.close()
     print("✅ Saved chart 1")
 
 # 2. WIND SPEED CHART
-def plot_wind_impact():
-    try:
-        df = pd.read_csv('outputs/points_by_wind_precip.csv')
-    except FileNotFoundError:
+def plot_wind_impact(by_wind=None):
+    df = _table(by_wind, 'by_wind')
+    if df.empty:
         return
 
-    # Use new column names
-    df_wind = df.groupby('Wind Speed').agg({
-        'Avg Total Points': 'mean', 
-        'Games Played': 'sum'
+    df_wind = df.assign(wind_bin=df['wind_bin'].astype(str)).groupby('wind_bin', sort=False).agg({
+        'avg_total_points': 'mean',
+        'count': 'sum'
     }).reset_index()
 
     plt.figure(figsize=(10, 6))
     ax = sns.barplot(
-        data=df_wind, 
-        x='Wind Speed', 
-        y='Avg Total Points', 
-        hue='Wind Speed', 
-        palette='viridis', 
+        data=df_wind,
+        x='wind_bin',
+        y='avg_total_points',
+        hue='wind_bin',
+        palette='viridis',
         edgecolor='black'
     )
 
     for i, row in df_wind.iterrows():
-        height = row['Avg Total Points']
-        count = int(row['Games Played'])
+        height = row['avg_total_points']
+        count = int(row['count'])
         if count > 0:
             ax.text(i, height + 0.5, f'{height:.1f}', ha='center', fontweight='bold')
             ax.text(i, height - 3, f'n={count}', ha='center', color='white', fontsize=9)
@@ -80,47 +94,52 @@ def plot_wind_impact():
     plt.title('Does Wind Speed Affect Scoring?', fontsize=14)
     plt.xlabel('Wind Speed (mph)', fontsize=12)
     plt.ylabel('Average Total Points', fontsize=12)
-    
+
     ensure_figures_dir()
     plt.savefig('figures/2_wind_impact.png', dpi=300, bbox_inches='tight')
     plt.close()
     print("✅ Saved chart 2")
 
 # 3. RAIN SCORING (Box Plot)
-def plot_rain_scoring():
-    try:
-        df = pd.read_csv('outputs/joined_dataset.csv')
-    except FileNotFoundError:
+def plot_rain_scoring(joined=None):
+    df = _table(joined, 'joined')
+    if df.empty:
         return
 
-    # Create condition column from Precip column
-    df['Condition'] = df['Precip (in)'].apply(lambda x: 'Rain' if x > 0 else 'Dry')
+    # Create condition column from precipitation
+    df = df[['precipitation', 'total_points']].copy()
+    df['Condition'] = df['precipitation'].fillna(0).gt(0).map({True: 'Rain', False: 'Dry'})
 
     plt.figure(figsize=(8, 6))
-    sns.boxplot(data=df, x='Condition', y='Total Points', palette=['skyblue', 'gray'])
-    sns.stripplot(data=df, x='Condition', y='Total Points', color='black', alpha=0.3)
+    sns.boxplot(data=df, x='Condition', y='total_points', hue='Condition',
+                palette={'Rain': 'skyblue', 'Dry': 'gray'})
+    sns.stripplot(data=df, x='Condition', y='total_points', color='black', alpha=0.3)
 
     plt.title('Scoring Distribution: Rain vs. Dry Games', fontsize=14)
     plt.ylabel('Total Points Scored', fontsize=12)
-    
+
     ensure_figures_dir()
     plt.savefig('figures/3_rain_scoring_box.png', dpi=300, bbox_inches='tight')
     plt.close()
     print("✅ Saved chart 3")
 
 # 4. RAIN WIN PCT
-def plot_rain_win_pct():
-    try:
-        df = pd.read_csv('outputs/win_pct_by_stadium_rain.csv')
-    except FileNotFoundError:
+def plot_rain_win_pct(by_rain=None):
+    df = _table(by_rain, 'by_rain')
+    if df.empty:
         return
 
+    df = df.copy()
+    df['stadium_city'] = df['stadium_city'].astype(str)
+    df['Condition'] = df['rainy'].map({True: 'Rainy', False: 'Dry'})
+    df['win_pct'] = df['win_pct'] * 100
+
     plt.figure(figsize=(14, 7))
     sns.barplot(
-        data=df, 
-        x='Stadium',      # New name
-        y='Home Win %',   # New name
-        hue='Weather',    # New name
+        data=df,
+        x='stadium_city',
+        y='win_pct',
+        hue='Condition',
         palette={'Dry': '#4c7d9e', 'Rainy': '#c44e52'}
     )
 
@@ -130,35 +149,159 @@ def plot_rain_win_pct():
     plt.xticks(rotation=45, ha='right')
     plt.legend(title='Condition')
     plt.tight_layout()
-    
+
     ensure_figures_dir()
     plt.savefig('figures/4_rain_win_pct.png', dpi=300, bbox_inches='tight')
     plt.close()
     print("✅ Saved chart 4")
 
 # 5. CORRELATION
-def plot_correlation():
-    try:
-        df = pd.read_csv('outputs/correlation_matrix.csv', index_col=0)
-    except FileNotFoundError:
+def plot_correlation(corr=None):
+    df = _table(corr, 'corr')
+    if df.empty:
         return
 
+    df = df.rename(index=CORR_NAMES, columns=CORR_NAMES)
+
     plt.figure(figsize=(10, 8))
     sns.heatmap(df, annot=True, fmt=".2f", cmap='coolwarm', vmin=-1, vmax=1, linewidths=0.5)
 
     plt.title('Correlation Matrix', fontsize=14)
     plt.tight_layout()
-    
+
     ensure_figures_dir()
     plt.savefig('figures/5_correlation_matrix.png', dpi=300, bbox_inches='tight')
     plt.close()
     print("✅ Saved chart 5")
 
+# (plot function, AnalysisResults attribute, CSV it comes from, figure it writes)
+CHARTS = [
+    (plot_temp_impact, 'by_temp', 'outputs/points_by_temp.csv', 'figures/1_temperature_impact.png'),
+    (plot_wind_impact, 'by_wind', 'outputs/points_by_wind_precip.csv', 'figures/2_wind_impact.png'),
+    (plot_rain_scoring, 'joined', 'outputs/joined_dataset.csv', 'figures/3_rain_scoring_box.png'),
+    (plot_rain_win_pct, 'by_rain', 'outputs/win_pct_by_stadium_rain.csv', 'figures/4_rain_win_pct.png'),
+    (plot_correlation, 'corr', 'outputs/correlation_matrix.csv', 'figures/5_correlation_matrix.png'),
+]
+
+def _use_agg():
+    """Worker initializer: render off-screen, no GUI backend in the pool."""
+    matplotlib.use('Agg')
+
+def render_chart(task):
+    """Run one (plot function, table or None); returns (name, seconds, error or None)."""
+    plot_fn, table = task
+    start = time.perf_counter()
+    try:
+        with profiling.stage(plot_fn.__name__):
+            plot_fn(table)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return plot_fn.__name__, time.perf_counter() - start, error
+
+def render_charts(tasks, workers=1):
+    """
+    Render (plot function, table) tasks serially (workers=1) or one per
+    worker process. Each chart is independent, so with N cores wall time is
+    roughly the slowest chart per worker rather than the sum of all of them.
+    """
+    if profiling.is_enabled():
+        workers = 1  # the profiler only sees this process
+    if workers <= 1 or len(tasks) <= 1:
+        timings = [render_chart(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_use_agg) as pool:
+            timings = list(pool.map(render_chart, tasks))
+    # Recorded here, not in render_chart, so pool workers' timings aren't lost
+    for name, secs, error in timings:
+        metrics.observe('chart_render_seconds', secs, chart=name)
+        if error:
+            metrics.inc('chart_render_errors_total', chart=name)
+    return timings
+
+def _mtime(path):
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+def render_changed(force=False, workers=1, results=None, input_keys=None):
+    """
+    Render only the charts whose input changed.
+
+    By default the input is the CSV in outputs/ (keyed by its content).
+    With `results` (an AnalysisResults) the tables are plotted directly, and
+    `input_keys` ({csv path: key} from result_cache.output_cache_keys)
+    stands in for the CSV digest.
+    """
+    cache = ResultCache()
+    keys = figure_cache_keys(input_keys)
+    todo = []
+    for plot_fn, attr, _, png_path in CHARTS:
+        key = keys[png_path]
+        if force or not cache.is_fresh(png_path, key):
+            table = getattr(results, attr) if results is not None else None
+            todo.append((plot_fn, table, png_path, key))
+    # A plot function that returns early (e.g. its CSV is missing) leaves an
+    # old PNG behind: only PNGs written by this run are recorded as fresh
+    before = {png_path: _mtime(png_path) for _, _, png_path, _ in todo}
+
+    start = time.perf_counter()
+    outcomes = render_charts([(fn, table) for fn, table, _, _ in todo], workers=workers)
+    wall = time.perf_counter() - start
+
+    rendered = 0
+    for (plot_fn, _, png_path, key), (name, seconds, error) in zip(todo, outcomes):
+        if error:
+            print(f"❌ {name} failed after {seconds:.2f}s: {error}")
+            continue
+        print(f"   {name}: {seconds:.2f}s")
+        written = _mtime(png_path)
+        if written is not None and written != before[png_path]:
+            cache.record(png_path, key)
+            rendered += 1
+        else:
+            print(f"⚠️  {name} wrote no {png_path}, not cached")
+    cache.save()
+
+    if todo:
+        total = sum(seconds for _, seconds, _ in outcomes)
+        print(f"Rendered {len(todo)} charts in {wall:.2f}s wall ({total:.2f}s chart time, {workers} worker(s))")
+    return rendered
+
+def render_in_process(force=False, workers=1, save_csv=False):
+    """Analyze and plot in one run, handing tables over in memory (no CSV round-trip)."""
+    from utils import connect_db
+    from process_and_analyze import run_analysis, export_results
+    from result_cache import output_cache_keys
+
+    conn = connect_db()
+    keys = output_cache_keys(conn)
+    results = run_analysis(conn, update_model=save_csv)
+    conn.close()
+    if save_csv:
+        export_results(results)
+    return render_changed(force=force, workers=workers, results=results, input_keys=keys)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--force', action='store_true', help='Re-render charts even if inputs are unchanged')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Render charts in this many processes (0 = one per CPU)')
+    parser.add_argument('--in-process', action='store_true',
+                        help='Run the analysis here and plot from memory instead of reading outputs/*.csv')
+    parser.add_argument('--save-csv', action='store_true', help='With --in-process, also write the CSVs')
+    parser.add_argument('--profile', action='store_true',
+                        help='cProfile + tracemalloc per chart into outputs/profile/plot/ (renders serially)')
+    args = parser.parse_args()
+    metrics.export_on_exit('plot')
+    if args.profile:
+        profiling.enable('plot')
+
     ensure_figures_dir()
-    plot_temp_impact()
-    plot_wind_impact()
-    plot_rain_scoring()
-    plot_rain_win_pct()
-    plot_correlation()
-    print("\n🎉 All 5 updated visualizations saved!")
\ No newline at end of file
+    workers = args.workers or os.cpu_count() or 1
+    if args.in_process:
+        rendered = render_in_process(force=args.force, workers=workers, save_csv=args.save_csv)
+    else:
+        rendered = render_changed(force=args.force, workers=workers)
+    if rendered:
+        print(f"\n🎉 {rendered} updated visualizations saved!")
+    else:
+        print("✅ Charts up to date (inputs unchanged)")
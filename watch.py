@@ -0,0 +1,358 @@
+"""watch.py
+
+In-season watch mode: poll CFBD for the current week, and as soon as a game
+is final, store it, fetch its weather / air quality / moon data and refresh
+the outputs that depend on it.
+
+    python watch.py                       # poll every 5 minutes until Ctrl-C
+    python watch.py --interval 60 --week 9
+    python watch.py --week 1 --season-type postseason
+    python watch.py --once                # one poll, drain the queue, exit
+
+Without --week the week is worked out again on every poll, so a watcher
+left running moves on when the week does. Past the regular season CFBD
+files every bowl and playoff game under postseason week 1; that is what
+is polled from mid-December (together with regular week 16, Army-Navy)
+through the offseason.
+
+A game is "newly final" when the feed marks it completed with both scores
+and it is not yet in Games (and not already queued). New finals go on a
+bounded queue (--queue-size); when it is full the game is left for the next
+poll, so a burst never grows memory or floods the APIs. One worker thread
+enriches queued games, retrying each API with exponential backoff, and when
+the queue drains refreshes the affected outputs in-process: the result cache
+recomputes only the CSVs whose tables changed, then only their charts. A
+failed poll backs off exponentially (capped at --max-backoff) before the
+next one.
+
+Latency is measured per game from the poll that first saw it final to the
+moment its refreshed outputs were written (detect_to_output_s), plus the
+gap since the previous poll (poll_gap_s: the game went final somewhere in
+that window, so detect_to_output_s + poll_gap_s bounds final-to-output).
+Open-Meteo's archive lags real time by a few days, so a game's weather may
+not be there yet; it is then stored without, and `ingest weather` fills it
+in later. Each refresh appends to outputs/watch_latency.json, and the
+watch_final_to_output_seconds histogram goes to outputs/metrics/watch.json.
+"""
+import argparse
+import json
+import os
+import queue
+import random
+import threading
+import time
+from datetime import date, timedelta
+from createdatabase import add_game_week_columns
+from utils import connect_db, season_week
+import metrics
+import venues
+
+LATENCY_PATH = os.path.join('outputs', 'watch_latency.json')
+INTERVAL = 300.0       # seconds between polls
+QUEUE_SIZE = 64
+MAX_BACKOFF = 1800.0   # cap on the wait after failed polls
+RETRIES = 3            # attempts per enrichment API call
+RETRY_BASE = 1.0       # seconds; doubled per attempt
+LAST_REGULAR_WEEK = 16  # Army-Navy; bowls start the same week
+
+
+def current_week(today=None):
+    """(season, week) to poll for a date, numbered like weather_cube / CFBD."""
+    return season_week(today or date.today())
+
+
+def poll_targets(today=None):
+    """[(season, week, season_type), ...] of CFBD weeks to poll for a date."""
+    today = today or date.today()
+    season, week = current_week(today)
+    if week == 0 and current_week(today + timedelta(days=7))[1] == 0:
+        # March to mid-August: season_week says week 0 of the coming season,
+        # but week 0 games are a week away, so that feed would be empty (and
+        # every poll a failure). Keep polling the last postseason instead.
+        return [(season - 1, 1, 'postseason')]
+    targets = []
+    if week <= LAST_REGULAR_WEEK:
+        targets.append((season, week, 'regular'))
+    if week >= LAST_REGULAR_WEEK:
+        targets.append((season, 1, 'postseason'))
+    return targets
+
+
+def _describe(targets):
+    return ' + '.join(f"{season} week {week}" + (' (postseason)' if season_type == 'postseason' else '')
+                      for season, week, season_type in targets)
+
+
+def with_backoff(fn, *args, retries=RETRIES, base=RETRY_BASE, **kwargs):
+    """Call fn until it returns something other than None, sleeping base * 2**n (+ jitter) between tries."""
+    for attempt in range(retries):
+        result = fn(*args, **kwargs)
+        if result is not None:
+            return result
+        if attempt < retries - 1:
+            time.sleep(base * 2 ** attempt * (1 + random.random() / 2))
+    return None
+
+
+def _stored(cursor, table, game_date, city):
+    cursor.execute(f"""
+        SELECT 1 FROM {table} t JOIN Locations l ON t.location_id = l.location_id
+        WHERE t.game_date = ? AND l.city_name = ? LIMIT 1
+    """, (game_date, city))
+    return cursor.fetchone() is not None
+
+
+def enrich_game(conn, game, venue):
+    """Store one final game plus weather, AQ and moon for its date and city. Returns sources stored."""
+    import college_football
+    import weather_data
+    import air_quality
+    import moon_data
+
+    cursor = conn.cursor()
+    game_date = college_football.insert_game(cursor, game, venue.city)
+    stored = ['game']
+    if not _stored(cursor, 'Weather', game_date, venue.city):
+        weather = with_backoff(weather_data.get_weather_from_api, venue.lat, venue.lon, game_date,
+                               timezone=venue.timezone)
+        if weather:
+            weather_data.insert_weather(cursor, game_date, venue.city, weather)
+            stored.append('weather')
+    if not _stored(cursor, 'AirQuality', game_date, venue.city):
+        aqi = air_quality.extract_game_aqi(
+            with_backoff(air_quality.get_air_quality_from_api, venue.lat, venue.lon, game_date))
+        if aqi is not None:
+            air_quality.insert_air_quality(cursor, game_date, venue.city, aqi)
+            stored.append('air_quality')
+    if not _stored(cursor, 'Moon_Data', game_date, venue.city):
+        moon = moon_data.extract_moon(
+            with_backoff(moon_data.get_moon_phase_from_api, venue.lat, venue.lon, game_date, venue.city))
+        if moon:
+            moon_data.insert_moon(cursor, game_date, venue.city, moon)
+            stored.append('moon')
+    conn.commit()
+    return stored
+
+
+def refresh_outputs(backend='pandas', charts=True):
+    """Recompute the CSVs whose input tables changed, then re-render their charts."""
+    import process_and_analyze
+
+    with metrics.span('watch_refresh', stage='analyze'):
+        process_and_analyze.main(backend=backend)
+    if charts:
+        import matplotlib
+        matplotlib.use('Agg')
+        import visualize
+        visualize.ensure_figures_dir()
+        with metrics.span('watch_refresh', stage='plot'):
+            visualize.render_changed()
+
+
+class Watcher:
+    def __init__(self, year=None, week=None, interval=INTERVAL, queue_size=QUEUE_SIZE, max_backoff=MAX_BACKOFF,
+                 backend='pandas', charts=True, latency_path=LATENCY_PATH, season_type='regular'):
+        # week None: follow the calendar (poll_targets on every poll)
+        self.year = year
+        self.week = week
+        self.season_type = season_type
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.backend = backend
+        self.charts = charts
+        self.latency_path = latency_path
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.in_flight = set()      # game ids queued or waiting for the refresh
+        self.first_seen = {}        # game id -> (detected_at, poll gap) on the poll that saw it final
+        self.batch = []             # enriched games waiting for the next refresh
+        self.last_poll = None
+        self.failures = 0
+        self.stop_event = threading.Event()
+        self.worker = threading.Thread(target=self._work, name='watch-worker', daemon=True)
+
+    # --- POLLING ---
+
+    def targets(self):
+        if self.week is None:
+            return [(self.year or season, week, season_type) for season, week, season_type in poll_targets()]
+        return [(self.year or current_week()[0], self.week, self.season_type)]
+
+    def poll(self, conn):
+        """Fetch the week, queue newly final games. Returns False if the feed failed."""
+        import college_football
+
+        polled_at = time.time()
+        gap = polled_at - self.last_poll if self.last_poll is not None else None
+        targets = self.targets()
+        with metrics.span('watch_poll'):
+            games = [game for season, week, season_type in targets
+                     for game in college_football.get_games_from_api(season, week, season_type=season_type)]
+        if not games:
+            # get_games_from_api returns [] on any error; an in-season week is never empty
+            metrics.inc('watch_poll_failures_total')
+            return False
+        self.last_poll = polled_at
+
+        finals = [g for g in games if g.get('completed') and g.get('homePoints') is not None
+                  and g.get('awayPoints') is not None]
+        ids = [g.get('id') for g in finals]
+        known = set()
+        for lo in range(0, len(ids), 500):
+            chunk = ids[lo:lo + 500]
+            known.update(row[0] for row in conn.execute(
+                f"SELECT game_id FROM Games WHERE game_id IN ({','.join('?' * len(chunk))})", chunk))
+
+        queued = dropped = unknown_venue = 0
+        for game in finals:
+            game_id = game.get('id')
+            with self.lock:
+                if game_id in known or game_id in self.in_flight:
+                    continue
+            venue = venues.resolve(game.get('venue'), game.get('venueId'))
+            if venue is None:
+                unknown_venue += 1
+                continue
+            self.first_seen.setdefault(game_id, (polled_at, gap))
+            try:
+                with self.lock:
+                    self.in_flight.add(game_id)
+                self.queue.put_nowait((game, venue))
+                queued += 1
+            except queue.Full:
+                with self.lock:
+                    self.in_flight.discard(game_id)
+                dropped += 1
+        metrics.inc('watch_games_queued_total', queued)
+        metrics.inc('watch_games_deferred_total', dropped)
+        print(f"🔍 {time.strftime('%H:%M:%S')} {_describe(targets)}: {len(games)} games, {len(finals)} final, "
+              f"{queued} new queued" + (f", {dropped} deferred (queue full)" if dropped else '')
+              + (f", {unknown_venue} at unknown venues" if unknown_venue else ''))
+        return True
+
+    def next_wait(self, ok):
+        if ok:
+            self.failures = 0
+            return self.interval
+        self.failures += 1
+        wait = min(self.max_backoff, self.interval * 2 ** self.failures) * (0.75 + random.random() / 2)
+        print(f"⚠️  Poll failed ({self.failures} in a row); retrying in {wait:.0f}s")
+        return wait
+
+    # --- WORKER ---
+
+    def _work(self):
+        conn = connect_db()
+        try:
+            while not (self.stop_event.is_set() and self.queue.empty()):
+                try:
+                    game, venue = self.queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                try:
+                    with metrics.span('watch_enrich'):
+                        stored = enrich_game(conn, game, venue)
+                    self.batch.append(game.get('id'))
+                    print(f"  ✅ {game.get('homeTeam')} {game.get('homePoints')}-{game.get('awayPoints')} "
+                          f"{game.get('awayTeam')} ({venue.city}): {', '.join(stored)}")
+                except Exception as e:
+                    conn.rollback()
+                    metrics.inc('watch_enrich_errors_total')
+                    print(f"  ❌ game {game.get('id')}: {type(e).__name__}: {e}")
+                    with self.lock:
+                        self.in_flight.discard(game.get('id'))   # retried on a later poll
+                finally:
+                    self.queue.task_done()
+                if self.queue.empty() and self.batch:
+                    self._refresh()
+        finally:
+            conn.close()
+
+    def _refresh(self):
+        batch, self.batch = self.batch, []
+        start = time.perf_counter()
+        try:
+            refresh_outputs(self.backend, self.charts)
+        except Exception as e:
+            metrics.inc('watch_refresh_errors_total')
+            print(f"  ❌ Refresh failed: {type(e).__name__}: {e}")
+        done = time.time()
+        games = []
+        for game_id in batch:
+            detected, gap = self.first_seen.pop(game_id, (done, None))
+            latency = done - detected
+            metrics.observe('watch_final_to_output_seconds', latency)
+            games.append({'game_id': game_id, 'detect_to_output_s': round(latency, 3),
+                          'poll_gap_s': round(gap, 3) if gap is not None else None})
+        with self.lock:
+            self.in_flight.difference_update(batch)
+        latencies = sorted(g['detect_to_output_s'] for g in games)
+        entry = {
+            'at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'games': games,
+            'refresh_s': round(time.perf_counter() - start, 3),
+            'p50_s': latencies[len(latencies) // 2],
+            'max_s': latencies[-1],
+        }
+        self._append_latency(entry)
+        print(f"  📈 Refreshed outputs for {len(games)} game(s) in {entry['refresh_s']:.1f}s; "
+              f"detect->output p50 {entry['p50_s']:.1f}s, max {entry['max_s']:.1f}s")
+
+    def _append_latency(self, entry):
+        try:
+            with open(self.latency_path) as f:
+                log = json.load(f)
+        except (FileNotFoundError, ValueError):
+            log = []
+        log.append(entry)
+        os.makedirs(os.path.dirname(self.latency_path) or '.', exist_ok=True)
+        with open(self.latency_path, 'w') as f:
+            json.dump(log, f, indent=2)
+
+    # --- MAIN LOOP ---
+
+    def run(self, max_polls=None):
+        print(f"Watching {_describe(self.targets())}{'' if self.week is not None else ' (follows the calendar)'} every {self.interval:.0f}s "
+              f"(queue {self.queue.maxsize}, Ctrl-C to stop)")
+        import college_football
+        if venues.register_cfbd(college_football.get_venues_from_api()):
+            venues.save()
+        conn = connect_db()
+        add_game_week_columns(conn)
+        self.worker.start()
+        polls = 0
+        try:
+            while True:
+                ok = self.poll(conn)
+                polls += 1
+                if max_polls is not None and polls >= max_polls:
+                    break
+                if self.stop_event.wait(self.next_wait(ok)):
+                    break
+        except KeyboardInterrupt:
+            print("\nStopping; finishing queued games...")
+        finally:
+            conn.close()
+            self.stop_event.set()
+            self.worker.join()
+        return polls
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Poll for newly final games and refresh outputs')
+    parser.add_argument('--year', type=int, help='Season (default: the current one)')
+    parser.add_argument('--week', type=int, help='Fixed week (default: the current one, rechecked every poll)')
+    parser.add_argument('--season-type', choices=['regular', 'postseason'], default='regular',
+                        help='With --week')
+    parser.add_argument('--interval', type=float, default=INTERVAL, help='Seconds between polls')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE)
+    parser.add_argument('--max-backoff', type=float, default=MAX_BACKOFF)
+    parser.add_argument('--backend', choices=['pandas', 'sql'], default='pandas')
+    parser.add_argument('--no-charts', action='store_true', help='Refresh CSVs only')
+    parser.add_argument('--once', action='store_true', help='Poll once, process what it found, exit')
+    parser.add_argument('--max-polls', type=int)
+    args = parser.parse_args()
+    metrics.export_on_exit('watch')
+    watcher = Watcher(args.year, args.week, args.interval, args.queue_size, args.max_backoff,
+                      args.backend, charts=not args.no_charts, season_type=args.season_type)
+    watcher.run(max_polls=1 if args.once else args.max_polls)
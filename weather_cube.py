@@ -0,0 +1,216 @@
+"""weather_cube.py
+
+Precomputed aggregate cube over the joined games, so new slicing questions
+("rain + cold at Big Ten venues in November") don't need a new compute_*
+function or a pass over the raw games.
+
+Dimensions: stadium, conference (home team), season, week, temp_bin,
+wind_bin, precip (Rainy/Dry) and moon_bin. The bins are the same ones the
+compute_* functions use (TEMP_BINS, WIND_BINS, MOON_BINS via cut_bins, and
+the precipitation > 0 rule). Games with no weather/moon row land in an
+'Unknown' bin rather than being dropped.
+
+Per cell it stores count, sum of total points, sum of squared total points
+and home wins. Only occupied cells are kept: `coords` is an int16 array
+(cells x dimensions) of label codes and `values` a float64 array (cells x
+measures). Roll-ups regroup those cells with one bincount per measure.
+
+    cube = WeatherCube.build(joined)
+    cube.query(['temp_bin', 'precip'], conference='Big Ten', week=[10, 11, 12, 13])
+
+    python weather_cube.py --by temp_bin precip --where conference="Big Ten" week=10,11,12,13
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from utils import connect_db, ensure_outputs_dir
+from result_cache import ResultCache, table_fingerprint, code_version, make_key, JOIN_TABLES
+from process_and_analyze import (load_data_typed, cut_bins, TEMP_BINS, TEMP_LABELS,
+                                 WIND_BINS, WIND_LABELS, MOON_BINS, MOON_LABELS)
+
+CUBE_PATH = os.path.join('outputs', 'weather_cube.npz')
+CUBE_TABLES = JOIN_TABLES + ['Weather', 'Moon_Data']
+DIMENSIONS = ['stadium', 'conference', 'season', 'week', 'temp_bin', 'wind_bin', 'precip', 'moon_bin']
+MEASURES = ['count', 'points_sum', 'points_sq_sum', 'home_wins']
+UNKNOWN = 'Unknown'
+
+
+def season_and_week(dates):
+    """
+    Season year and approximate week number for each game date.
+
+    Neither is stored in Games, so they are derived: January bowl games belong
+    to the previous season, and weeks count from the Sunday before the last
+    Saturday of August (week 1 = the first full football weekend, week 0 =
+    any earlier games).
+    """
+    dates = pd.to_datetime(pd.Series(dates))
+    season = dates.dt.year - (dates.dt.month < 3).astype(int)
+    aug31 = pd.to_datetime(season.astype(str) + '-08-31')
+    last_saturday = aug31 - pd.to_timedelta((aug31.dt.dayofweek - 5) % 7, unit='D')
+    week = (dates - (last_saturday - pd.Timedelta(days=6))).dt.days // 7 + 1
+    return season.to_numpy(), week.clip(lower=0).to_numpy()
+
+
+def _codes(values, labels=None):
+    """(codes, labels) with missing values mapped to an 'Unknown' label."""
+    series = pd.Series(values).astype(object).where(pd.Series(values).notna(), UNKNOWN)
+    if labels is None:
+        labels = sorted(set(series) - {UNKNOWN})
+    labels = list(labels) + [UNKNOWN]
+    lookup = {label: i for i, label in enumerate(labels)}
+    return series.map(lookup).to_numpy(dtype=np.int64), np.array(labels, dtype=object)
+
+
+def _group(coords, values, shape):
+    """Sum `values` rows that share the same coordinate row."""
+    flat = np.ravel_multi_index(coords.T, shape)
+    cells, inverse = np.unique(flat, return_inverse=True)
+    summed = np.column_stack([np.bincount(inverse, weights=values[:, m], minlength=len(cells))
+                              for m in range(values.shape[1])])
+    return np.column_stack(np.unravel_index(cells, shape)), summed
+
+
+class WeatherCube:
+    def __init__(self, dims, labels, coords, values):
+        self.dims = list(dims)
+        self.labels = {d: np.asarray(labels[d], dtype=object) for d in self.dims}
+        self.coords = coords.astype(np.int16)
+        self.values = values.astype(np.float64)
+
+    @property
+    def shape(self):
+        return tuple(len(self.labels[d]) for d in self.dims)
+
+    @classmethod
+    def build(cls, joined: pd.DataFrame):
+        df = joined[joined['total_points'].notna()]
+        season, week = season_and_week(df['game_date'])
+        temp = pd.to_numeric(df['temperature'], errors='coerce')
+        wind = pd.to_numeric(df['wind_speed'], errors='coerce')
+        moon = pd.to_numeric(df['moon_illumination'], errors='coerce') / 100.0
+        precip = pd.to_numeric(df['precipitation'], errors='coerce')
+
+        columns = {
+            'stadium': _codes(df['stadium_city']),
+            'conference': _codes(df['home_conference']),
+            'season': _codes(season),
+            'week': _codes(week),
+            'temp_bin': _codes(cut_bins(temp, TEMP_BINS, TEMP_LABELS), TEMP_LABELS),
+            'wind_bin': _codes(cut_bins(wind, WIND_BINS, WIND_LABELS), WIND_LABELS),
+            # Same rule as compute_points_by_wind_precip, but no weather row -> Unknown
+            'precip': _codes(np.where(precip.isna(), None,
+                                      np.where(precip.fillna(0) > 0, 'Rainy', 'Dry')), ['Dry', 'Rainy']),
+            'moon_bin': _codes(cut_bins(moon, MOON_BINS, MOON_LABELS, include_lowest=True), MOON_LABELS),
+        }
+        labels = {d: columns[d][1] for d in DIMENSIONS}
+        coords = np.column_stack([columns[d][0] for d in DIMENSIONS])
+
+        points = df['total_points'].to_numpy(dtype=np.float64)
+        home_win = (pd.to_numeric(df['home_score']) > pd.to_numeric(df['away_score'])).to_numpy()
+        values = np.column_stack([np.ones(len(df)), points, points ** 2, home_win.astype(np.float64)])
+
+        cube = cls(DIMENSIONS, labels, coords, values)
+        if len(df):
+            cube.coords, cube.values = _group(coords, values, cube.shape)
+            cube.coords = cube.coords.astype(np.int16)
+        return cube
+
+    def slice(self, **filters):
+        """Keep cells whose label matches each filter (a value or a list of values)."""
+        mask = np.ones(len(self.coords), dtype=bool)
+        for dim, wanted in filters.items():
+            if dim not in self.labels:
+                raise KeyError(f"Unknown dimension {dim!r}; expected one of {self.dims}")
+            wanted = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            wanted = {str(w) for w in wanted}
+            codes = [i for i, label in enumerate(self.labels[dim]) if str(label) in wanted]
+            mask &= np.isin(self.coords[:, self.dims.index(dim)], codes)
+        return WeatherCube(self.dims, self.labels, self.coords[mask], self.values[mask])
+
+    def rollup(self, by=()):
+        """Aggregate to the `by` dimensions; returns a DataFrame of measures + derived stats."""
+        by = list(by)
+        axes = [self.dims.index(d) for d in by]
+        if not by:
+            coords, values = np.empty((1, 0), dtype=np.int64), self.values.sum(axis=0, keepdims=True)
+        elif len(self.coords):
+            coords, values = _group(self.coords[:, axes], self.values, tuple(self.shape[a] for a in axes))
+        else:
+            coords, values = np.empty((0, len(by)), dtype=np.int64), np.empty((0, len(MEASURES)))
+
+        out = pd.DataFrame({d: self.labels[d][coords[:, i]] for i, d in enumerate(by)})
+        for m, name in enumerate(MEASURES):
+            out[name] = values[:, m]
+        out['count'] = out['count'].astype(np.int64)
+        out['home_wins'] = out['home_wins'].astype(np.int64)
+        n = out['count'].replace(0, np.nan)
+        out['avg_total_points'] = out['points_sum'] / n
+        # Sample std from the stored moments (ddof=1, like pandas .std())
+        var = (out['points_sq_sum'] - out['points_sum'] ** 2 / n) / (n - 1)
+        out['std_total_points'] = np.sqrt(var.clip(lower=0))
+        out['home_win_pct'] = out['home_wins'] / n * 100
+        return out
+
+    def query(self, by=(), **filters):
+        return self.slice(**filters).rollup(by)
+
+    def save(self, path=CUBE_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        arrays = {f"labels_{d}": self.labels[d].astype(str) for d in self.dims}
+        np.savez_compressed(path, dims=np.array(self.dims), coords=self.coords, values=self.values, **arrays)
+
+    @classmethod
+    def load(cls, path=CUBE_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            dims = [str(d) for d in data['dims']]
+            labels = {d: data[f"labels_{d}"] for d in dims}
+            return cls(dims, labels, data['coords'], data['values'])
+
+
+def cube_key(conn):
+    return make_key(tables=table_fingerprint(conn, CUBE_TABLES),
+                    code=code_version('weather_cube.py', 'process_and_analyze.py'))
+
+
+def load_or_build(conn=None, path=CUBE_PATH, force=False):
+    """Load the saved cube, rebuilding it first if its input tables changed."""
+    own_conn = conn is None
+    conn = conn or connect_db()
+    try:
+        cache = ResultCache()
+        key = cube_key(conn)
+        if force or not cache.is_fresh(path, key):
+            ensure_outputs_dir()
+            cube = WeatherCube.build(load_data_typed(conn))
+            cube.save(path)
+            cache.record(path, key)
+            cache.save()
+            print(f"✅ Built cube: {len(cube.coords)} occupied cells, shape {cube.shape}")
+            return cube
+        return WeatherCube.load(path)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def _parse_where(items):
+    filters = {}
+    for item in items or []:
+        dim, _, value = item.partition('=')
+        filters[dim] = value.split(',') if ',' in value else value
+    return filters
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Slice and roll up the weather cube')
+    parser.add_argument('--by', nargs='*', default=[], choices=DIMENSIONS, help='Dimensions to keep')
+    parser.add_argument('--where', nargs='*', help='Filters like precip=Rainy week=10,11,12')
+    parser.add_argument('--rebuild', action='store_true')
+    args = parser.parse_args()
+
+    cube = load_or_build(force=args.rebuild)
+    result = cube.query(args.by, **_parse_where(args.where))
+    cols = args.by + ['count', 'avg_total_points', 'std_total_points', 'home_win_pct']
+    print(result[cols].round(2).to_string(index=False))
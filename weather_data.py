@@ -2,45 +2,27 @@
 # Matt - Weather Data Collection
 # Run this 4+ times to collect 100+ weather records
 
+import os
 import sqlite3
-import requests
 from datetime import datetime, timedelta
 import time
+import metrics
+import profiling
+from utils import connect_db
+import venues
 
-# Stadium coordinates 
-STADIUMS = {
-    'Ann Arbor': {'lat': 42.2808, 'lon': -83.7430},
-    'Columbus': {'lat': 40.0012, 'lon': -83.0302},
-    'State College': {'lat': 40.7982, 'lon': -77.8599},
-    'Madison': {'lat': 43.0731, 'lon': -89.4012},
-    'Iowa City': {'lat': 41.6611, 'lon': -91.5302},
-    'Eugene': {'lat': 44.0521, 'lon': -123.0868},
-    'Austin': {'lat': 30.2849, 'lon': -97.7341},
-    'Tuscaloosa': {'lat': 33.2098, 'lon': -87.5692},
-    'Athens': {'lat': 33.9519, 'lon': -83.3576},
-    'Baton Rouge': {'lat': 30.4515, 'lon': -91.1871},
-    'East Lansing': {'lat': 42.7370, 'lon': -84.4839},
-    'Lincoln': {'lat': 40.8136, 'lon': -96.7026},
-    'Champaign': {'lat': 40.1164, 'lon': -88.2434},
-    'West Lafayette': {'lat': 40.4259, 'lon': -86.9081},
-    'Bloomington': {'lat': 39.1653, 'lon': -86.5264},
-    'Knoxville': {'lat': 35.9606, 'lon': -83.9207},
-    'Auburn': {'lat': 32.5990, 'lon': -85.4808},
-    'College Station': {'lat': 30.6280, 'lon': -96.3344},
-    'Starkville': {'lat': 33.4504, 'lon': -88.8184},
-    'Columbia': {'lat': 34.0007, 'lon': -81.0348},
-    'Gainesville': {'lat': 29.6516, 'lon': -82.3248},  # Florida
-    'Tallahassee': {'lat': 30.4383, 'lon': -84.2807},  # Florida State
-    'Blacksburg': {'lat': 37.2296, 'lon': -80.4139},  # Virginia Tech
-    'Clemson': {'lat': 34.6834, 'lon': -82.8374},  # Clemson
-    'Atlanta': {'lat': 33.7756, 'lon': -84.3963},  # Georgia Tech
-}
+# Point at a local stand-in (mock_api.py) with WEATHER_BASE_URL=http://127.0.0.1:8799
+WEATHER_BASE_URL = os.environ.get('WEATHER_BASE_URL', 'https://archive-api.open-meteo.com')
+REQUEST_DELAY = float(os.environ.get('COLLECTOR_DELAY', 0.5))
 
-def get_weather_from_api(lat, lon, date):
+# Stadium cities with coordinates and timezone (venues.py)
+STADIUMS = venues.city_coords()
+
+def get_weather_from_api(lat, lon, date, base_url=None, timezone='America/New_York'):
     """
     Get HISTORICAL weather data from Open-Meteo Archive API
     """
-    url = "https://archive-api.open-meteo.com/v1/archive"
+    url = f"{base_url or WEATHER_BASE_URL}/v1/archive"
     
     params = {
         'latitude': lat,
@@ -51,41 +33,44 @@ def get_weather_from_api(lat, lon, date):
         'temperature_unit': 'fahrenheit',
         'wind_speed_unit': 'mph',
         'precipitation_unit': 'inch',
-        'timezone': 'America/New_York'
+        'timezone': timezone
     }
     
     try:
-        response = requests.get(url, params=params)
+        response = metrics.http_get('open_meteo_archive', url, params=params)
         
         if response.status_code == 200:
-            data = response.json()
-            hourly = data.get('hourly', {})
-            
-            if not hourly or 'temperature_2m' not in hourly:
-                return None
-            
-            # Get game time data (1 PM = hour 13)
-            game_hour_index = 13
-            if len(hourly['temperature_2m']) <= game_hour_index:
-                game_hour_index = len(hourly['temperature_2m']) - 1
-            
-            return {
-                'temperature': hourly['temperature_2m'][game_hour_index],
-                'humidity': hourly['relative_humidity_2m'][game_hour_index],
-                'precipitation': hourly['precipitation'][game_hour_index],
-                'wind_speed': hourly['wind_speed_10m'][game_hour_index],
-                'weather_code': hourly['weather_code'][game_hour_index]
-            }
+            return extract_weather(response.json())
         else:
             return None
     except Exception as e:
         return None
 
+def extract_weather(data):
+    """Game-time fields from an Open-Meteo archive response (None if it has no hourly data)"""
+    hourly = data.get('hourly', {})
+    
+    if not hourly or 'temperature_2m' not in hourly:
+        return None
+    
+    # Get game time data (1 PM stadium-local time = hour 13)
+    game_hour_index = 13
+    if len(hourly['temperature_2m']) <= game_hour_index:
+        game_hour_index = len(hourly['temperature_2m']) - 1
+    
+    return {
+        'temperature': hourly['temperature_2m'][game_hour_index],
+        'humidity': hourly['relative_humidity_2m'][game_hour_index],
+        'precipitation': hourly['precipitation'][game_hour_index],
+        'wind_speed': hourly['wind_speed_10m'][game_hour_index],
+        'weather_code': hourly['weather_code'][game_hour_index]
+    }
+
 def show_database_stats():
     """
     Show current database statistics
     """
-    conn = sqlite3.connect('football_weather.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
     # Total count
@@ -122,11 +107,28 @@ def get_or_create_location(cursor, city_name):
     cursor.execute("INSERT INTO Locations (city_name) VALUES (?)", (city_name,))
     return cursor.lastrowid
 
+def insert_weather(cursor, date, city, weather):
+    """Insert one extract_weather() result for city on date"""
+    # 1. Get the Location ID
+    loc_id = get_or_create_location(cursor, city)
+
+    # 2. Insert using location_id instead of city string
+    with metrics.span('db_write', table='Weather'):
+        cursor.execute('''
+            INSERT INTO Weather 
+            (game_date, location_id, temperature, wind_speed, 
+             humidity, precipitation, weather_code)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (date, loc_id, weather['temperature'], weather['wind_speed'],
+              weather['humidity'], weather['precipitation'], 
+              weather['weather_code']))
+    metrics.inc('db_rows_written_total', table='Weather')
+
 def store_weather_data():
     """
     Store up to 25 weather records per run
     """
-    conn = sqlite3.connect('football_weather.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
     # Verify actual count
@@ -190,22 +192,11 @@ def store_weather_data():
             break
         
         print(f"[{stored_count + 1}/25] Fetching {city} on {date}...", end=" ")
-        weather = get_weather_from_api(coords['lat'], coords['lon'], date)
+        weather = get_weather_from_api(coords['lat'], coords['lon'], date, timezone=coords['timezone'])
         
         if weather:
             try:
-                # 1. Get the Location ID
-                loc_id = get_or_create_location(cursor, city)
-
-                # 2. Insert using location_id instead of city string
-                cursor.execute('''
-                    INSERT INTO Weather 
-                    (game_date, location_id, temperature, wind_speed, 
-                     humidity, precipitation, weather_code)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (date, loc_id, weather['temperature'], weather['wind_speed'],
-                      weather['humidity'], weather['precipitation'], 
-                      weather['weather_code']))
+                insert_weather(cursor, date, city, weather)
                 
                 stored_count += 1
                 print(f"✓ {weather['temperature']:.1f}°F")
@@ -216,9 +207,10 @@ def store_weather_data():
             print(f"✗ No data")
             failed_count += 1
         
-        time.sleep(0.5)
+        time.sleep(REQUEST_DELAY)
     
-    conn.commit()
+    with metrics.span('db_commit', table='Weather'):
+        conn.commit()
     cursor.execute("SELECT COUNT(*) FROM Weather")
     final_count = cursor.fetchone()[0]
     conn.close()
@@ -238,4 +230,7 @@ def store_weather_data():
     show_database_stats()
 
 if __name__ == '__main__':
-    store_weather_data()
\ No newline at end of file
+    metrics.export_on_exit('weather')
+    profiling.enable_from_argv('weather')
+    with profiling.stage('collect'):
+        store_weather_data()
\ No newline at end of file